@@ -1,29 +1,67 @@
-from flask import Flask, request, jsonify, render_template, session
+from flask import Flask, Response, request, jsonify, render_template, session, stream_with_context
 import uuid
 import logging
 from datetime import datetime
 import os
+import secrets
 import sys
 
 
-from src.graphs.finalAgentGraph import sparrowAgent
-from langchain_core.messages import HumanMessage
+from src.graphs.graphRegistry import get_graph, warmup
+from src.nodes.routerNode import intent_router
+from src.utils.metrics import metrics
+from src.utils.logger import configure_logging, bind_thread_id
+from src.utils.conversation import (
+    get_conversations, get_or_create_conversation, checkpoint_in_sync, build_sparrow_input, extract_response,
+    save_result, graph_config, load_user_profile, session_user_id, ndjson, stream_events, closing_events, error_event
+)
 
 app = Flask(__name__)
-app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'your-secret-key-here')
+# The session (thread and signed-in user) is signed with this key; a published
+# default would let anyone forge a session, so without one it is random per process
+app.secret_key = os.environ.get('FLASK_SECRET_KEY') or secrets.token_hex(32)
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+# Queue-backed logging with per-module levels and thread_id correlation
+configure_logging()
 logger = logging.getLogger(__name__)
+if not os.environ.get('FLASK_SECRET_KEY'):
+    logger.warning("FLASK_SECRET_KEY is not set; using a random session key for this process")
 
+# Build the graphs at server start instead of on the first request
+WARMUP = os.environ.get('SPARROW_WARMUP', '1') not in ('0', 'false', 'no')
+
+
+def agent():
+    """The compiled Sparrow agent (built once, on first use or at warmup)"""
+    return get_graph('sparrow')
 
-conversations = {}
 
 @app.route('/')
 def index():
     """Serve the main chat interface"""
     return render_template('index.html')
 
+
+def get_conversation():
+    """Get or create the conversation thread bound to the current session"""
+    thread_id = session.get('thread_id')
+    if not thread_id:
+        thread_id = str(uuid.uuid4())
+        session['thread_id'] = thread_id
+    return thread_id, get_or_create_conversation(thread_id)
+
+
+def get_user_profile(data):
+    """
+    Profile summary of the user signed in to this session, passed to the
+    executors so they don't spend a tool call to learn who they serve.
+    The authenticated front end sends ``user_id`` once; the session remembers it.
+    """
+    user_id = session_user_id(session, data, request.headers.get('Authorization'))
+    return load_user_profile(user_id)
+
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handle chat messages"""
@@ -34,72 +72,22 @@ def chat():
         if not user_message:
             return jsonify({'success': False, 'error': 'Empty message'})
         
-        # Get or create conversation thread
-        thread_id = session.get('thread_id')
-        if not thread_id:
-            thread_id = str(uuid.uuid4())
-            session['thread_id'] = thread_id
-            conversations[thread_id] = {
-                'messages': [],
-                'created_at': datetime.now(),
-                'last_updated': datetime.now()
-            }
-        
-        conversation = conversations.get(thread_id, {
-            'messages': [],
-            'created_at': datetime.now(),
-            'last_updated': datetime.now()
-        })
+        thread_id, conversation = get_conversation()
+        bind_thread_id(thread_id)
+        user_profile = get_user_profile(data)
+        checkpoint = agent().get_state(graph_config(thread_id))
+        in_sync = checkpoint_in_sync(checkpoint.values, conversation)
+        sparrow_input = build_sparrow_input(thread_id, conversation, user_message, in_sync)
         
-        # Prepare the state for the Sparrow Agent
-        # Add the new user message to the conversation
-        conversation['messages'].append(HumanMessage(content=user_message))
-        conversation['last_updated'] = datetime.now()
-        conversations[thread_id] = conversation
-        
-        # Create the input state for Sparrow Agent
-        sparrow_input = {
-            'messages': conversation['messages'],
-            'notes': [],
-            'query_brief': '',
-            'final_message': ''
-        }
-        
-        logger.info(f"Processing message for thread {thread_id}: {user_message}")
+        logger.info("Processing message: %.200s", user_message)
         
         # Run the Sparrow Agent
-        result = sparrowAgent.invoke(sparrow_input)
-        
-        # Extract the response
-        response_message = ""
-        status_info = ""
-        
-        # Get the final message or the last AI message
-        if result.get('final_message'):
-            response_message = result['final_message']
-            status_info = "Task completed"
-        elif result.get('messages'):
-            # Find the last AI message
-            for msg in reversed(result['messages']):
-                if hasattr(msg, 'content') and msg.content and msg.content != user_message:
-                    response_message = msg.content
-                    break
+        result = agent().invoke(sparrow_input, config=graph_config(thread_id, user_profile))
         
-        if not response_message:
-            response_message = "I'm processing your request. Could you provide more details?"
+        response_message, status_info = extract_response(result, user_message)
+        save_result(thread_id, conversation, result)
         
-        # Add execution status information
-        if result.get('execution_jobs'):
-            status_info = f"Executed: {', '.join(result['execution_jobs'])}"
-        elif result.get('notes'):
-            # Get the last note as status
-            status_info = result['notes'][-1] if result['notes'] else ""
-        
-        # Update conversation with the agent's response
-        conversation['messages'] = result.get('messages', conversation['messages'])
-        conversations[thread_id] = conversation
-        
-        logger.info(f"Response generated for thread {thread_id}: {response_message[:100]}...")
+        logger.info("Response generated: %.100s", response_message)
         
         return jsonify({
             'success': True,
@@ -109,17 +97,79 @@ def chat():
         })
         
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
+        logger.error("Error in chat endpoint: %s", e, exc_info=True)
         return jsonify({
             'success': False,
             'error': f"An error occurred: {str(e)}"
         })
 
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Handle chat messages as a newline-delimited JSON stream.
+
+    Emits a ``node`` event for every graph node that finishes, ``token``
+    events for the synthesizer output as it is generated and a closing
+    ``final`` (or ``error``) event carrying the same payload as ``/chat``.
+    """
+    data = request.get_json()
+    user_message = data.get('message', '').strip()
+    
+    if not user_message:
+        return Response(
+            ndjson({'type': 'error', 'success': False, 'error': 'Empty message'}),
+            mimetype='application/x-ndjson'
+        )
+    
+    thread_id, conversation = get_conversation()
+    bind_thread_id(thread_id)
+    user_profile = get_user_profile(data)
+    checkpoint = agent().get_state(graph_config(thread_id))
+    in_sync = checkpoint_in_sync(checkpoint.values, conversation)
+    sparrow_input = build_sparrow_input(thread_id, conversation, user_message, in_sync)
+    
+    logger.info("Streaming message: %.200s", user_message)
+    
+    def generate():
+        # The response body is produced after the view returns
+        bind_thread_id(thread_id)
+        result = {}
+        streamed = False
+        try:
+            for namespace, mode, chunk in agent().stream(
+                sparrow_input,
+                config=graph_config(thread_id, user_profile),
+                stream_mode=['updates', 'messages', 'values'],
+                subgraphs=True,
+            ):
+                # Only the top-level graph values make up the final state
+                if mode == 'values' and not namespace:
+                    result = chunk
+                for event in stream_events(mode, chunk):
+                    streamed = streamed or event['type'] == 'token'
+                    yield ndjson(event)
+            
+            response_message, status_info = extract_response(result, user_message)
+            save_result(thread_id, conversation, result)
+            
+            logger.info("Streamed response: %.100s", response_message)
+            
+            for event in closing_events(thread_id, response_message, status_info, streamed):
+                yield ndjson(event)
+        
+        except Exception as e:
+            logger.error("Error in chat stream endpoint: %s", e, exc_info=True)
+            yield ndjson(error_event(e))
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/new_conversation', methods=['POST'])
 def new_conversation():
     """Start a new conversation thread"""
-    # Clear the session thread
+    # Clear the session thread and signed-in user
     session.pop('thread_id', None)
+    session.pop('user_id', None)
     return jsonify({'success': True, 'message': 'New conversation started'})
 
 @app.route('/health')
@@ -128,45 +178,31 @@ def health():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'active_conversations': len(conversations)
+        'active_conversations': len(get_conversations()),
+        'intent_router': intent_router.stats()
     })
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint: per-node latency, tokens, tool and cache counters"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
 @app.errorhandler(500)
 def internal_error(error):
-    logger.error(f"Internal server error: {error}")
+    logger.error("Internal server error: %s", error)
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
-    # Clean up old conversations periodically (simple cleanup)
-    import threading
-    import time
-    
-    def cleanup_conversations():
-        while True:
-            time.sleep(3600)  # Clean up every hour
-            cutoff = datetime.now().timestamp() - 24 * 3600  # 24 hours ago
-            
-            threads_to_remove = []
-            for thread_id, conv in conversations.items():
-                if conv['last_updated'].timestamp() < cutoff:
-                    threads_to_remove.append(thread_id)
-            
-            for thread_id in threads_to_remove:
-                del conversations[thread_id]
-                
-            logger.info(f"Cleaned up {len(threads_to_remove)} old conversations")
-    
-    # Start cleanup thread
-    cleanup_thread = threading.Thread(target=cleanup_conversations, daemon=True)
-    cleanup_thread.start()
-    
+    # Expired conversations are pruned by the conversation store itself
     # Run the Flask app
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     
-    logger.info(f"Starting Sparrow Agent Flask app on port {port}")
+    if WARMUP:
+        logger.info("Graphs built in %s", warmup())
+    logger.info("Starting Sparrow Agent Flask app on port %d", port)
     app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+ETA engine benchmark: lane table build, incremental refresh and lookup latency.
+
+Generates synthetic historical shipments over a set of city pairs and
+services, builds a lane table with ``src.utils.etaEngine``, merges a day of
+new deliveries into it and times ``estimated_time_analysis``-style lookups.
+Run from the repo root:
+
+    python -m benchmarks.eta --shipments 2000000 --cities 40
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.pipeline import percentile
+
+SERVICES = ("standard", "express", "economy")
+SPEED = {"standard": 1.0, "express": 0.5, "economy": 1.8}
+
+
+def shipments(count: int, cities: int, seed: int):
+    rng = random.Random(seed)
+    names = [f"City{i}" for i in range(cities)]
+    for _ in range(count):
+        origin, destination = rng.sample(names, 2)
+        service = rng.choice(SERVICES)
+        # Longer lanes between distant indexes, lognormal spread around the mean
+        base = 12 + 2 * abs(names.index(origin) - names.index(destination))
+        yield origin, destination, service, base * SPEED[service] * rng.lognormvariate(0, 0.35)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shipments", type=int, default=500000)
+    parser.add_argument("--refresh-shipments", type=int, default=20000)
+    parser.add_argument("--cities", type=int, default=40)
+    parser.add_argument("--lookups", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    from src.utils.etaEngine import EtaTable, build, estimate_text, refresh
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "lanes.eta")
+
+        started = time.perf_counter()
+        lanes = build(path, shipments(args.shipments, args.cities, args.seed))
+        results["build_s"] = time.perf_counter() - started
+        results["lanes"] = lanes
+        results["table_kb"] = os.path.getsize(path) / 1024
+
+        started = time.perf_counter()
+        refresh(path, shipments(args.refresh_shipments, args.cities, args.seed + 1))
+        results["refresh_s"] = time.perf_counter() - started
+
+        table = EtaTable(path)
+        rng = random.Random(args.seed)
+        names = [f"City{i}" for i in range(args.cities)]
+        timings = []
+        for _ in range(args.lookups):
+            origin, destination = rng.sample(names, 2)
+            service = rng.choice(SERVICES)
+            started = time.perf_counter()
+            estimate_text(table, origin, destination, service)
+            timings.append(time.perf_counter() - started)
+        results["lookup_us"] = {q: percentile(timings, q) * 1e6 for q in (50, 95, 99)}
+
+    print(f"build           {args.shipments:,} shipments -> {results['lanes']:,} lanes in {results['build_s']:.2f}s "
+          f"({args.shipments / results['build_s']:,.0f} shipments/s), table {results['table_kb']:.0f}KB")
+    print(f"refresh         {args.refresh_shipments:,} new deliveries merged in {results['refresh_s']:.2f}s")
+    lookup = results["lookup_us"]
+    print(f"lookup          p50 {lookup[50]:.1f}us  p95 {lookup[95]:.1f}us  p99 {lookup[99]:.1f}us")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Offline stand-ins for the Groq chat models and tool backends used by the benchmarks.
+
+``install_fake_llm()`` swaps ``src.llms.groqllm.get_client`` for a factory
+returning ``FakeChatModel``, so every graph built afterwards runs without
+network access or credentials. Graphs are built lazily (see
+``src.graphs.graphRegistry``), so installing the fake any time before the
+first ``get_graph`` call is enough. ``install_fake_tools()`` does the same
+for the tool backends.
+
+Latencies are given as distribution specs and sampled from a seeded RNG so
+runs are repeatable:
+
+    const:0.2            always 200ms
+    uniform:0.1,0.4      uniform between 100 and 400ms
+    normal:0.3,0.05      mean 300ms, sd 50ms (clipped at 0)
+    lognormal:-1.2,0.4   lognormal(mu, sigma), the usual shape of API latency
+"""
+import asyncio
+import random
+import re
+import threading
+import time
+import typing
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+TRACKING_ID_RE = re.compile(r"\b[A-Z]{3}\d{3,6}\b")
+
+# Above this many tracking numbers the fake model uses the batched tool
+BATCH_TRACKING_THRESHOLD = 3
+
+
+class Latency:
+    """Seeded latency distribution parsed from a ``kind:params`` spec."""
+
+    def __init__(self, spec="const:0", seed: int = 0):
+        if isinstance(spec, (int, float)):
+            spec = f"const:{spec}"
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("const", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution {spec!r}")
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "const":
+                return self.params[0] if self.params else 0.0
+            if self.kind == "uniform":
+                return self._random.uniform(*self.params)
+            if self.kind == "normal":
+                return max(0.0, self._random.gauss(*self.params))
+            return self._random.lognormvariate(*self.params)
+
+    def __repr__(self) -> str:
+        return f"Latency({self.spec!r})"
+
+
+class CallCounter:
+    """Thread-safe count of fake LLM calls, by kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, kind: str) -> None:
+        with self._lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def total(self) -> int:
+        with self._lock:
+            return sum(self.counts.values())
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts.clear()
+
+
+llm_calls = CallCounter()
+
+
+def _fake_field(annotation, name: str, text: str):
+    """A plausible value for one structured-output field."""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Literal:
+        options = typing.get_args(annotation)
+        # "no" keeps clarification-style decisions moving forward
+        return "no" if "no" in options else options[0]
+    if origin in (list, typing.List):
+        return [text]
+    if annotation is bool:
+        return False
+    if name in ("question",):
+        return ""
+    return text
+
+
+def _usage(messages, output_tokens: int = 16) -> dict:
+    input_tokens = sum(len(str(m.content)) // 4 for m in messages)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted chat model honouring ``bind_tools`` and ``with_structured_output``.
+
+    - Tool-bound calls answer a human turn that mentions tracking numbers
+      (``ABC123``) with ``track_package`` calls (one per number, or a single
+      ``track_packages`` call for larger batches), otherwise with text.
+    - Structured calls return the schema filled from the last message.
+    - Every call sleeps for a sample of ``latency`` (``asyncio.sleep`` on
+      the async path) and is counted in ``llm_calls``.
+    """
+
+    model: str = "fake"
+    latency: typing.Any = None
+    tool_names: tuple = ()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _delay(self) -> float:
+        return self.latency.sample() if self.latency is not None else 0.0
+
+    def _respond(self, messages) -> ChatResult:
+        last = messages[-1]
+        text = str(last.content)
+        usage = _usage(messages)
+
+        if "track_package" in self.tool_names and last.type == "human":
+            ids = list(dict.fromkeys(TRACKING_ID_RE.findall(text)))
+            if len(ids) > BATCH_TRACKING_THRESHOLD and "track_packages" in self.tool_names:
+                calls = [{"name": "track_packages", "args": {"tracking_numbers": ids}, "id": "call_0"}]
+            else:
+                calls = [
+                    {"name": "track_package", "args": {"tracking_number": tracking_id}, "id": f"call_{i}"}
+                    for i, tracking_id in enumerate(ids)
+                ]
+            if calls:
+                message = AIMessage(content="", usage_metadata=usage, tool_calls=calls)
+                return ChatResult(generations=[ChatGeneration(message=message)])
+
+        message = AIMessage(content=f"Summary: {text[:200]}", usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        llm_calls.add("chat")
+        time.sleep(self._delay())
+        return self._respond(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        llm_calls.add("chat")
+        await asyncio.sleep(self._delay())
+        return self._respond(messages)
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tool_names": tuple(tool.name for tool in tools)})
+
+    def with_structured_output(self, schema, **kwargs):
+        def build(messages):
+            text = str(messages[-1].content)[-300:] if messages else ""
+            return schema(**{
+                name: _fake_field(field.annotation, name, text)
+                for name, field in schema.model_fields.items()
+            })
+
+        def respond(messages):
+            llm_calls.add("structured")
+            time.sleep(self._delay())
+            return build(messages)
+
+        async def arespond(messages):
+            llm_calls.add("structured")
+            await asyncio.sleep(self._delay())
+            return build(messages)
+
+        return RunnableLambda(respond, afunc=arespond)
+
+
+def install_fake_llm(latency="const:0", seed: int = 0) -> None:
+    """Route every Groq client request in this process to FakeChatModel."""
+    from src.llms import groqllm
+
+    distribution = latency if isinstance(latency, Latency) else Latency(latency, seed)
+    clients = {}
+
+    def get_client(model: str = groqllm.DEFAULT_MODEL, **options):
+        key = (model, tuple(sorted(options.items())))
+        if key not in clients:
+            clients[key] = FakeChatModel(model=model, latency=distribution)
+        return clients[key]
+
+    groqllm.get_client = get_client
+
+
+class FakeTrackingBackend:
+    """Synthetic parcels ``TRK000000``..; every lookup sleeps for one latency sample."""
+
+    def __init__(self, parcels: int = 10000, latency: Latency = None):
+        from src.utils.trackingBackend import MemoryTrackingBackend
+        statuses = ("In transit", "Out for delivery", "Delivered", "Held at customs")
+        self._backend = MemoryTrackingBackend({
+            f"TRK{i:06d}": f"{statuses[i % len(statuses)]}, last scan hub {i % 37}"
+            for i in range(parcels)
+        })
+        self.latency = latency
+
+    def lookup_many(self, tracking_numbers):
+        if self.latency is not None:
+            time.sleep(self.latency.sample())
+        return self._backend.lookup_many(tracking_numbers)
+
+    def lookup(self, tracking_number):
+        from src.utils.trackingBackend import TrackingBackend
+        return TrackingBackend.lookup(self, tracking_number)
+
+
+def install_fake_tools(latency="const:0", seed: int = 1, parcels: int = 10000) -> None:
+    """
+    Replace the real tool backends so benchmarks run offline and repeatably.
+
+    Tracking lookups go to a synthetic ``FakeTrackingBackend``. ETA estimates
+    get the demo answer instead of a ``SPARROW_ETA_TABLE`` lane table, and
+    user profiles come from ``DemoProfileBackend`` instead of
+    ``SPARROW_USER_PROFILE_BACKEND``; both tools get the sampled delay
+    wrapped around their function. ``think_tool`` stays instant.
+    """
+    from src.utils import etaEngine, trackingBackend, userProfiles, utils
+
+    distribution = latency if isinstance(latency, Latency) else Latency(latency, seed)
+    trackingBackend.tracking_backend = FakeTrackingBackend(parcels, distribution)
+    utils.tracking_backend = trackingBackend.tracking_backend
+    etaEngine.eta_table = utils.eta_table = None
+    userProfiles.user_profiles.backend = userProfiles.DemoProfileBackend()
+
+    def delayed(fn):
+        def wrapper(*args, **kwargs):
+            time.sleep(distribution.sample())
+            return fn(*args, **kwargs)
+        return wrapper
+
+    for tool in (utils.get_user_information, utils.estimated_time_analysis):
+        if not getattr(tool.func, "_fake_latency", False):
+            tool.func = delayed(tool.func)
+            tool.func._fake_latency = True
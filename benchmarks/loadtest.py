@@ -0,0 +1,339 @@
+"""
+HTTP load test: replay multi-turn sessions against /chat and /new_conversation.
+
+Sessions start at a target arrival rate (seeded Poisson arrivals, open
+loop: a slow server does not slow the arrivals down). Each session has its
+own cookie jar, so the signed session cookie (Flask or Starlette) and hence
+the conversation ``thread_id`` carry across its turns. It opens with
+``/new_conversation`` and sends its turns one after another. By default the
+server under test is started here against the offline fakes (see
+``benchmarks.serve``); ``--url`` targets an already running server instead.
+
+    python -m benchmarks.loadtest --app flask --rate 5 --duration 60
+    python -m benchmarks.loadtest --app asgi --rate 20 --duration 60 --sessions-file sessions.jsonl
+    python -m benchmarks.loadtest --compare before.json after.json
+
+``--sessions-file`` is JSONL, one session per line: ``{"turns": ["...", ...]}``
+(a bare list of messages also works). The report covers latency percentiles
+and error rates per endpoint, ``thread_id`` mismatches within a session,
+plus the server's RSS and ``active_conversations`` sampled over the run.
+``--json`` writes it under ``--label`` (default: the current git commit) so
+builds can be compared with ``--compare``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.pipeline import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Synthetic conversations; {a}/{b} become tracking numbers of the fake backend
+SYNTHETIC_SESSIONS = (
+    ["Hi, I want to track my parcel {a}", "Yes, that's the right number, go ahead",
+     "Thanks. When will it reach Kandy?"],
+    ["{a}"],
+    ["Where are my packages {a} and {b}?", "Yes please, check both of them"],
+    ["I need an estimate for shipping from Colombo to Jaffna", "It's a 2kg box, standard delivery is fine"],
+    ["Can you look up my account details, user id U12345?", "Yes, that's me"],
+)
+
+
+def synthetic_sessions(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    sessions = []
+    for _ in range(count):
+        turns = rng.choice(SYNTHETIC_SESSIONS)
+        numbers = {"a": f"TRK{rng.randrange(10000):06d}", "b": f"TRK{rng.randrange(10000):06d}"}
+        sessions.append([turn.format(**numbers) for turn in turns])
+    return sessions
+
+
+def load_sessions(path: str) -> list:
+    sessions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                sessions.append(entry["turns"] if isinstance(entry, dict) else entry)
+    return sessions
+
+
+def rss_bytes(pid: int):
+    """Resident set size of ``pid`` from /proc (Linux); None elsewhere."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args) -> tuple:
+    """Start ``benchmarks.serve`` in a child process; returns (process, base url)."""
+    port = args.port or free_port()
+    command = [
+        sys.executable, "-m", "benchmarks.serve", "--app", args.app, "--port", str(port),
+        "--llm-latency", args.llm_latency, "--tool-latency", args.tool_latency, "--seed", str(args.seed),
+    ]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup:\n{process.stderr.read().decode()[-2000:]}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Server did not answer /health within {args.startup_timeout}s")
+
+
+def git_label() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class LoadTest:
+    """Open-loop session driver; collects one record per HTTP request."""
+
+    def __init__(self, url: str, sessions: list, rate: float, duration: float, timeout: float,
+                 think_time: float, seed: int, pid: int = None, sample_interval: float = 1.0):
+        self.url = url
+        self.sessions = sessions
+        self.rate = rate
+        self.duration = duration
+        self.timeout = timeout
+        self.think_time = think_time
+        self.pid = pid
+        self.sample_interval = sample_interval
+        self._random = random.Random(seed)
+        self.requests = []  # (endpoint, seconds, ok)
+        self.samples = []   # {"t", "rss_bytes", "active_conversations", "in_flight"}
+        self.sessions_started = 0
+        self.sessions_completed = 0
+        self.thread_mismatches = 0
+        self.in_flight = 0
+
+    async def _post(self, client: httpx.AsyncClient, endpoint: str, payload: dict = None):
+        started = time.perf_counter()
+        try:
+            response = await client.post(endpoint, json=payload)
+            body = response.json()
+            ok = response.status_code == 200 and body.get("success", False)
+        except (httpx.HTTPError, ValueError):
+            body, ok = {}, False
+        self.requests.append((endpoint, time.perf_counter() - started, ok))
+        return body if ok else None
+
+    async def _session(self, turns: list) -> None:
+        self.sessions_started += 1
+        self.in_flight += 1
+        try:
+            # One client per session: its cookie jar keeps the conversation thread
+            async with httpx.AsyncClient(base_url=self.url, timeout=self.timeout) as client:
+                await self._post(client, "/new_conversation")
+                thread_ids = set()
+                for turn in turns:
+                    body = await self._post(client, "/chat", {"message": turn})
+                    if body is None:
+                        return
+                    thread_ids.add(body.get("thread_id"))
+                    if self.think_time:
+                        await asyncio.sleep(self._random.expovariate(1 / self.think_time))
+                if len(thread_ids) > 1:
+                    self.thread_mismatches += 1
+                self.sessions_completed += 1
+        finally:
+            self.in_flight -= 1
+
+    async def _sample(self, started: float, stop: asyncio.Event) -> None:
+        async with httpx.AsyncClient(base_url=self.url, timeout=self.timeout) as client:
+            while True:
+                try:
+                    active = (await client.get("/health")).json().get("active_conversations")
+                except (httpx.HTTPError, ValueError):
+                    active = None
+                self.samples.append({
+                    "t": round(time.perf_counter() - started, 2),
+                    "rss_bytes": rss_bytes(self.pid) if self.pid else None,
+                    "active_conversations": active,
+                    "in_flight": self.in_flight,
+                })
+                try:
+                    await asyncio.wait_for(stop.wait(), self.sample_interval)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run(self) -> float:
+        started = time.perf_counter()
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(self._sample(started, stop))
+        tasks, index, next_arrival = [], 0, 0.0
+        while next_arrival < self.duration:
+            delay = started + next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self._session(self.sessions[index % len(self.sessions)])))
+            index += 1
+            next_arrival += self._random.expovariate(self.rate)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+        return elapsed
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted({r[0] for r in self.requests}):
+            records = [r for r in self.requests if r[0] == endpoint]
+            latencies = [seconds for _, seconds, _ in records]
+            errors = sum(1 for *_, ok in records if not ok)
+            endpoints[endpoint] = {
+                "requests": len(records),
+                "errors": errors,
+                "error_rate": errors / len(records),
+                "requests_per_s": len(records) / elapsed,
+                "latency_ms": {
+                    "mean": statistics.fmean(latencies) * 1000,
+                    "p50": percentile(latencies, 50) * 1000,
+                    "p95": percentile(latencies, 95) * 1000,
+                    "p99": percentile(latencies, 99) * 1000,
+                    "max": max(latencies) * 1000,
+                },
+            }
+        rss = [s["rss_bytes"] for s in self.samples if s["rss_bytes"]]
+        return {
+            "elapsed_s": elapsed,
+            "sessions_started": self.sessions_started,
+            "sessions_completed": self.sessions_completed,
+            "thread_mismatches": self.thread_mismatches,
+            "endpoints": endpoints,
+            "rss_mb": {
+                "start": rss[0] / 2 ** 20 if rss else None,
+                "peak": max(rss) / 2 ** 20 if rss else None,
+                "end": rss[-1] / 2 ** 20 if rss else None,
+            },
+            "samples": self.samples,
+        }
+
+
+def print_report(report: dict) -> None:
+    print(f"build={report['label']} app={report['app']} rate={report['rate']}/s duration={report['duration']}s "
+          f"llm={report['llm_latency']}")
+    print(f"sessions        {report['sessions_completed']}/{report['sessions_started']} completed, "
+          f"{report['thread_mismatches']} thread_id mismatches, {report['elapsed_s']:.1f}s")
+    print(f"{'endpoint':<20}{'reqs':>7}{'err%':>7}{'req/s':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for endpoint, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{endpoint:<20}{stats['requests']:>7}{stats['error_rate'] * 100:>6.1f}%{stats['requests_per_s']:>8.1f}"
+              f"{latency['p50']:>8.1f}ms{latency['p95']:>8.1f}ms{latency['p99']:>8.1f}ms")
+    rss = report["rss_mb"]
+    if rss["start"] is not None:
+        print(f"rss             start {rss['start']:.1f}MB  peak {rss['peak']:.1f}MB  end {rss['end']:.1f}MB")
+    active = [s["active_conversations"] for s in report["samples"] if s["active_conversations"] is not None]
+    if active:
+        print(f"conversations   {active[0]} -> {active[-1]} active")
+
+
+def compare(paths: list) -> None:
+    """Side-by-side /chat latency, error rate and RSS of several saved reports."""
+    reports = []
+    for path in paths:
+        with open(path) as f:
+            reports.append(json.load(f))
+    print(f"{'build':<14}{'chat p50':>10}{'chat p95':>10}{'chat p99':>10}{'err%':>7}{'rss peak':>10}")
+    for report in reports:
+        chat = report["endpoints"].get("/chat", {})
+        latency = chat.get("latency_ms", {})
+        peak = report["rss_mb"]["peak"]
+        print(f"{report['label']:<14}{latency.get('p50', 0):>8.1f}ms{latency.get('p95', 0):>8.1f}ms"
+              f"{latency.get('p99', 0):>8.1f}ms{chat.get('error_rate', 0) * 100:>6.1f}%"
+              f"{(f'{peak:.1f}MB' if peak is not None else '-'):>10}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", choices=("flask", "asgi"), default="flask", help="server to start")
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--pid", type=int, help="with --url: process to sample RSS from")
+    parser.add_argument("--port", type=int, help="port for the started server (default: any free port)")
+    parser.add_argument("--rate", type=float, default=2.0, help="new sessions per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds during which sessions start")
+    parser.add_argument("--sessions-file", help="JSONL of recorded sessions (default: synthetic)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between a session's turns")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout")
+    parser.add_argument("--llm-latency", default="lognormal:-1.2,0.4")
+    parser.add_argument("--tool-latency", default="const:0.02")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--label", help="build label in the report (default: git commit)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT", help="compare saved reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.compare)
+        return 0
+
+    sessions = (load_sessions(args.sessions_file) if args.sessions_file
+                else synthetic_sessions(max(1, int(args.rate * args.duration) + 1), args.seed))
+
+    process = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), args.pid
+    else:
+        process, url = start_server(args)
+        pid = process.pid
+    try:
+        test = LoadTest(url, sessions, args.rate, args.duration, args.timeout, args.think_time, args.seed,
+                        pid=pid, sample_interval=args.sample_interval)
+        elapsed = asyncio.run(test.run())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    report = {
+        "label": args.label or git_label(),
+        "app": "external" if args.url else args.app,
+        "rate": args.rate,
+        "duration": args.duration,
+        "llm_latency": args.llm_latency,
+        "tool_latency": args.tool_latency,
+        **test.report(elapsed),
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
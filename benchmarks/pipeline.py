@@ -0,0 +1,263 @@
+"""
+End-to-end pipeline benchmark against the offline fake LLM and tool backends.
+
+Runs one of the compiled graphs (``sparrow``: the full agent, ``master``:
+planner + workers + synthesis, ``executor``: one worker) many times and
+reports throughput, latency percentiles, fake LLM calls per request and
+per-node time. Model and tool latencies are sampled from seeded
+distributions (see ``benchmarks.fakes``), so two runs with the same flags do
+the same work. Run from the repo root:
+
+    python -m benchmarks.pipeline --graph sparrow --mode async --requests 200 --concurrency 16
+    python -m benchmarks.pipeline --graph executor --mode threaded --llm-latency lognormal:-1.5,0.5
+    python -m benchmarks.pipeline --graph master --llm-latency const:0 --max-p95-ms 50   # CI overhead gate
+
+Modes: ``sync`` invokes one request at a time, ``threaded`` invokes from a
+thread pool of ``--concurrency`` threads, ``async`` runs ``ainvoke`` with at
+most ``--concurrency`` requests in flight. ``--max-p95-ms`` / ``--min-rps``
+make the command exit non-zero when the run is slower than the given bounds.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+GRAPHS = ("sparrow", "master", "executor")
+MODES = ("sync", "threaded", "async")
+
+# Briefs cycle per request; parcel numbers change every request so the
+# tool cache only helps when two requests really ask for the same parcel
+QUERIES = (
+    "Track my parcel {a}",
+    "Track parcels {a} and {b} and find the delivery estimate to Kandy",
+    "Where are my packages {a}, {b}, {c}, {d} and {e}? Please track the parcels",
+)
+
+CLARIFICATION = "Could you confirm the tracking numbers before I look them up?"
+CONFIRMATION = "Yes, those are right, go ahead"
+
+
+def parcels(index: int, parcel_count: int) -> dict:
+    return {key: f"TRK{(index * 5 + offset) % parcel_count:06d}" for offset, key in enumerate("abcde")}
+
+
+def make_input(graph: str, index: int, parcel_count: int) -> dict:
+    """Initial state for request ``index`` of ``graph``."""
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    query = QUERIES[index % len(QUERIES)].format(**parcels(index, parcel_count))
+    if graph == "executor":
+        return {"executor_messages": [HumanMessage(content=query)], "execution_job": "track_package",
+                "executor_data": []}
+    if graph == "master":
+        return {"query_brief": query, "execution_jobs": [], "completed_jobs": [], "worker_outputs": [],
+                "final_output": ""}
+    # A confirmed request, so the clarification step moves on to the brief
+    return {"messages": [HumanMessage(content=query), AIMessage(content=CLARIFICATION),
+                         HumanMessage(content=CONFIRMATION)]}
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+class Runner:
+    """Issues requests against one compiled graph and records per-request latency."""
+
+    def __init__(self, graph_name: str, parcel_count: int):
+        from src.graphs.graphRegistry import get_graph
+        from src.utils.metrics import MetricsRegistry
+        from src.utils.tracing import MetricsCallbackHandler, SpanLog
+
+        self.graph_name = graph_name
+        self.graph = get_graph(graph_name)
+        self.parcel_count = parcel_count
+        # A private registry, so per-node numbers cover this run only
+        self.registry = MetricsRegistry()
+        self._handler = lambda thread_id: MetricsCallbackHandler(thread_id, registry=self.registry,
+                                                                 log=SpanLog(""))
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _config(self) -> dict:
+        thread_id = str(uuid.uuid4())
+        return {"configurable": {"thread_id": thread_id}, "callbacks": [self._handler(thread_id)]}
+
+    def _record(self, started: float, result) -> None:
+        failed = result is None or (
+            (self.graph_name == "sparrow" and not result.get("messages"))
+            or (self.graph_name == "master" and not result.get("final_output"))
+        )
+        with self._lock:
+            self.latencies.append(time.perf_counter() - started)
+            self.errors += failed
+
+    def invoke(self, index: int) -> None:
+        started = time.perf_counter()
+        try:
+            result = self.graph.invoke(make_input(self.graph_name, index, self.parcel_count), self._config())
+        except Exception:
+            logger.exception("Benchmark request %s failed", index)
+            result = None
+        self._record(started, result)
+
+    async def ainvoke(self, index: int) -> None:
+        started = time.perf_counter()
+        try:
+            result = await self.graph.ainvoke(make_input(self.graph_name, index, self.parcel_count),
+                                              self._config())
+        except Exception:
+            logger.exception("Benchmark request %s failed", index)
+            result = None
+        self._record(started, result)
+
+    def run(self, mode: str, start: int, requests: int, concurrency: int) -> None:
+        indexes = range(start, start + requests)
+        if mode == "sync":
+            for index in indexes:
+                self.invoke(index)
+        elif mode == "threaded":
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(self.invoke, indexes))
+        else:
+            async def drive():
+                slots = asyncio.Semaphore(concurrency)
+
+                async def one(index):
+                    async with slots:
+                        await self.ainvoke(index)
+
+                await asyncio.gather(*(one(index) for index in indexes))
+
+            asyncio.run(drive())
+
+    def node_times(self) -> dict:
+        """Inclusive wall time per node (a subgraph node includes its children)."""
+        series = self.registry.snapshot().get("node_duration_seconds", {})
+        return {
+            labels.split("=", 1)[1]: {"count": value["count"], "total_s": value["sum"],
+                                      "mean_ms": value["sum"] / value["count"] * 1000}
+            for labels, value in series.items() if value["count"]
+        }
+
+
+def benchmark(args) -> dict:
+    from benchmarks.fakes import install_fake_llm, install_fake_tools, llm_calls
+
+    install_fake_llm(args.llm_latency, seed=args.seed)
+    install_fake_tools(args.tool_latency, seed=args.seed + 1, parcels=args.parcels)
+
+    if not args.tool_cache:
+        from src.nodes.actionNode import tool_cache
+        tool_cache.ttls = {}
+
+    runner = Runner(args.graph, args.parcels)
+    # Warm-up requests build the graphs and fill import caches; not measured
+    runner.run(args.mode, 0, args.warmup, args.concurrency)
+    runner.latencies.clear()
+    runner.errors = 0
+    runner.registry.reset()
+    llm_calls.reset()
+
+    started = time.perf_counter()
+    runner.run(args.mode, args.warmup, args.requests, args.concurrency)
+    elapsed = time.perf_counter() - started
+
+    latencies = runner.latencies
+    return {
+        "graph": args.graph,
+        "mode": args.mode,
+        "concurrency": args.concurrency if args.mode != "sync" else 1,
+        "requests": args.requests,
+        "errors": runner.errors,
+        "llm_latency": args.llm_latency,
+        "tool_latency": args.tool_latency,
+        "elapsed_s": elapsed,
+        "requests_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": max(latencies, default=0.0) * 1000,
+        },
+        "llm_calls_per_request": llm_calls.total() / args.requests if args.requests else 0.0,
+        "llm_calls": dict(llm_calls.counts),
+        "nodes": runner.node_times(),
+    }
+
+
+def report(result: dict) -> None:
+    latency = result["latency_ms"]
+    print(f"graph={result['graph']} mode={result['mode']} concurrency={result['concurrency']} "
+          f"llm={result['llm_latency']} tools={result['tool_latency']}")
+    print(f"requests        {result['requests']} ({result['errors']} errors) in {result['elapsed_s']:.2f}s")
+    print(f"throughput      {result['requests_per_s']:.1f} req/s")
+    print(f"latency         p50 {latency['p50']:.1f}ms  p95 {latency['p95']:.1f}ms  "
+          f"p99 {latency['p99']:.1f}ms  max {latency['max']:.1f}ms")
+    print(f"llm calls/req   {result['llm_calls_per_request']:.2f} {result['llm_calls']}")
+    print()
+    print(f"{'node':<28}{'runs':>8}{'mean':>12}{'total':>12}")
+    for node, stats in sorted(result["nodes"].items(), key=lambda item: -item[1]["total_s"]):
+        print(f"{node:<28}{stats['count']:>8}{stats['mean_ms']:>10.1f}ms{stats['total_s']:>11.2f}s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--graph", choices=GRAPHS, default="sparrow")
+    parser.add_argument("--mode", choices=MODES, default="sync")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=3, help="unmeasured requests before the run")
+    parser.add_argument("--llm-latency", default="const:0", help="e.g. const:0.2, uniform:0.1,0.4, lognormal:-1.2,0.4")
+    parser.add_argument("--tool-latency", default="const:0")
+    parser.add_argument("--parcels", type=int, default=10000, help="size of the fake tracking backend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tool-cache", action="store_true", help="keep the tool result cache on")
+    parser.add_argument("--max-p95-ms", type=float, help="fail when p95 latency is above this")
+    parser.add_argument("--min-rps", type=float, help="fail when throughput is below this")
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args()
+
+    # Settings read at import time, so they must be in place before src is imported
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["SPARROW_CONVERSATION_DB"] = ""
+    os.environ["SPARROW_RESPONSE_CACHE_DB"] = ""
+    os.environ.setdefault("SPARROW_LOG_LEVEL", "WARNING")
+    from src.utils.logger import configure_logging
+    configure_logging()
+
+    result = benchmark(args)
+    report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failures = []
+    if args.max_p95_ms is not None and result["latency_ms"]["p95"] > args.max_p95_ms:
+        failures.append(f"p95 {result['latency_ms']['p95']:.1f}ms > {args.max_p95_ms}ms")
+    if args.min_rps is not None and result["requests_per_s"] < args.min_rps:
+        failures.append(f"throughput {result['requests_per_s']:.1f} req/s < {args.min_rps} req/s")
+    if result["errors"]:
+        failures.append(f"{result['errors']} failed requests")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
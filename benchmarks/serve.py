@@ -0,0 +1,46 @@
+"""
+Serve ``app.py`` (Flask) or ``server.py`` (FastAPI) against the offline fakes.
+
+Used by ``benchmarks.loadtest`` to start the process under test; it can also
+be run by hand:
+
+    python -m benchmarks.serve --app flask --port 5055 --llm-latency lognormal:-1.2,0.4
+"""
+import argparse
+import os
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--llm-latency", default="const:0")
+    parser.add_argument("--tool-latency", default="const:0")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Settings read at import time; the conversation store and response cache
+    # stay in memory unless the caller points them at files explicitly
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("SPARROW_CONVERSATION_DB", "")
+    os.environ.setdefault("SPARROW_RESPONSE_CACHE_DB", "")
+    os.environ.setdefault("SPARROW_LOG_LEVEL", "WARNING")
+
+    from benchmarks.fakes import install_fake_llm, install_fake_tools
+    install_fake_llm(args.llm_latency, seed=args.seed)
+    install_fake_tools(args.tool_latency, seed=args.seed + 1)
+
+    if args.app == "flask":
+        import app
+        if app.WARMUP:
+            app.warmup()
+        app.app.run(host=args.host, port=args.port, threaded=True, use_reloader=False)
+    else:
+        import uvicorn
+        import server
+        uvicorn.run(server.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
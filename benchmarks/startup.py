@@ -0,0 +1,107 @@
+"""
+Startup benchmark: import time, graph warmup and first-request latency.
+
+Each run starts a fresh interpreter, imports ``app`` (the Flask server),
+optionally warms the graph registry up, then sends two ``/chat`` requests
+through the test client against the offline fake LLM. Run from the repo
+root:
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --warmup --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_MESSAGE = "I want to send a parcel to Kandy"
+SECOND_MESSAGE = "It weighs 2kg, please go ahead"
+
+
+def child(warmup: bool) -> dict:
+    """One cold start, measured from inside the fresh interpreter."""
+    timings = {}
+    started = time.perf_counter()
+
+    from benchmarks.fakes import install_fake_llm
+    install_fake_llm()
+
+    import app
+    timings["import_s"] = time.perf_counter() - started
+
+    if warmup:
+        mark = time.perf_counter()
+        app.warmup()
+        timings["warmup_s"] = time.perf_counter() - mark
+
+    client = app.app.test_client()
+    for key, message in (("first_request_s", FIRST_MESSAGE), ("second_request_s", SECOND_MESSAGE)):
+        mark = time.perf_counter()
+        response = client.post("/chat", json={"message": message})
+        timings[key] = time.perf_counter() - mark
+        if not response.get_json().get("success"):
+            raise RuntimeError(f"/chat failed: {response.get_json()}")
+
+    timings["total_s"] = time.perf_counter() - started
+    return timings
+
+
+def run(runs: int, warmup: bool) -> list:
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "benchmark"),
+        # Keep benchmark runs away from the local databases
+        "SPARROW_CONVERSATION_DB": "",
+        "SPARROW_RESPONSE_CACHE_DB": "",
+        "SPARROW_LOG_LEVEL": "WARNING",
+    }
+    results = []
+    for _ in range(runs):
+        command = [sys.executable, "-m", "benchmarks.startup", "--child"] + (["--warmup"] if warmup else [])
+        started = time.perf_counter()
+        output = subprocess.run(command, cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+        timings = json.loads(output.strip().splitlines()[-1])
+        timings["process_s"] = time.perf_counter() - started
+        results.append(timings)
+    return results
+
+
+def summarise(results: list) -> dict:
+    return {
+        key: {
+            "median": statistics.median(r[key] for r in results),
+            "min": min(r[key] for r in results),
+            "max": max(r[key] for r in results),
+        }
+        for key in results[0]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="build the graphs before the first request")
+    parser.add_argument("--json", help="also write the summary to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.warmup)))
+        return
+
+    summary = summarise(run(args.runs, args.warmup))
+    print(f"{'metric':<20}{'median':>10}{'min':>10}{'max':>10}")
+    for key, stats in summary.items():
+        print(f"{key:<20}{stats['median'] * 1000:>9.1f}ms{stats['min'] * 1000:>8.1f}ms{stats['max'] * 1000:>8.1f}ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": args.runs, "warmup": args.warmup, "summary": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Tracking store benchmark: bulk event ingestion and lookup latency.
+
+Writes a synthetic carrier event file (CSV), ingests it into a fresh SQLite
+store with ``src.utils.trackingIngest`` and then times single-parcel and
+batched lookups of random tracking numbers (hits and misses). Run from the
+repo root:
+
+    python -m benchmarks.tracking --parcels 200000 --events-per-parcel 5
+    python -m benchmarks.tracking --parcels 1000000 --lookups 20000 --json tracking.json
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.pipeline import percentile
+
+STATUSES = ("Picked up", "Arrived at hub", "Departed hub", "Out for delivery", "Delivered")
+LOCATIONS = ("Colombo", "Kandy", "Galle", "Jaffna", "Negombo", "Kurunegala")
+CARRIERS = ("SparrowExpress", "LankaPost", "DHL")
+
+
+def write_events(path: str, parcels: int, per_parcel: int, seed: int) -> int:
+    """Scan events for ``parcels`` parcels, interleaved in time like a real feed."""
+    rng = random.Random(seed)
+    start = 1_750_000_000
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["tracking_number", "event_time", "status", "location", "carrier"])
+        for step in range(per_parcel):
+            status = STATUSES[min(step, len(STATUSES) - 1)]
+            for i in range(parcels):
+                writer.writerow([
+                    f"TRK{i:08d}", start + step * 3600 + rng.randrange(3600), status,
+                    rng.choice(LOCATIONS), CARRIERS[i % len(CARRIERS)],
+                ])
+    return parcels * per_parcel
+
+
+def time_lookups(backend, parcels: int, lookups: int, batch: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(lookups):
+        # One in ten numbers does not exist
+        numbers = [f"TRK{rng.randrange(int(parcels * 1.1)):08d}" for _ in range(batch)]
+        started = time.perf_counter()
+        backend.lookup_many(numbers)
+        timings.append(time.perf_counter() - started)
+    return {
+        "batch": batch,
+        "lookups": lookups,
+        "p50_us": percentile(timings, 50) * 1e6,
+        "p95_us": percentile(timings, 95) * 1e6,
+        "p99_us": percentile(timings, 99) * 1e6,
+        "lookups_per_s": lookups / sum(timings),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--parcels", type=int, default=200000)
+    parser.add_argument("--events-per-parcel", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, help="ingest batch size (default: SPARROW_TRACKING_INGEST_BATCH)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    from src.utils.trackingBackend import SQLiteTrackingBackend
+    from src.utils.trackingIngest import INGEST_BATCH, ingest, read_events
+
+    with tempfile.TemporaryDirectory() as directory:
+        events_path = os.path.join(directory, "events.csv")
+        events = write_events(events_path, args.parcels, args.events_per_parcel, args.seed)
+        backend = SQLiteTrackingBackend(os.path.join(directory, "tracking.db"))
+
+        ingested = ingest(backend, read_events(events_path), args.batch_size or INGEST_BATCH)
+        # Second pass over the same file: every event is a duplicate
+        reingested = ingest(backend, read_events(events_path), args.batch_size or INGEST_BATCH)
+        lookups = [time_lookups(backend, args.parcels, args.lookups, batch, args.seed) for batch in (1, 50)]
+        database_mb = os.path.getsize(os.path.join(directory, "tracking.db")) / 2 ** 20
+
+    print(f"events          {events} ({args.parcels} parcels x {args.events_per_parcel}), store {database_mb:.0f}MB")
+    print(f"ingest          {ingested['events_per_s']:,.0f} events/s ({ingested['seconds']:.1f}s)")
+    print(f"re-ingest       {reingested['events_per_s']:,.0f} events/s, {reingested['duplicates']} duplicates ignored")
+    for result in lookups:
+        print(f"lookup x{result['batch']:<7} p50 {result['p50_us']:.0f}us  p95 {result['p95_us']:.0f}us  "
+              f"p99 {result['p99_us']:.0f}us  ({result['lookups_per_s']:,.0f}/s)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"events": events, "ingest": ingested, "reingest": reingested, "lookups": lookups}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+ASGI entry point for the Sparrow Agent.
+
+Serves the same API as app.py, but drives ``sparrowAgent.ainvoke`` /
+``sparrowAgent.astream`` on the event loop, so a request waiting on Groq
+does not hold an OS thread. Run with:
+
+    uvicorn server:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import logging
+import os
+import secrets
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.middleware.sessions import SessionMiddleware
+
+from src.graphs.graphRegistry import get_graph, warmup
+from src.nodes.routerNode import intent_router
+from src.utils.metrics import metrics
+from src.utils.logger import configure_logging, bind_thread_id
+from src.utils.conversation import (
+    get_conversations, get_or_create_conversation, checkpoint_in_sync, build_sparrow_input, extract_response,
+    save_result, graph_config, load_user_profile, session_user_id, ndjson, stream_events, closing_events, error_event
+)
+
+# Queue-backed logging with per-module levels and thread_id correlation
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Build the graphs at server start instead of on the first request
+WARMUP = os.environ.get('SPARROW_WARMUP', '1') not in ('0', 'false', 'no')
+
+
+def agent():
+    """The compiled Sparrow agent (built once, on first use or at warmup)"""
+    return get_graph('sparrow')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the graphs before the first request is accepted"""
+    if WARMUP:
+        logger.info("Graphs built in %s", warmup())
+    yield
+
+
+# Key signing the session cookie; without one, sessions only last until the process restarts
+SESSION_SECRET = os.environ.get('SPARROW_SESSION_SECRET') or os.environ.get('FLASK_SECRET_KEY')
+if not SESSION_SECRET:
+    logger.warning("SPARROW_SESSION_SECRET is not set; using a random session key for this process")
+    SESSION_SECRET = secrets.token_hex(32)
+
+app = FastAPI(title="Sparrow Agent", lifespan=lifespan)
+# Signed cookie session, the counterpart of Flask's session in app.py
+app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
+
+def get_thread_id(request: Request):
+    """Return the thread id bound to the signed session, binding a fresh one if needed"""
+    thread_id = request.session.get('thread_id')
+    if not thread_id:
+        thread_id = str(uuid.uuid4())
+        request.session['thread_id'] = thread_id
+    return thread_id
+
+
+def get_user_id(request: Request, data: dict):
+    """The signed-in user, from the signed session (see conversation.session_user_id)"""
+    return session_user_id(request.session, data, request.headers.get('authorization'))
+
+
+async def get_user_profile(user_id):
+    """Profile summary for the executors (see app.get_user_profile); the lookup may block, so off the loop"""
+    return await asyncio.to_thread(load_user_profile, user_id) if user_id else ''
+
+
+@app.get('/')
+async def index():
+    """Serve the main chat interface"""
+    return FileResponse(INDEX_PATH)
+
+
+@app.post('/chat')
+async def chat(request: Request):
+    """Handle chat messages"""
+    thread_id = get_thread_id(request)
+    bind_thread_id(thread_id)
+    try:
+        data = await request.json()
+        user_message = data.get('message', '').strip()
+        
+        if not user_message:
+            return JSONResponse({'success': False, 'error': 'Empty message'})
+        
+        user_id = get_user_id(request, data)
+        user_profile = await get_user_profile(user_id)
+        # The conversation store may be SQLite-backed; keep it off the event loop
+        conversation = await asyncio.to_thread(get_or_create_conversation, thread_id)
+        checkpoint = await agent().aget_state(graph_config(thread_id))
+        in_sync = checkpoint_in_sync(checkpoint.values, conversation)
+        sparrow_input = await asyncio.to_thread(build_sparrow_input, thread_id, conversation, user_message, in_sync)
+        
+        logger.info("Processing message: %.200s", user_message)
+        
+        result = await agent().ainvoke(sparrow_input, config=graph_config(thread_id, user_profile))
+        
+        response_message, status_info = extract_response(result, user_message)
+        await asyncio.to_thread(save_result, thread_id, conversation, result)
+        
+        logger.info("Response generated: %.100s", response_message)
+        
+        response = JSONResponse({
+            'success': True,
+            'response': response_message,
+            'status': status_info,
+            'thread_id': thread_id
+        })
+        
+    except Exception as e:
+        logger.error("Error in chat endpoint: %s", e, exc_info=True)
+        response = JSONResponse({
+            'success': False,
+            'error': f"An error occurred: {str(e)}"
+        })
+    
+    return response
+
+
+@app.post('/chat/stream')
+async def chat_stream(request: Request):
+    """Handle chat messages as a newline-delimited JSON stream (see app.chat_stream)"""
+    thread_id = get_thread_id(request)
+    bind_thread_id(thread_id)
+    data = await request.json()
+    user_message = data.get('message', '').strip()
+    
+    if not user_message:
+        return StreamingResponse(
+            iter([ndjson({'type': 'error', 'success': False, 'error': 'Empty message'})]),
+            media_type='application/x-ndjson'
+        )
+    
+    user_id = get_user_id(request, data)
+    user_profile = await get_user_profile(user_id)
+    conversation = await asyncio.to_thread(get_or_create_conversation, thread_id)
+    checkpoint = await agent().aget_state(graph_config(thread_id))
+    in_sync = checkpoint_in_sync(checkpoint.values, conversation)
+    sparrow_input = await asyncio.to_thread(build_sparrow_input, thread_id, conversation, user_message, in_sync)
+    
+    logger.info("Streaming message: %.200s", user_message)
+    
+    async def generate():
+        # The response body is produced after the endpoint returns
+        bind_thread_id(thread_id)
+        result = {}
+        streamed = False
+        try:
+            async for namespace, mode, chunk in agent().astream(
+                sparrow_input,
+                config=graph_config(thread_id, user_profile),
+                stream_mode=['updates', 'messages', 'values'],
+                subgraphs=True,
+            ):
+                # Only the top-level graph values make up the final state
+                if mode == 'values' and not namespace:
+                    result = chunk
+                for event in stream_events(mode, chunk):
+                    streamed = streamed or event['type'] == 'token'
+                    yield ndjson(event)
+            
+            response_message, status_info = extract_response(result, user_message)
+            await asyncio.to_thread(save_result, thread_id, conversation, result)
+            
+            logger.info("Streamed response: %.100s", response_message)
+            
+            for event in closing_events(thread_id, response_message, status_info, streamed):
+                yield ndjson(event)
+        
+        except Exception as e:
+            logger.error("Error in chat stream endpoint: %s", e, exc_info=True)
+            yield ndjson(error_event(e))
+    
+    return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+
+@app.post('/new_conversation')
+async def new_conversation(request: Request):
+    """Start a new conversation thread"""
+    # Clear the session thread and signed-in user
+    request.session.pop('thread_id', None)
+    request.session.pop('user_id', None)
+    return JSONResponse({'success': True, 'message': 'New conversation started'})
+
+
+@app.get('/health')
+async def health():
+    """Health check endpoint"""
+    return {
+        'status': 'healthy',
+        'timestamp': datetime.now().isoformat(),
+        'active_conversations': await asyncio.to_thread(lambda: len(get_conversations())),
+        'intent_router': intent_router.stats()
+    }
+
+
+
+@app.get('/metrics')
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: per-node latency, tokens, tool and cache counters"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+
+if __name__ == '__main__':
+    import uvicorn
+    
+    port = int(os.environ.get('PORT', 8000))
+    logger.info("Starting Sparrow Agent ASGI server on port %d", port)
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -1,8 +1,9 @@
 from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableLambda
 from src.states.actionState import ExecutorState, ExecutorOutputState
 
 from src.nodes.actionNode import ExecutorNode
-from src.llms.groqllm import GroqLLM
+from src.llms.modelPolicy import build_model_policy
 from src.utils.prompts import execution_agent_prompt, compress_execution_human_message, compress_execution_system_prompt
 
 from src.utils.utils import think_tool, track_package, get_user_information, estimated_time_analysis
@@ -11,8 +12,9 @@ tools = [think_tool, track_package, get_user_information, estimated_time_analysi
 
 
 class ExecutorGraphBuilder:
-    def __init__(self, llm ):
+    def __init__(self, llm, policy=None):
         self.llm = llm 
+        self.policy = policy
         self.graph = StateGraph(ExecutorState, output=ExecutorOutputState)
         self.tools = tools
         self.execution_agent_prompt = execution_agent_prompt
@@ -22,12 +24,16 @@ class ExecutorGraphBuilder:
     def build_executor_graph(self):
         """Build a graph to build the executor"""
         self.executor_node_obj = ExecutorNode(
-            self.llm, 
+            self.llm, policy=self.policy
         )
 
-        self.graph.add_node("llm_call", self.executor_node_obj.llm_call)
-        self.graph.add_node("tool_node", self.executor_node_obj.tool_node)
-        self.graph.add_node("compress_execution", self.executor_node_obj.compress_execution)
+        # Each node carries its async twin so the graph serves both invoke and ainvoke
+        self.graph.add_node("llm_call", RunnableLambda(
+            self.executor_node_obj.llm_call, afunc=self.executor_node_obj.allm_call))
+        self.graph.add_node("tool_node", RunnableLambda(
+            self.executor_node_obj.tool_node, afunc=self.executor_node_obj.atool_node))
+        self.graph.add_node("compress_execution", RunnableLambda(
+            self.executor_node_obj.compress_execution, afunc=self.executor_node_obj.acompress_execution))
 
         # Flow
         self.graph.add_edge(START, "llm_call")
@@ -48,8 +54,17 @@ class ExecutorGraphBuilder:
         return self.graph.compile()
 
 
-llm=GroqLLM().get_llm()
+def build_graph():
+    """Build and compile the executor graph (called once by the graph registry)."""
+    policy = build_model_policy()
+    graph_builder = ExecutorGraphBuilder(policy.models["fast"], policy)
+    # Worker runs are transient; checkpointer=False keeps them out of the parent's checkpoints
+    return graph_builder.build_executor_graph().compile(checkpointer=False)
 
-## Creating the graph
-graph_builder=ExecutorGraphBuilder(llm)
-graph=graph_builder.build_executor_graph().compile()
+
+def __getattr__(name):
+    # ``graph`` is built lazily through the registry instead of at import time
+    if name == "graph":
+        from src.graphs.graphRegistry import get_graph
+        return get_graph("executor")
+    raise AttributeError(name)
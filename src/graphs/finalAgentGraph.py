@@ -1,20 +1,20 @@
 # Updated Sparrow Agent with proper routing
 import asyncio
 import logging
-from src.graphs.masterGraph import master_graph
-from src.llms.groqllm import GroqLLM
+from src.graphs.graphRegistry import get_graph
+from src.llms.modelPolicy import build_model_policy
 from src.states.queryState import SparrowAgentState, SparrowInputState
 from langgraph.graph import StateGraph, START, END
 from src.states.masterState import MasterState
-from langgraph.checkpoint.memory import MemorySaver
+from src.utils.conversation import checkpointer
 from src.nodes.queryNode import QueryNode
+from src.nodes.routerNode import intent_router
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from src.nodes.masterNode import WORKER_CONCURRENCY_PER_REQUEST
 
 logger = logging.getLogger(__name__)
 
-llm = GroqLLM().get_llm()
-queryNode = QueryNode(llm)
-
 def convert_sparrow_to_master(state: SparrowAgentState) -> dict:
     """Convert SparrowAgentState to master graph input format"""
     return {
@@ -25,27 +25,34 @@ def convert_sparrow_to_master(state: SparrowAgentState) -> dict:
         "final_output": ''
     }
 
-def update_sparrow_from_master(sparrow_state: SparrowAgentState, master_state: dict) -> SparrowAgentState:
-    """Update sparrow state with master results"""
-    # Add the final result as a message and update notes
+def update_sparrow_from_master(master_state: dict) -> dict:
+    """
+    Sparrow state update for the master results.
+
+    Only the new values are returned; the ``messages`` and ``notes`` reducers
+    append them to the checkpointed conversation.
+    """
     from langchain_core.messages import AIMessage
     
+    update = {"messages": [], "notes": []}
+    
+    # Add the final result as a message
     final_output = master_state.get("final_output", "")
     if final_output:
-        sparrow_state["messages"] = sparrow_state.get("messages", []) + [AIMessage(content=final_output)]
-        sparrow_state["final_message"] = final_output
+        update["messages"].append(AIMessage(content=final_output))
+        update["final_message"] = final_output
         
     # Add execution details to notes
     execution_jobs = master_state.get("execution_jobs", [])
     completed_jobs = master_state.get("completed_jobs", [])
     
     if execution_jobs:
-        sparrow_state["notes"] = sparrow_state.get("notes", []) + [f"Execution jobs: {', '.join(execution_jobs)}"]
+        update["notes"].append(f"Execution jobs: {', '.join(execution_jobs)}")
     
     if completed_jobs:
-        sparrow_state["notes"] = sparrow_state.get("notes", []) + [f"Completed: {', '.join(completed_jobs)}"]
+        update["notes"].append(f"Completed: {', '.join(completed_jobs)}")
     
-    return sparrow_state
+    return update
 
 def route_after_clarification(state: SparrowAgentState) -> str:
     """Route based on clarification status from queryNode response"""
@@ -68,7 +75,7 @@ def route_after_clarification(state: SparrowAgentState) -> str:
     elif any("complete" in note.lower() or "sufficient" in note.lower() for note in clarification_notes):
         return "write_query_brief"
     elif len(messages) > 10:  # Prevent infinite clarification
-        print("Too many clarification rounds, proceeding to query brief")
+        logger.info("Too many clarification rounds, proceeding to query brief")
         return "write_query_brief"
     else:
         return "need_clarification"
@@ -80,95 +87,180 @@ def route_after_query_brief(state: SparrowAgentState) -> str:
     query_brief = state.get("query_brief", "")
     
     if query_brief and len(query_brief.strip()) > 20:  # Reasonable length check
-        print(f"Query brief created: {query_brief[:100]}...")
+        logger.debug("Query brief created: %.100s", query_brief)
         return "master_subgraph"
     else:
         # Check how many times we've tried
         messages = state.get("messages", [])
         if len(messages) > 15:  
-            print("Too many attempts, ending conversation")
+            logger.info("Too many attempts, ending conversation")
             return "__end__"
         
-        print("Query brief insufficient or missing, going back to clarification")
+        logger.info("Query brief insufficient or missing, going back to clarification")
         state["notes"] = state.get("notes", []) + ["Query brief creation failed, requesting more clarification"]
         return "clarify_with_user"
 
-def need_clarification(state: SparrowAgentState) -> SparrowAgentState:
+def need_clarification(state: SparrowAgentState) -> dict:
     """Handle case where clarification is needed"""
     from langchain_core.messages import AIMessage
     
-    print("Additional clarification needed.")
+    logger.debug("Additional clarification needed")
     
     # Add a message indicating we need more information
     clarification_msg = AIMessage(
         content="I need a bit more information to help you effectively. Could you provide more details about your request?"
     )
     
-    state["messages"] = state.get("messages", []) + [clarification_msg]
-    state["notes"] = state.get("notes", []) + ["Requested additional clarification from user"]
-    
-    return state
+    return {
+        "messages": [clarification_msg],
+        "notes": ["Requested additional clarification from user"]
+    }
+
+def master_config(config: RunnableConfig) -> RunnableConfig:
+    """
+    Config for the master subgraph run.
+
+    Caps how many workers one request may run at once; callers can override
+    the default with ``configurable.worker_concurrency``.
+    """
+    configurable = (config or {}).get("configurable", {})
+    return {
+        "max_concurrency": configurable.get("worker_concurrency", WORKER_CONCURRENCY_PER_REQUEST)
+    }
 
-def run_master_subgraph(state: SparrowAgentState) -> SparrowAgentState:
-    """Run the master subgraph - using sync version to avoid async issues with Send"""
+def run_master_subgraph(state: SparrowAgentState, config: RunnableConfig) -> dict:
+    """Run the master subgraph synchronously (used by sparrowAgent.invoke/stream)"""
     try:
-        print("Running master subgraph...")
+        logger.debug("Running master subgraph")
         master_input = convert_sparrow_to_master(state)
         
-        # Use invoke instead of ainvoke to avoid issues with Send
-        master_result = master_graph.invoke(master_input)
+        master_result = get_graph("master").invoke(master_input, config=master_config(config))
         
-        return update_sparrow_from_master(state, master_result)
+        return update_sparrow_from_master(master_result)
         
     except Exception as e:
-        logger.error(f"Master subgraph failed: {e}")
-        return {**state, "error": str(e)}
+        logger.error("Master subgraph failed: %s", e, exc_info=True)
+        return {"notes": [f"Master subgraph failed: {e}"]}
+
+async def arun_master_subgraph(state: SparrowAgentState, config: RunnableConfig) -> dict:
+    """
+    Run the master subgraph without blocking the event loop (used by sparrowAgent.ainvoke/astream).
+
+    Every master and worker node has an async variant, so the Send fan-out
+    runs as concurrent asyncio tasks instead of occupying a thread each.
+    """
+    try:
+        logger.debug("Running master subgraph")
+        master_input = convert_sparrow_to_master(state)
+        
+        master_result = await get_graph("master").ainvoke(master_input, config=master_config(config))
+        
+        return update_sparrow_from_master(master_result)
+        
+    except Exception as e:
+        logger.error("Master subgraph failed: %s", e, exc_info=True)
+        return {"notes": [f"Master subgraph failed: {e}"]}
 
 def route_after_need_clarification(state: SparrowAgentState) -> str:
     """Route after need_clarification node - always end to wait for user input"""
     return "__end__"
 
-# Build the graph
-sparrowAgentBuilder = StateGraph(SparrowAgentState, input_schema=SparrowInputState)
+def build_graph():
+    """Build and compile the top-level Sparrow agent (called once by the graph registry)."""
+    policy = build_model_policy()
+    queryNode = QueryNode(policy.models["fast"], policy=policy)
+    # Built together with the agent so the first master run doesn't pay for it
+    get_graph("master")
 
-sparrowAgentBuilder.add_node("clarify_with_user", queryNode.clarify_with_user)
-sparrowAgentBuilder.add_node("need_clarification", need_clarification)
-sparrowAgentBuilder.add_node("write_query_brief", queryNode.write_query_brief)
-sparrowAgentBuilder.add_node("master_subgraph", run_master_subgraph)
+    sparrowAgentBuilder = StateGraph(SparrowAgentState, input_schema=SparrowInputState)
 
-# Edges
-sparrowAgentBuilder.add_edge(START, "clarify_with_user")
+    sparrowAgentBuilder.add_node("intent_router", RunnableLambda(
+        intent_router.route, afunc=intent_router.aroute))
+    sparrowAgentBuilder.add_node("master_subgraph", RunnableLambda(
+        run_master_subgraph, afunc=arun_master_subgraph))
 
-sparrowAgentBuilder.add_conditional_edges(
-    "clarify_with_user",
-    route_after_clarification,
-    {
-        "need_clarification": "need_clarification",
-        "write_query_brief": "write_query_brief",
-        "__end__": END
-    }
-)
-
-# Improved clarification flow
-sparrowAgentBuilder.add_conditional_edges(
-    "need_clarification",
-    route_after_need_clarification,
-    {
-        "clarify_with_user": "clarify_with_user",
-        "__end__": END
-    }
-)
-
-sparrowAgentBuilder.add_conditional_edges(
-    "write_query_brief",
-    route_after_query_brief,
-    {
-        "clarify_with_user": "clarify_with_user",
-        "master_subgraph": "master_subgraph",
-        "__end__": END
-    }
-)
+    # Edges
+    sparrowAgentBuilder.add_edge(START, "intent_router")
+
+    if queryNode.intake_mode == "combined":
+        # One structured LLM call decides on clarification and writes the brief
+        sparrowAgentBuilder.add_node("intake", RunnableLambda(
+            queryNode.intake, afunc=queryNode.aintake))
+
+        # Recognised intents are answered without any LLM call
+        sparrowAgentBuilder.add_conditional_edges(
+            "intent_router",
+            intent_router.route_after_router,
+            {
+                "clarify_with_user": "intake",
+                "__end__": END
+            }
+        )
+
+        sparrowAgentBuilder.add_conditional_edges(
+            "intake",
+            queryNode.route_after_intake,
+            {
+                "master_subgraph": "master_subgraph",
+                "__end__": END
+            }
+        )
+    else:
+        sparrowAgentBuilder.add_node("clarify_with_user", RunnableLambda(
+            queryNode.clarify_with_user, afunc=queryNode.aclarify_with_user))
+        sparrowAgentBuilder.add_node("need_clarification", need_clarification)
+        sparrowAgentBuilder.add_node("write_query_brief", RunnableLambda(
+            queryNode.write_query_brief, afunc=queryNode.awrite_query_brief))
+
+        # Recognised intents are answered without any LLM call
+        sparrowAgentBuilder.add_conditional_edges(
+            "intent_router",
+            intent_router.route_after_router,
+            {
+                "clarify_with_user": "clarify_with_user",
+                "__end__": END
+            }
+        )
+
+        sparrowAgentBuilder.add_conditional_edges(
+            "clarify_with_user",
+            route_after_clarification,
+            {
+                "need_clarification": "need_clarification",
+                "write_query_brief": "write_query_brief",
+                "__end__": END
+            }
+        )
+
+        # Improved clarification flow
+        sparrowAgentBuilder.add_conditional_edges(
+            "need_clarification",
+            route_after_need_clarification,
+            {
+                "clarify_with_user": "clarify_with_user",
+                "__end__": END
+            }
+        )
+
+        sparrowAgentBuilder.add_conditional_edges(
+            "write_query_brief",
+            route_after_query_brief,
+            {
+                "clarify_with_user": "clarify_with_user",
+                "master_subgraph": "master_subgraph",
+                "__end__": END
+            }
+        )
+
+    sparrowAgentBuilder.add_edge("master_subgraph", END)
+
+    # The checkpointer keeps each thread's state between turns, so callers only
+    # submit the new message together with configurable.thread_id
+    return sparrowAgentBuilder.compile(checkpointer=checkpointer)
 
-sparrowAgentBuilder.add_edge("master_subgraph", END)
 
-sparrowAgent = sparrowAgentBuilder.compile()
\ No newline at end of file
+def __getattr__(name):
+    # ``sparrowAgent`` is built lazily through the registry instead of at import time
+    if name == "sparrowAgent":
+        return get_graph("sparrow")
+    raise AttributeError(name)
@@ -0,0 +1,103 @@
+"""
+Lazy registry of the compiled Sparrow graphs.
+
+Nothing is built at import time: each graph (and the Groq clients, bound
+tools and structured-output runnables it needs) is built and compiled once,
+on first ``get_graph`` call or on an explicit ``warmup``. The ``make_*``
+factories are what ``langgraph.json`` points at.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _build_executor():
+    from src.graphs.actionGraph import build_graph
+    return build_graph()
+
+
+def _build_master():
+    from src.graphs.masterGraph import build_graph
+    return build_graph()
+
+
+def _build_sparrow():
+    from src.graphs.finalAgentGraph import build_graph
+    return build_graph()
+
+
+def _build_query():
+    from src.graphs.queryGraph import build_graph
+    return build_graph()
+
+
+BUILDERS = {
+    "executor": _build_executor,
+    "master": _build_master,
+    "sparrow": _build_sparrow,
+    "query": _build_query,
+}
+
+# Graphs the HTTP servers need, in dependency order
+SERVING_GRAPHS = ("executor", "master", "sparrow")
+
+_graphs = {}
+_build_times = {}
+# Re-entrant: building "sparrow" builds "master", which builds "executor"
+_lock = threading.RLock()
+
+
+def get_graph(name: str):
+    """Return the compiled graph ``name``, building it on first use."""
+    graph = _graphs.get(name)
+    if graph is not None:
+        return graph
+    if name not in BUILDERS:
+        raise KeyError(f"Unknown graph {name!r}; known graphs: {sorted(BUILDERS)}")
+
+    with _lock:
+        if name not in _graphs:
+            started = time.perf_counter()
+            _graphs[name] = BUILDERS[name]()
+            _build_times[name] = time.perf_counter() - started
+            logger.info("Built graph %s in %.3fs", name, _build_times[name])
+        return _graphs[name]
+
+
+def warmup(names=SERVING_GRAPHS) -> dict:
+    """Build the given graphs now (e.g. at server start); returns build seconds per graph."""
+    for name in names:
+        get_graph(name)
+    return {name: _build_times.get(name, 0.0) for name in names}
+
+
+def built_graphs() -> dict:
+    """Build seconds of every graph built so far."""
+    return dict(_build_times)
+
+
+def reset() -> None:
+    """Forget every built graph, so the next get_graph rebuilds it (benchmarks only)."""
+    with _lock:
+        _graphs.clear()
+        _build_times.clear()
+
+
+# Factories referenced from langgraph.json
+
+def make_query_graph():
+    return get_graph("query")
+
+
+def make_executor_graph():
+    return get_graph("executor")
+
+
+def make_master_graph():
+    return get_graph("master")
+
+
+def make_sparrow_agent():
+    return get_graph("sparrow")
@@ -1,34 +1,57 @@
 from langgraph.graph import StateGraph, START, END
+import logging
+from langchain_core.runnables import RunnableLambda
 from src.nodes.masterNode import MasterOrchestrator
 from src.states.masterState import MasterState
-from src.llms.groqllm import GroqLLM
+from src.llms.modelPolicy import build_model_policy
+
+logger = logging.getLogger(__name__)
 
 
 class MasterBuilder:
-    def __init__(self, llm, ):
+    def __init__(self, llm, policy=None):
         self.llm = llm
+        self.policy = policy
 
     def build_master_graph(self):
-        master_obj = MasterOrchestrator(self.llm)
+        master_obj = MasterOrchestrator(self.llm, policy=self.policy)
         master_graph = StateGraph(MasterState)
         
-        # Add nodes
-        master_graph.add_node("orchestrator", master_obj.orchestrator)
-        master_graph.add_node("worker_executor", master_obj.worker_executor)
-        master_graph.add_node("synthesizer", master_obj.synthesizer)
+        # Add nodes (sync + async variants so both invoke and ainvoke work)
+        master_graph.add_node("cache_lookup", RunnableLambda(
+            master_obj.cache_lookup, afunc=master_obj.acache_lookup))
+        master_graph.add_node("orchestrator", RunnableLambda(
+            master_obj.orchestrator, afunc=master_obj.aorchestrator))
+        master_graph.add_node("worker_executor", RunnableLambda(
+            master_obj.worker_executor, afunc=master_obj.aworker_executor))
+        master_graph.add_node("synthesizer", RunnableLambda(
+            master_obj.synthesizer, afunc=master_obj.asynthesizer))
         
         # Add edges
-        master_graph.add_edge(START, "orchestrator")
+        master_graph.add_edge(START, "cache_lookup")
+        master_graph.add_conditional_edges("cache_lookup", master_obj.route_after_cache, ["orchestrator", END])
         master_graph.add_conditional_edges("orchestrator", master_obj.assign_workers, ["worker_executor"])
         master_graph.add_edge("worker_executor", "synthesizer")
         master_graph.add_edge("synthesizer", END)
         
-        return master_graph.compile()
+        # Master runs are transient; checkpointer=False keeps them (and their
+        # Send fan-out) out of the parent conversation's checkpoints
+        return master_graph.compile(checkpointer=False)
+
+
 
+def build_graph():
+    """Build and compile the master graph (called once by the graph registry)."""
+    policy = build_model_policy(streaming=True)
+    graph_builder = MasterBuilder(policy.models["fast"], policy)
+    master_graph = graph_builder.build_master_graph()
+    logger.debug("Master graph created")
+    return master_graph
 
 
-# Building the graph
-llm = GroqLLM().get_llm()
-graph_builder = MasterBuilder(llm)
-master_graph = graph_builder.build_master_graph()
-print("Graph created successfully")
\ No newline at end of file
+def __getattr__(name):
+    # ``master_graph`` is built lazily through the registry instead of at import time
+    if name == "master_graph":
+        from src.graphs.graphRegistry import get_graph
+        return get_graph("master")
+    raise AttributeError(name)
\ No newline at end of file
@@ -1,14 +1,16 @@
 from langgraph.graph import StateGraph, START, END 
+from langchain_core.runnables import RunnableLambda
 from src.states.queryState import SparrowAgentState, SparrowInputState
 
 from src.nodes.queryNode import QueryNode
-from src.llms.groqllm import GroqLLM
+from src.llms.modelPolicy import build_model_policy
 
 
 
 class QueryGraphBuilder:
-    def __init__(self, llm):
+    def __init__(self, llm, policy=None):
         self.llm = llm
+        self.policy = policy
         self.graph = StateGraph(SparrowAgentState, input_schema=SparrowInputState)
     
     def build_query_graph(self):
@@ -16,20 +18,30 @@ class QueryGraphBuilder:
         Build a graph for customer query inquiry
 
         """
-        self.query_node_obj= QueryNode(self.llm)
-        print(self.llm)
+        self.query_node_obj= QueryNode(self.llm, policy=self.policy)
 
-        self.graph.add_node("clarify_with_user", self.query_node_obj.clarify_with_user)
-        self.graph.add_node("write_query_brief", self.query_node_obj.write_query_brief)
+        self.graph.add_node("clarify_with_user", RunnableLambda(
+            self.query_node_obj.clarify_with_user, afunc=self.query_node_obj.aclarify_with_user))
+        self.graph.add_node("write_query_brief", RunnableLambda(
+            self.query_node_obj.write_query_brief, afunc=self.query_node_obj.awrite_query_brief))
 
         self.graph.add_edge(START, "clarify_with_user")
         self.graph.add_edge("clarify_with_user", "write_query_brief")
         self.graph.add_edge("write_query_brief", END)
 
         return self.graph
-    
-llm = GroqLLM().get_llm()
 
-graph_builder=QueryGraphBuilder(llm)
 
-graph=graph_builder.build_query_graph().compile()
\ No newline at end of file
+def build_graph():
+    """Build and compile the standalone query graph (called once by the graph registry)."""
+    policy = build_model_policy()
+    graph_builder = QueryGraphBuilder(policy.models["fast"], policy)
+    return graph_builder.build_query_graph().compile()
+
+
+def __getattr__(name):
+    # ``graph`` is built lazily through the registry instead of at import time
+    if name == "graph":
+        from src.graphs.graphRegistry import get_graph
+        return get_graph("query")
+    raise AttributeError(name)
\ No newline at end of file
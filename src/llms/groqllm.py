@@ -1,25 +1,169 @@
 from langchain_groq import ChatGroq
-import os 
+import logging
+import os
+import threading
+import httpx
 from dotenv import load_dotenv
+from src.utils.metrics import metrics
+from src.llms.rateLimiter import RATE_LIMITING, rate_limiter, RateLimitedTransport, AsyncRateLimitedTransport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemma2-9b-it"
+MOON_MODEL = "moonshotai/kimi-k2-instruct"
+
+# Shared HTTP connection pool settings for every Groq client in the process
+LLM_POOL_SIZE = int(os.environ.get("SPARROW_LLM_POOL_SIZE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("SPARROW_LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_TIMEOUT = float(os.environ.get("SPARROW_LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("SPARROW_LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.environ.get("SPARROW_LLM_MAX_RETRIES", "2"))
+LLM_HTTP2 = os.environ.get("SPARROW_LLM_HTTP2", "1") not in ("0", "false", "no")
+
+try:
+    import h2  # noqa: F401 - HTTP/2 support for httpx is optional
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_registry_lock = threading.Lock()
+_env_loaded = False
+_http_client = None
+_http_async_client = None
+_clients = {}
+_wrappers = {}
+
+
+def _load_env():
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+def _count_response(response: httpx.Response) -> None:
+    # The Groq SDK retries 429/5xx internally; counting every response makes
+    # those retries visible on /metrics
+    metrics.increment("llm_http_responses_total", status=response.status_code)
+
+
+async def _acount_response(response: httpx.Response) -> None:
+    _count_response(response)
+
+
+def _pool_settings() -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=LLM_POOL_SIZE,
+            max_keepalive_connections=LLM_POOL_SIZE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        "http2": LLM_HTTP2 and HTTP2_AVAILABLE,
+    }
+
+
+def _transports() -> tuple:
+    """(sync, async) transports: the pooled connections, behind the rate limiter when enabled."""
+    transport = httpx.HTTPTransport(**_pool_settings())
+    async_transport = httpx.AsyncHTTPTransport(**_pool_settings())
+    if not RATE_LIMITING:
+        return transport, async_transport
+    return (RateLimitedTransport(rate_limiter, transport),
+            AsyncRateLimitedTransport(rate_limiter, async_transport))
+
+
+def get_http_clients() -> tuple:
+    """Return the process-wide (sync, async) httpx clients shared by all Groq clients."""
+    global _http_client, _http_async_client
+    with _registry_lock:
+        if _http_client is None:
+            if LLM_HTTP2 and not HTTP2_AVAILABLE:
+                logger.warning("HTTP/2 requested for Groq but the h2 package is missing; "
+                               "using HTTP/1.1 (pip install \"httpx[http2]\")")
+            transport, async_transport = _transports()
+            timeout = httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+            _http_client = httpx.Client(
+                transport=transport, timeout=timeout, event_hooks={"response": [_count_response]})
+            _http_async_client = httpx.AsyncClient(
+                transport=async_transport, timeout=timeout, event_hooks={"response": [_acount_response]})
+        return _http_client, _http_async_client
+
+
+def get_client(model: str = DEFAULT_MODEL, **options) -> ChatGroq:
+    """
+    Return the cached ChatGroq client for ``model`` and ``options``.
+
+    Clients are built once per (model, options) key and all of them share
+    the same keep-alive connection pool.
+    """
+    key = (model, tuple(sorted(options.items())))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    _load_env()
+    http_client, http_async_client = get_http_clients()
+    with _registry_lock:
+        if key not in _clients:
+            _clients[key] = ChatGroq(
+                api_key=os.getenv("GROQ_API_KEY"),
+                model=model,
+                request_timeout=LLM_TIMEOUT,
+                max_retries=LLM_MAX_RETRIES,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                **options,
+            )
+        return _clients[key]
+
+
+def _cached_wrapper(key: tuple, build):
+    wrapper = _wrappers.get(key)
+    if wrapper is None:
+        with _registry_lock:
+            wrapper = _wrappers.get(key)
+            if wrapper is None:
+                wrapper = _wrappers[key] = build()
+    return wrapper
+
+
+def with_structured_output(llm, schema, **kwargs):
+    """Cached ``llm.with_structured_output(schema)`` runnable."""
+    key = ("structured", id(llm), schema, tuple(sorted(kwargs.items())))
+    # Keep a reference to llm in the value so its id cannot be reused
+    return _cached_wrapper(key, lambda: (llm, llm.with_structured_output(schema, **kwargs)))[1]
+
+
+def bind_tools(llm, tools: list, **kwargs):
+    """Cached ``llm.bind_tools(tools)`` runnable, keyed by tool names."""
+    key = ("tools", id(llm), tuple(tool.name for tool in tools), tuple(sorted(kwargs.items())))
+    return _cached_wrapper(key, lambda: (llm, llm.bind_tools(tools, **kwargs)))[1]
+
+
+def pool_stats() -> dict:
+    """Registry and connection pool settings, for health/diagnostics."""
+    return {
+        "clients": len(_clients),
+        "wrappers": len(_wrappers),
+        "pool_size": LLM_POOL_SIZE,
+        "timeout": LLM_TIMEOUT,
+        "http2": LLM_HTTP2 and HTTP2_AVAILABLE,
+        "rate_limits": rate_limiter.stats() if RATE_LIMITING else None,
+    }
+
 
 class GroqLLM:
     def __init__(self):
-        load_dotenv()
+        _load_env()
 
-    def get_llm(self):
+    def get_llm(self, streaming: bool = False):
         try:
-            print(os.getenv("GROQ_API_KEY"))
-            os.environ["GROQ_API_KEY"] = self.groq_api_key = os.getenv("GROQ_API_KEY")
-            llm=ChatGroq(api_key=self.groq_api_key, model="gemma2-9b-it", streaming=False)
-            return llm
+            return get_client(DEFAULT_MODEL, streaming=streaming)
         except Exception as e:
             raise ValueError(f"Error occurred with exception: {e}")
-        
-    def get_moon(self):
+
+    def get_moon(self, streaming: bool = False):
         try:
-            print(os.getenv("GROQ_API_KEY"))
-            os.environ["GROQ_API_KEY"] = self.groq_api_key = os.getenv("GROQ_API_KEY")
-            llm=ChatGroq(api_key=self.groq_api_key, model="moonshotai/kimi-k2-instruct", streaming=False)
-            return llm
+            return get_client(MOON_MODEL, streaming=streaming)
         except Exception as e:
-            raise ValueError(f"Error occurred with exception: {e}")
\ No newline at end of file
+            raise ValueError(f"Error occurred with exception: {e}")
@@ -0,0 +1,130 @@
+"""
+Per-step model routing.
+
+``GroqLLM`` offers a fast model (``get_llm``) and a larger one (``get_moon``).
+Each LLM step of the graphs runs on one of three tiers:
+
+- ``fast``   always the fast model
+- ``large``  always the larger model
+- ``auto``   the larger model only when the brief is complex (long, or spans
+             several actions / worker jobs), otherwise the fast model
+
+The defaults keep intake (clarification, brief, summaries), the executor
+and compression on the fast model and let planning and synthesis escalate.
+``SPARROW_MODEL_POLICY="planner=large,compress=auto"`` overrides single steps.
+
+Every call made through ``ModelPolicy.call`` is timed and counted per step
+and tier (``model_step_duration_seconds``, ``model_step_outcomes_total``);
+the outcome is ``ok``, ``empty`` (the model answered but gave nothing
+usable) or ``error``, which is what the tiers are tuned against.
+"""
+import os
+import time
+from typing import Optional
+
+from langchain_core.messages.utils import count_tokens_approximately
+
+from src.llms.groqllm import GroqLLM
+from src.utils.metrics import metrics
+
+TIERS = ("fast", "large", "auto")
+
+DEFAULT_MODEL_POLICY = {
+    "clarify": "fast",
+    "brief": "fast",
+    "intake": "fast",
+    "summary": "fast",
+    "planner": "auto",
+    "executor": "fast",
+    "compress": "fast",
+    "synthesizer": "auto",
+}
+
+# A brief is complex above this many (approximate) tokens, when it matches
+# several known actions, or when it produced this many worker jobs
+COMPLEX_BRIEF_TOKENS = int(os.environ.get("SPARROW_COMPLEX_BRIEF_TOKENS", "150"))
+COMPLEX_JOBS = int(os.environ.get("SPARROW_COMPLEX_JOBS", "3"))
+COMPLEX_ACTIONS = 2
+
+metrics.describe("model_step_duration_seconds", "Wall time of one LLM step by step and model tier")
+metrics.describe("model_step_outcomes_total", "LLM steps by step, model tier and outcome (ok/empty/error)")
+
+
+def parse_model_policy(spec: str) -> dict:
+    """Parse ``"step=tier,step=tier"`` into ``{step: tier}``."""
+    policy = {}
+    for item in spec.split(","):
+        if "=" in item:
+            step, tier = (part.strip() for part in item.split("=", 1))
+            if tier not in TIERS:
+                raise ValueError(f"Unknown model tier {tier!r} for step {step!r} (expected one of {TIERS})")
+            policy[step] = tier
+    return policy
+
+
+def is_complex(brief: str, actions: int = 0, jobs: int = 0) -> bool:
+    """Whether a query brief is worth the larger model."""
+    return (actions >= COMPLEX_ACTIONS or jobs >= COMPLEX_JOBS
+            or count_tokens_approximately([brief or ""]) > COMPLEX_BRIEF_TOKENS)
+
+
+class StepCall:
+    """
+    One LLM step on its chosen tier; use as a context manager around the call.
+
+    Set ``outcome = "empty"`` when the answer is unusable; an exception
+    leaving the block counts as ``error`` and is re-raised.
+    """
+
+    def __init__(self, step: str, tier: str, llm):
+        self.step = step
+        self.tier = tier
+        self.llm = llm
+        self.outcome = "ok"
+
+    def __enter__(self) -> "StepCall":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        outcome = "error" if exc_type is not None else self.outcome
+        metrics.observe("model_step_duration_seconds", time.perf_counter() - self.started,
+                        step=self.step, tier=self.tier)
+        metrics.increment("model_step_outcomes_total", step=self.step, tier=self.tier, outcome=outcome)
+        return False
+
+
+class ModelPolicy:
+    """Maps graph steps to the fast or large model."""
+
+    def __init__(self, models: dict, tiers: dict = None):
+        self.models = models  # {"fast": llm, "large": llm}
+        self.tiers = dict(DEFAULT_MODEL_POLICY if tiers is None else tiers)
+
+    @classmethod
+    def single(cls, llm) -> "ModelPolicy":
+        """Every step on ``llm``; what nodes built with a bare model use."""
+        return cls({"fast": llm, "large": llm}, {})
+
+    def tier(self, step: str, complex: bool = False) -> str:
+        tier = self.tiers.get(step, "fast")
+        if tier == "auto":
+            return "large" if complex else "fast"
+        return tier
+
+    def llm(self, step: str, complex: bool = False):
+        return self.models[self.tier(step, complex)]
+
+    def call(self, step: str, complex: bool = False) -> StepCall:
+        tier = self.tier(step, complex)
+        return StepCall(step, tier, self.models[tier])
+
+
+def build_model_policy(streaming: bool = False, spec: Optional[str] = None) -> ModelPolicy:
+    """Policy over the shared Groq clients, with ``SPARROW_MODEL_POLICY`` applied."""
+    spec = os.environ.get("SPARROW_MODEL_POLICY", "") if spec is None else spec
+    groq = GroqLLM()
+    return ModelPolicy(
+        {"fast": groq.get_llm(streaming=streaming), "large": groq.get_moon(streaming=streaming)},
+        {**DEFAULT_MODEL_POLICY, **parse_model_policy(spec)},
+    )
@@ -0,0 +1,277 @@
+"""
+Client-side admission control for Groq requests.
+
+Every Groq client shares the process-wide httpx clients built in
+``src.llms.groqllm``, so the limiter sits in their transport: each chat
+completion request is admitted through per-model token buckets, one for
+requests per minute and one for tokens per minute, before it is sent.
+Calls over budget wait in line instead of going out and coming back as
+429s. The same applies to sync calls on worker threads and async calls on
+the event loop.
+
+- Budgets come from ``SPARROW_LLM_RATE_LIMITS="model=rpm:tpm,..."`` (``*``
+  sets the default for other models). The tokens-per-minute limit the API
+  reports in ``x-ratelimit-limit-tokens`` replaces the configured one, and
+  ``x-ratelimit-remaining-tokens`` pulls the bucket down when the server
+  has counted more than we have.
+- A 429 pauses that model's admissions for ``retry-after`` (or the reset
+  header), then the request is re-queued, up to ``SPARROW_LLM_RATE_LIMIT_RETRIES``
+  times.
+- Queue depth (``llm_queue_depth``), queue wait (``llm_queue_wait_seconds``)
+  and 429s (``llm_rate_limited_total``) are exported on ``/metrics``.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from typing import Optional, Tuple
+
+import httpx
+
+from src.utils.metrics import metrics
+
+RATE_LIMITING = os.environ.get("SPARROW_LLM_RATE_LIMITING", "1") not in ("0", "false", "no")
+RATE_LIMIT_RETRIES = int(os.environ.get("SPARROW_LLM_RATE_LIMIT_RETRIES", "5"))
+
+# Requests and tokens per minute; the token limit is corrected from response headers
+DEFAULT_RATE_LIMITS = {
+    "gemma2-9b-it": (30, 15000),
+    "moonshotai/kimi-k2-instruct": (60, 10000),
+    "*": (30, 6000),
+}
+
+# Expected completion size when the request sets no max_tokens
+COMPLETION_TOKENS_ESTIMATE = 512
+# Wait used after a 429 that carries no retry-after / reset header
+DEFAULT_BACKOFF = 2.0
+
+metrics.describe("llm_queue_depth", "LLM calls waiting for rate-limit budget")
+metrics.describe("llm_queue_wait_seconds", "Time an LLM call waited for rate-limit budget")
+metrics.describe("llm_rate_limited_total", "429 responses from the LLM API (requests are re-queued)")
+
+
+def parse_rate_limits(spec: str) -> dict:
+    """Parse ``"model=rpm:tpm,model=rpm:tpm"`` into ``{model: (rpm, tpm)}``."""
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            model, budget = item.rsplit("=", 1)
+            rpm, _, tpm = budget.partition(":")
+            limits[model.strip()] = (float(rpm), float(tpm))
+    return limits
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from ``"7.66s"``, ``"2m59.56s"``, ``"150ms"`` or a bare number (retry-after)."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def estimate_tokens(body: dict) -> int:
+    """Prompt (about 4 characters per token) plus the completion the request allows."""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in body.get("messages", []))
+    prompt_chars += len(json.dumps(body.get("tools", []))) if body.get("tools") else 0
+    completion = body.get("max_tokens") or body.get("max_completion_tokens") or COMPLETION_TOKENS_ESTIMATE
+    return prompt_chars // 4 + int(completion)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations: taking more than is available
+    puts the bucket in debt and returns when the caller may go. Callers are
+    therefore served in arrival order without polling.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take ``amount``; returns the monotonic time at which it is covered."""
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+        return now if self.tokens >= 0 else now + -self.tokens / self.rate
+
+    def resize(self, per_minute: float, now: float) -> None:
+        self._refill(now)
+        self.tokens += per_minute - self.capacity
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+
+    def cap(self, remaining: float, now: float) -> None:
+        """Lower the balance to what the server says is left."""
+        self._refill(now)
+        self.tokens = min(self.tokens, remaining)
+
+
+class ModelBudget:
+    """Request and token buckets of one model, plus a pause after 429s."""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+
+
+class RateLimiter:
+    """Per-model admission shared by every Groq client in the process."""
+
+    def __init__(self, limits: dict = None, retries: int = RATE_LIMIT_RETRIES):
+        self.limits = dict(DEFAULT_RATE_LIMITS if limits is None else limits)
+        self.retries = retries
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, model: str) -> ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            budget = self._budgets[model] = ModelBudget(*self.limits.get(model, self.limits.get("*", (30, 6000))))
+        return budget
+
+    def reserve(self, model: str, tokens: int) -> float:
+        """Reserve one request and ``tokens``; returns seconds to wait before sending."""
+        with self._lock:
+            budget = self._budget(model)
+            now = time.monotonic()
+            start = max(now, budget.paused_until)
+            ready = max(start, budget.requests.reserve(1, start), budget.tokens.reserve(tokens, start))
+        return ready - now
+
+    def observe(self, model: str, response: httpx.Response) -> None:
+        """Sync the buckets with the rate-limit headers; pause the model on a 429."""
+        headers = response.headers
+        now = time.monotonic()
+        with self._lock:
+            budget = self._budget(model)
+            limit = headers.get("x-ratelimit-limit-tokens")
+            if limit and limit.isdigit() and float(limit) != budget.tokens.capacity:
+                budget.tokens.resize(float(limit), now)
+            remaining = headers.get("x-ratelimit-remaining-tokens")
+            if remaining and remaining.isdigit():
+                budget.tokens.cap(float(remaining), now)
+
+            pause = None
+            if response.status_code == 429:
+                pause = (parse_duration(headers.get("retry-after"))
+                         or parse_duration(headers.get("x-ratelimit-reset-tokens"))
+                         or DEFAULT_BACKOFF)
+            elif headers.get("x-ratelimit-remaining-requests") == "0":
+                # Request quota exhausted (Groq reports the daily one here)
+                pause = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if pause:
+                budget.paused_until = max(budget.paused_until, now + pause)
+        if response.status_code == 429:
+            metrics.increment("llm_rate_limited_total", model=model)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model: {
+                    "rpm": budget.requests.capacity,
+                    "tpm": budget.tokens.capacity,
+                    "paused_for": round(max(0.0, budget.paused_until - now), 3),
+                    "queued": metrics.gauge("llm_queue_depth", model=model),
+                }
+                for model, budget in self._budgets.items()
+            }
+
+
+def request_budget(request: httpx.Request) -> Tuple[Optional[str], int]:
+    """(model, estimated tokens) of a chat completion request; (None, 0) for anything else."""
+    if request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+        return None, 0
+    try:
+        body = json.loads(request.content)
+    except (ValueError, httpx.RequestNotRead):
+        return None, 0
+    return body.get("model"), estimate_tokens(body)
+
+
+def _queued(model: str, wait: float) -> None:
+    metrics.observe("llm_queue_wait_seconds", wait, model=model)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Sync transport that admits chat completions through the limiter."""
+
+    def __init__(self, limiter: RateLimiter, transport: httpx.BaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = request_budget(request)
+        if model is None:
+            return self.transport.handle_request(request)
+        for attempt in range(self.limiter.retries + 1):
+            wait = self.limiter.reserve(model, tokens)
+            _queued(model, max(wait, 0.0))
+            if wait > 0:
+                metrics.add_gauge("llm_queue_depth", 1, model=model)
+                try:
+                    time.sleep(wait)
+                finally:
+                    metrics.add_gauge("llm_queue_depth", -1, model=model)
+            response = self.transport.handle_request(request)
+            self.limiter.observe(model, response)
+            if response.status_code != 429 or attempt == self.limiter.retries:
+                return response
+            response.close()
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async twin of RateLimitedTransport; waiting calls sleep on the event loop."""
+
+    def __init__(self, limiter: RateLimiter, transport: httpx.AsyncBaseTransport):
+        self.limiter = limiter
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, tokens = request_budget(request)
+        if model is None:
+            return await self.transport.handle_async_request(request)
+        for attempt in range(self.limiter.retries + 1):
+            wait = self.limiter.reserve(model, tokens)
+            _queued(model, max(wait, 0.0))
+            if wait > 0:
+                metrics.add_gauge("llm_queue_depth", 1, model=model)
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    metrics.add_gauge("llm_queue_depth", -1, model=model)
+            response = await self.transport.handle_async_request(request)
+            self.limiter.observe(model, response)
+            if response.status_code != 429 or attempt == self.limiter.retries:
+                return response
+            await response.aclose()
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+rate_limiter = RateLimiter({
+    **DEFAULT_RATE_LIMITS,
+    **parse_rate_limits(os.environ.get("SPARROW_LLM_RATE_LIMITS", ""))
+})
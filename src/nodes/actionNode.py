@@ -1,183 +1,436 @@
 from pydantic import BaseModel, Field
-from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, filter_messages
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage, filter_messages
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
 from src.utils.prompts import execution_agent_prompt, compress_execution_system_prompt, compress_execution_human_message
-from src.utils.utils import think_tool, track_package, get_user_information, estimated_time_analysis
+import os
+import asyncio
+from typing import Optional
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from src.llms.groqllm import bind_tools
+from src.llms.modelPolicy import ModelPolicy
+from src.utils.toolCache import ToolResultCache, DEFAULT_TOOL_TTLS, parse_ttls
+from src.utils.metrics import metrics
+from src.utils.tracing import record_queue_wait
+from src.utils.utils import think_tool, track_package, track_packages, get_user_information, estimated_time_analysis
 import logging
 
-tools = [think_tool, track_package, get_user_information, estimated_time_analysis]
+logger = logging.getLogger(__name__)
+
+tools = [think_tool, track_package, track_packages, get_user_information, estimated_time_analysis]
 tools_by_name = {tool.name: tool for tool in tools}
 
+# Shared by every executor in the process so parallel workers and consecutive
+# turns reuse tool results; override TTLs with SPARROW_TOOL_CACHE_TTLS="tool=seconds,..."
+tool_cache = ToolResultCache({
+    **DEFAULT_TOOL_TTLS,
+    **parse_ttls(os.environ.get("SPARROW_TOOL_CACHE_TTLS", ""))
+})
+
+# Tool calls from one LLM message run concurrently. Sync tools share this
+# bounded pool; every call gets a timeout (SPARROW_TOOL_TIMEOUT, overridable
+# per tool with SPARROW_TOOL_TIMEOUTS="tool=seconds,...").
+TOOL_CONCURRENCY = int(os.environ.get("SPARROW_TOOL_CONCURRENCY", "8"))
+TOOL_TIMEOUT = float(os.environ.get("SPARROW_TOOL_TIMEOUT", "30"))
+TOOL_TIMEOUTS = parse_ttls(os.environ.get("SPARROW_TOOL_TIMEOUTS", ""))
+
+# compress_execution only calls the LLM for large transcripts: below
+# PASSTHROUGH tokens the findings are forwarded verbatim, up to LLM tokens
+# they are compressed extractively (no LLM call)
+COMPRESSION_PASSTHROUGH_TOKENS = int(os.environ.get("SPARROW_COMPRESSION_PASSTHROUGH_TOKENS", "400"))
+COMPRESSION_LLM_TOKENS = int(os.environ.get("SPARROW_COMPRESSION_LLM_TOKENS", "2000"))
+EXTRACTIVE_TOOL_CHARS = 600
+
+tool_pool = ThreadPoolExecutor(max_workers=TOOL_CONCURRENCY, thread_name_prefix="sparrow-tool")
+
 class ExecutorNode:
     """
     Executor node for handling tasks:
     1. LLM reasoning
     2. Tool invocation
     3. Final compression
+
+    Every node has a sync and an async (``a``-prefixed) variant sharing the
+    same prompt building and state handling, so the graph can be driven by
+    either ``invoke`` or ``ainvoke``.
     """
 
-    def __init__(self, llm):
+    def __init__(self, llm, cache: ToolResultCache = tool_cache, pool: ThreadPoolExecutor = tool_pool,
+                 tool_timeout: float = TOOL_TIMEOUT, tool_timeouts: dict = TOOL_TIMEOUTS,
+                 passthrough_tokens: int = COMPRESSION_PASSTHROUGH_TOKENS,
+                 llm_compression_tokens: int = COMPRESSION_LLM_TOKENS, policy: ModelPolicy = None):
         self.llm = llm
+        # Model for the tool-calling loop ("executor") and for "compress"
+        self.policy = policy or ModelPolicy.single(llm)
+        self.tool_cache = cache
+        self.tool_pool = pool
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = tool_timeouts
+        self.passthrough_tokens = passthrough_tokens
+        self.llm_compression_tokens = llm_compression_tokens
         self.tools = tools
         self.tools_by_name = {tool.name: tool for tool in tools}
-        self.model_with_tools = llm.bind_tools(tools)
         self.MAX_ITERATIONS = 3  # Increased to allow tool usage
         self.execution_agent_prompt = execution_agent_prompt
         self.compress_execution_system_prompt = compress_execution_system_prompt
         self.compress_execution_human_message = compress_execution_human_message
         
         # Debug tool binding
-        print(f"Available tools: {list(self.tools_by_name.keys())}")
+        logger.debug("Available tools: %s", list(self.tools_by_name))
+
+    def _system_prompt(self, config: Optional[RunnableConfig]) -> str:
+        # The signed-in user's profile, pre-loaded by the server (see graph_config)
+        profile = ((config or {}).get("configurable") or {}).get("user_profile")
+        if not profile:
+            return self.execution_agent_prompt
+        return f"{self.execution_agent_prompt}\n\n<Customer>\n{profile}\n</Customer>"
+
+    def _llm_messages(self, state: dict, config: Optional[RunnableConfig] = None) -> tuple:
+        """Build the executor prompt; returns (executor history, full prompt)."""
+        # Ensure we have the execution job in the messages
+        execution_job = state.get("execution_job", "")
+        existing_messages = state.get("executor_messages", [])
+        logger.debug("Execution job %r with %d executor messages", execution_job, len(existing_messages))
 
-    def llm_call(self, state: dict) -> dict:
+        # If no existing messages, add the execution job as initial human message
+        if not existing_messages and execution_job:
+            existing_messages = [HumanMessage(content=execution_job)]
+        
+        messages = [SystemMessage(content=self._system_prompt(config))] + existing_messages
+        
+        logger.debug("Calling LLM with %d messages; last: %.200r", len(messages), messages[-1])
+        return existing_messages, messages
+
+    def _apply_llm_response(self, state: dict, existing_messages: list, response) -> dict:
+        logger.debug("LLM response: %.100r, tool calls: %s", response.content, getattr(response, "tool_calls", None))
+
+        return {
+            **state,
+            "executor_messages": existing_messages + [response]
+        }
+
+    @staticmethod
+    def _response_outcome(response) -> str:
+        return "ok" if getattr(response, "tool_calls", None) or str(response.content).strip() else "empty"
+
+    def _llm_failed(self, state: dict, e: Exception) -> dict:
+        return {
+            **state,
+            "error": str(e),
+            "executor_messages": state.get("executor_messages", [])
+        }
+
+    def llm_call(self, state: dict, config: Optional[RunnableConfig] = None) -> dict:
         """Calls the LLM with the executor message history and returns updated state."""
         try:
-            # Ensure we have the execution job in the messages
-            execution_job = state.get("execution_job", "")
-            existing_messages = state.get("executor_messages", [])
-            print("EXECUTOR MESSAGES MESSAGES", existing_messages)
-            print("EXECUTION JOB", execution_job)
-
-            # If no existing messages, add the execution job as initial human message
-            if not existing_messages and execution_job:
-                existing_messages = [HumanMessage(content=execution_job)]
+            existing_messages, messages = self._llm_messages(state, config)
+            # Tool bindings are cached per model, so this is a dict lookup
+            with self.policy.call("executor") as call:
+                response = bind_tools(call.llm, self.tools).invoke(messages)
+                call.outcome = self._response_outcome(response)
+            return self._apply_llm_response(state, existing_messages, response)
             
-            messages = [SystemMessage(content=self.execution_agent_prompt)] + existing_messages
-            
-            print(f"Calling LLM with {len(messages)} messages")
-            print(f"Last message: {messages[-1] if messages else 'No messages'}")
-            
-            response = self.model_with_tools.invoke(messages)
+        except Exception as e:
+            return self._llm_failed(state, e)
+
+    async def allm_call(self, state: dict, config: Optional[RunnableConfig] = None) -> dict:
+        """Async version of llm_call."""
+        try:
+            existing_messages, messages = self._llm_messages(state, config)
+            with self.policy.call("executor") as call:
+                response = await bind_tools(call.llm, self.tools).ainvoke(messages)
+                call.outcome = self._response_outcome(response)
+            return self._apply_llm_response(state, existing_messages, response)
             
-            print(f"LLM Response type: {type(response)}")
-            print(f"LLM Response content: {response.content[:100] if response.content else 'No content'}...")
-            print(f"Tool calls in response: {getattr(response, 'tool_calls', 'No tool_calls attribute')}")
-
-            return {
-                **state,
-                "executor_messages": existing_messages + [response]
-            }
+        except Exception as e:
+            return self._llm_failed(state, e)
+
+    def _pending_tool_calls(self, state: dict) -> list:
+        """Return the tool calls requested by the last executor message."""
+        executor_messages = state.get("executor_messages", [])
+        if not executor_messages:
+            logger.debug("No executor messages found")
+            return []
             
+        last_message = executor_messages[-1]
+        # Get tool calls
+        tool_calls = getattr(last_message, "tool_calls", [])
+        logger.debug("Found %d tool calls: %s", len(tool_calls), tool_calls)
+
+        if not tool_calls:
+            logger.debug("No tool calls found in last message")
+        return tool_calls
+
+    def _tool_result(self, tool_name: str, tool_id: str, result, cached: bool = False) -> tuple:
+        logger.debug("Tool %s result (cached: %s): %.200s", tool_name, cached, result)
+        tool_message = ToolMessage(
+            content=str(result), 
+            name=tool_name, 
+            tool_call_id=tool_id,
+            # Results served from the tool cache are flagged for downstream nodes
+            additional_kwargs={"cached": True} if cached else {}
+        )
+        return tool_message, str(result)
+
+    def _tool_error(self, tool_name: str, tool_id: str, e: Exception) -> tuple:
+        error_msg = f"Tool {tool_name} failed: {e}"
+        logger.warning("Tool error: %s", error_msg)
+        tool_message = ToolMessage(
+            content=error_msg, 
+            name=tool_name, 
+            tool_call_id=tool_id
+        )
+        return tool_message, error_msg
+
+    def _tool_missing(self, tool_name: str, tool_id: str) -> tuple:
+        error_msg = f"Tool {tool_name} not found. Available: {list(self.tools_by_name.keys())}"
+        logger.warning(error_msg)
+        tool_message = ToolMessage(
+            content=error_msg, 
+            name=tool_name, 
+            tool_call_id=tool_id
+        )
+        return tool_message, None
+
+    def _timeout_for(self, tool_name: str) -> float:
+        return self.tool_timeouts.get(tool_name, self.tool_timeout)
+
+    def _tool_timed_out(self, call: dict) -> tuple:
+        tool_name = call.get("name")
+        timeout = self._timeout_for(tool_name)
+        return self._tool_error(tool_name, call.get("id"), TimeoutError(f"timed out after {timeout:g}s"))
+
+    def _run_tool_call(self, call: dict) -> tuple:
+        """Execute one tool call; returns (ToolMessage, executor data or None)."""
+        tool_name = call.get("name")
+        args = call.get("args", {})
+        tool_id = call.get("id")
+        
+        if tool_name not in self.tools_by_name:
+            return self._tool_missing(tool_name, tool_id)
+        try:
+            logger.debug("Invoking tool %s (%s) with args %s", tool_name, tool_id, args)
+            tool = self.tools_by_name[tool_name]
+            result, cached = self.tool_cache.call(tool_name, args, lambda: tool.invoke(args))
+            return self._tool_result(tool_name, tool_id, result, cached)
+        except Exception as e:
+            return self._tool_error(tool_name, tool_id, e)
+
+    def _ainvoke_tool(self, tool, args: dict):
+        """Await native async tools; run sync-only tools on the bounded tool pool."""
+        if getattr(tool, "coroutine", None) is not None:
+            return tool.ainvoke(args)
+        context = contextvars.copy_context()
+        return asyncio.get_running_loop().run_in_executor(
+            self.tool_pool, context.run, self._timed_invoke, time.perf_counter(), tool, args)
+
+    @staticmethod
+    def _timed_invoke(queued: float, tool, args: dict):
+        record_queue_wait("tool", time.perf_counter() - queued)
+        return tool.invoke(args)
+
+    async def _arun_tool_call(self, call: dict) -> tuple:
+        """Async version of _run_tool_call."""
+        tool_name = call.get("name")
+        args = call.get("args", {})
+        tool_id = call.get("id")
+        
+        if tool_name not in self.tools_by_name:
+            return self._tool_missing(tool_name, tool_id)
+        try:
+            logger.debug("Invoking tool %s (%s) with args %s", tool_name, tool_id, args)
+            tool = self.tools_by_name[tool_name]
+            result, cached = await asyncio.wait_for(
+                self.tool_cache.acall(tool_name, args, lambda: self._ainvoke_tool(tool, args)),
+                timeout=self._timeout_for(tool_name)
+            )
+            return self._tool_result(tool_name, tool_id, result, cached)
+        except asyncio.TimeoutError:
+            return self._tool_timed_out(call)
         except Exception as e:
-            return {
-                **state,
-                "error": str(e),
-                "executor_messages": state.get("executor_messages", [])
-            }
+            return self._tool_error(tool_name, tool_id, e)
+
+    def _timed_tool_call(self, queued: float, call: dict) -> tuple:
+        record_queue_wait("tool", time.monotonic() - queued)
+        return self._run_tool_call(call)
+
+    def _run_tool_calls(self, tool_calls: list) -> list:
+        """
+        Run independent tool calls concurrently on the tool pool.
+
+        Results keep the order of ``tool_calls``. A call that overruns its
+        timeout gets an error ToolMessage; its thread is left to finish in
+        the background (the tool cache still records the result).
+        """
+        # Copy the context per call so callbacks (streaming, tracing) follow it
+        started = time.monotonic()
+        futures = [
+            self.tool_pool.submit(contextvars.copy_context().run, self._timed_tool_call, started, call)
+            for call in tool_calls
+        ]
+        results = []
+        for call, future in zip(tool_calls, futures):
+            # Every call's timeout runs from dispatch, not from when we get to it
+            deadline = started + self._timeout_for(call.get("name"))
+            try:
+                results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                results.append(self._tool_timed_out(call))
+        return results
+
+    def _apply_tool_results(self, state: dict, results: list) -> dict:
+        tool_outputs = [message for message, _ in results]
+        new_data = [data for _, data in results if data is not None]
+
+        logger.debug("Returning %d tool outputs", len(tool_outputs))
+        
+        return {
+            **state,
+            "executor_messages": state.get("executor_messages", []) + tool_outputs,
+            "executor_data": state.get("executor_data", []) + new_data
+        }
+
+    def _tools_failed(self, state: dict, e: Exception) -> dict:
+        return {
+            **state,
+            "error": f"Tool execution failed: {str(e)}"
+        }
 
     def tool_node(self, state: dict) -> dict:
         """Executes any tools requested by the LLM and appends ToolMessages."""
         try:
-            executor_messages = state.get("executor_messages", [])
-            if not executor_messages:
-                print("No executor messages found")
+            tool_calls = self._pending_tool_calls(state)
+            if not tool_calls:
                 return state
-                
-            last_message = executor_messages[-1]
-            print(f"Last message type: {type(last_message)}")
-            print(f"Last message attributes: {dir(last_message)}")
+
+            results = self._run_tool_calls(tool_calls)
+            return self._apply_tool_results(state, results)
             
-            # Get tool calls
-            tool_calls = getattr(last_message, "tool_calls", [])
-            print(f"Found {len(tool_calls)} tool calls: {tool_calls}")
+        except Exception as e:
+            return self._tools_failed(state, e)
 
+    async def atool_node(self, state: dict) -> dict:
+        """Async version of tool_node."""
+        try:
+            tool_calls = self._pending_tool_calls(state)
             if not tool_calls:
-                print("No tool calls found in last message")
                 return state
 
-            tool_outputs, new_data = [], []
-            
-            for call in tool_calls:
-                print(f"Processing tool call: {call}")
-                
-                tool_name = call.get("name")
-                args = call.get("args", {})
-                tool_id = call.get("id")
-                
-                print(f"Tool: {tool_name}, Args: {args}, ID: {tool_id}")
-                
-                if tool_name in self.tools_by_name:
-                    try:
-                        print(f"Invoking tool {tool_name} with args {args}")
-                        result = self.tools_by_name[tool_name].invoke(args)
-                        print(f"Tool {tool_name} result: {result}")
-                        
-                        tool_message = ToolMessage(
-                            content=str(result), 
-                            name=tool_name, 
-                            tool_call_id=tool_id
-                        )
-                        tool_outputs.append(tool_message)
-                        new_data.append(str(result))
-                        
-                    except Exception as e:
-                        error_msg = f"Tool {tool_name} failed: {e}"
-                        print(f"Tool error: {error_msg}")
-                        tool_outputs.append(
-                            ToolMessage(
-                                content=error_msg, 
-                                name=tool_name, 
-                                tool_call_id=tool_id
-                            )
-                        )
-                        new_data.append(error_msg)
-                else:
-                    error_msg = f"Tool {tool_name} not found. Available: {list(self.tools_by_name.keys())}"
-                    print(error_msg)
-                    tool_outputs.append(
-                        ToolMessage(
-                            content=error_msg, 
-                            name=tool_name, 
-                            tool_call_id=tool_id
-                        )
-                    )
-
-            print(f"Returning {len(tool_outputs)} tool outputs")
-            
-            return {
-                **state,
-                "executor_messages": executor_messages + tool_outputs,
-                "executor_data": state.get("executor_data", []) + new_data
-            }
+            # gather preserves the order of tool_calls
+            results = await asyncio.gather(*(self._arun_tool_call(call) for call in tool_calls))
+            return self._apply_tool_results(state, results)
             
         except Exception as e:
-            return {
-                **state,
-                "error": f"Tool execution failed: {str(e)}"
-            }
+            return self._tools_failed(state, e)
+
+    def _compression_messages(self, state: dict) -> list:
+        execution_job = state.get("execution_job", "Complete the assigned task")
+        executor_messages = state.get("executor_messages", [])
+        
+        return [
+            SystemMessage(content=self.compress_execution_system_prompt),
+            *executor_messages,
+            HumanMessage(content=self.compress_execution_human_message.format(
+                shipment_request=execution_job
+            ))
+        ]
+
+    def _apply_compression(self, state: dict, response, path: str = "llm") -> dict:
+        executor_messages = state.get("executor_messages", [])
+        executor_data = [
+            str(m.content) for m in executor_messages 
+            if hasattr(m, 'content') and m.content
+        ]
+
+        return {
+            "output": str(response.content),
+            "compression": path,
+            "executor_data": executor_data,
+            "executor_messages": executor_messages
+        }
+
+    def _compression_failed(self, state: dict, e: Exception) -> dict:
+        return {
+            "output": f"Execution completed with errors: {str(e)}",
+            "executor_data": state.get("executor_data", []),
+            "executor_messages": state.get("executor_messages", [])
+        }
+
+    def _findings(self, state: dict) -> list:
+        """(source, content) pairs worth keeping: tool results (minus think_tool) and the final answer."""
+        findings = []
+        for message in state.get("executor_messages", []):
+            if not message.content:
+                continue
+            if isinstance(message, ToolMessage) and message.name != think_tool.name:
+                findings.append((f"Sparrow Tool: {message.name}", str(message.content)))
+            elif isinstance(message, AIMessage) and not message.tool_calls:
+                findings.append(("Executor", str(message.content)))
+        return findings
+
+    def _compression_path(self, state: dict) -> str:
+        """Pick 'passthrough', 'extractive' or 'llm' from the transcript size."""
+        tokens = count_tokens_approximately(state.get("executor_messages", []))
+        if tokens <= self.passthrough_tokens:
+            path = "passthrough"
+        elif tokens <= self.llm_compression_tokens:
+            path = "extractive"
+        else:
+            path = "llm"
+        metrics.increment("compression_path_total", path=path)
+        logger.debug("Compressing %d transcript tokens via %s", tokens, path)
+        return path
+
+    def _local_compression(self, state: dict, path: str) -> dict:
+        """
+        Compress without the LLM.
+
+        Pass-through keeps every finding verbatim; extractive drops repeated
+        findings and clips long tool outputs.
+        """
+        findings = self._findings(state)
+        if path == "extractive":
+            findings = [
+                (source, content[:EXTRACTIVE_TOOL_CHARS])
+                for source, content in dict.fromkeys(findings)
+            ]
+        if not findings:
+            return self._apply_compression(state, AIMessage(content="No findings were gathered for this job."), path)
+
+        sources = list(dict.fromkeys(source for source, _ in findings))
+        lines = [f"- {content} [{sources.index(source) + 1}]" for source, content in findings]
+        lines += ["", "### Sources"] + [f"[{i}] {source}" for i, source in enumerate(sources, 1)]
+        return self._apply_compression(state, AIMessage(content="\n".join(lines)), path)
 
     def compress_execution(self, state: dict) -> dict:
         """Summarizes the execution and returns final structured output."""
         try:
-            execution_job = state.get("execution_job", "Complete the assigned task")
-            executor_messages = state.get("executor_messages", [])
+            path = self._compression_path(state)
+            if path != "llm":
+                return self._local_compression(state, path)
+            with self.policy.call("compress") as call:
+                response = call.llm.invoke(self._compression_messages(state))
+                call.outcome = self._response_outcome(response)
+            return self._apply_compression(state, response)
             
-            messages = [
-                SystemMessage(content=self.compress_execution_system_prompt),
-                *executor_messages,
-                HumanMessage(content=self.compress_execution_human_message.format(
-                    shipment_request=execution_job
-                ))
-            ]
-
-            response = self.llm.invoke(messages)
-
-            executor_data = [
-                str(m.content) for m in executor_messages 
-                if hasattr(m, 'content') and m.content
-            ]
+        except Exception as e:
+            return self._compression_failed(state, e)
 
-            return {
-                "output": str(response.content),
-                "executor_data": executor_data,
-                "executor_messages": executor_messages
-            }
+    async def acompress_execution(self, state: dict) -> dict:
+        """Async version of compress_execution."""
+        try:
+            path = self._compression_path(state)
+            if path != "llm":
+                return self._local_compression(state, path)
+            with self.policy.call("compress") as call:
+                response = await call.llm.ainvoke(self._compression_messages(state))
+                call.outcome = self._response_outcome(response)
+            return self._apply_compression(state, response)
             
         except Exception as e:
-            return {
-                "output": f"Execution completed with errors: {str(e)}",
-                "executor_data": state.get("executor_data", []),
-                "executor_messages": state.get("executor_messages", [])
-            }
+            return self._compression_failed(state, e)
 
     def route_after_llm(self, state: dict) -> str:
         """Route: decide whether to call a tool or finalize."""
@@ -189,7 +442,7 @@ class ExecutorNode:
             last_msg = executor_messages[-1]
             has_tool_calls = bool(getattr(last_msg, "tool_calls", None))
             
-            print(f"Routing decision - Has tool calls: {has_tool_calls}")
+            logger.debug("Routing decision - has tool calls: %s", has_tool_calls)
             
             return "tool_node" if has_tool_calls else "compress_execution"
         except Exception as e:
@@ -200,10 +453,10 @@ class ExecutorNode:
         iteration_count = state.get("iteration_count", 0) + 1
         state["iteration_count"] = iteration_count
         
-        print(f"Iteration count: {iteration_count}/{self.MAX_ITERATIONS}")
+        logger.debug("Iteration count: %d/%d", iteration_count, self.MAX_ITERATIONS)
         
         if iteration_count > self.MAX_ITERATIONS:
-            print("Max iterations reached, finalizing...")
+            logger.info("Max iterations reached, finalizing")
             return "compress_execution"
             
-        return self.route_after_llm(state)
\ No newline at end of file
+        return self.route_after_llm(state)
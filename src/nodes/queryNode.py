@@ -1,119 +1,362 @@
-
-
-
-
+import os
+import logging
 from datetime import datetime
 from typing_extensions import Literal
-from src.llms.groqllm import GroqLLM
+from src.llms.groqllm import GroqLLM, with_structured_output
+from src.llms.modelPolicy import ModelPolicy
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, get_buffer_string
-from src.utils.prompts import clarification_with_user_instructions, transform_messages_into_customer_query_brief_prompt
-from src.states.queryState import SparrowAgentState, ClarifyWithUser, CustomerQuestion
+from langchain_core.messages.utils import count_tokens_approximately
+from src.utils.prompts import clarification_with_user_instructions, transform_messages_into_customer_query_brief_prompt, summarize_conversation_prompt, combined_intake_prompt
+from src.states.queryState import SparrowAgentState, ClarifyWithUser, CustomerQuestion, IntakeDecision
 from src.utils.utils import get_today_str
 
+logger = logging.getLogger(__name__)
+
+# Diagnostics mode also logs the unstructured model output for the query brief,
+# at the cost of an extra LLM round-trip per brief
+DIAGNOSTICS = os.environ.get("SPARROW_DIAGNOSTICS", "False").lower() == "true"
+
+# Conversation history sent to the intake prompts is capped at this many
+# (approximate) tokens. Older messages are folded into a rolling summary,
+# either extractively (no LLM call) or by the LLM.
+PROMPT_TOKEN_BUDGET = int(os.environ.get("SPARROW_PROMPT_TOKEN_BUDGET", "2000"))
+HISTORY_SUMMARY_MODE = os.environ.get("SPARROW_HISTORY_SUMMARY", "extractive")
+EXTRACTIVE_SUMMARY_CHARS = 1500
+
+# "separate": clarify_with_user then write_query_brief (two structured calls);
+# "combined": one intake call returns the clarification decision and the brief
+INTAKE_MODE = os.environ.get("SPARROW_INTAKE_MODE", "separate")
+
 class QueryNode:
-    def __init__(self, llm):
+    def __init__(self, llm, diagnostics: bool = DIAGNOSTICS,
+                 token_budget: int = PROMPT_TOKEN_BUDGET, summary_mode: str = HISTORY_SUMMARY_MODE,
+                 intake_mode: str = INTAKE_MODE, policy: ModelPolicy = None):
         self.llm = llm
+        # Model per step (clarify/brief/intake/summary); a bare llm serves every step
+        self.policy = policy or ModelPolicy.single(llm)
+        self.diagnostics = diagnostics
+        self.token_budget = token_budget
+        self.summary_mode = summary_mode
+        self.intake_mode = intake_mode
+
+    def _split_history(self, state: SparrowAgentState) -> tuple:
+        """
+        Split the not-yet-summarised messages into (dropped, kept).
+
+        ``kept`` is the most recent run of messages that fits the token
+        budget (always at least the last message); ``dropped`` is what has
+        to be folded into the rolling summary.
+        """
+        messages = state.get("messages", [])
+        recent = list(messages[state.get("summarized_messages", 0):])
+        
+        kept, used = [], 0
+        for message in reversed(recent):
+            tokens = count_tokens_approximately([message])
+            if kept and used + tokens > self.token_budget:
+                break
+            kept.insert(0, message)
+            used += tokens
+        
+        return recent[:len(recent) - len(kept)], kept
+
+    def _extractive_summary(self, summary: str, dropped: list) -> str:
+        """Fold dropped messages into the summary without an LLM call."""
+        lines = [summary] if summary else []
+        lines += [f"{m.type}: {str(m.content)[:300]}" for m in dropped if m.type == "human"]
+        # Keep the most recent part when the summary outgrows its cap
+        return "\n".join(lines)[-EXTRACTIVE_SUMMARY_CHARS:]
+
+    def _summary_messages(self, summary: str, dropped: list) -> list:
+        return [HumanMessage(content=summarize_conversation_prompt.format(
+            summary=summary or "(empty)",
+            messages=get_buffer_string(dropped)
+        ))]
+
+    def _history_update(self, state: SparrowAgentState, dropped: list, summary: str) -> dict:
+        return {
+            "conversation_summary": summary,
+            "summarized_messages": state.get("summarized_messages", 0) + len(dropped)
+        }
+
+    def _render_history(self, summary: str, kept: list) -> str:
+        history = get_buffer_string(kept)
+        if summary:
+            history = f"Summary of the earlier conversation:\n{summary}\n\n{history}"
+        return history
+
+    def _history(self, state: SparrowAgentState) -> tuple:
+        """Return (prompt-ready history, state update for the rolling summary)."""
+        dropped, kept = self._split_history(state)
+        summary = state.get("conversation_summary", "")
+        if not dropped:
+            return self._render_history(summary, kept), {}
         
-    def clarify_with_user(self, state: SparrowAgentState) -> SparrowAgentState:
+        if self.summary_mode == "llm":
+            with self.policy.call("summary") as call:
+                summary = str(call.llm.invoke(self._summary_messages(summary, dropped)).content)
+                call.outcome = "ok" if summary.strip() else "empty"
+        else:
+            summary = self._extractive_summary(summary, dropped)
+        return self._render_history(summary, kept), self._history_update(state, dropped, summary)
+
+    async def _ahistory(self, state: SparrowAgentState) -> tuple:
+        """Async version of _history."""
+        dropped, kept = self._split_history(state)
+        summary = state.get("conversation_summary", "")
+        if not dropped:
+            return self._render_history(summary, kept), {}
+        
+        if self.summary_mode == "llm":
+            with self.policy.call("summary") as call:
+                response = await call.llm.ainvoke(self._summary_messages(summary, dropped))
+                summary = str(response.content)
+                call.outcome = "ok" if summary.strip() else "empty"
+        else:
+            summary = self._extractive_summary(summary, dropped)
+        return self._render_history(summary, kept), self._history_update(state, dropped, summary)
+
+    def _clarification_messages(self, history: str) -> list:
+        """Build the prompt for the clarification decision."""
+        return [
+            SystemMessage(
+                content="Route the input to yes or no based on the need of clarification of the query"
+            ),
+            HumanMessage(
+                content=clarification_with_user_instructions.format(
+                    messages=history,
+                    date=get_today_str()
+                )
+            )
+        ]
+
+    def _apply_clarification(self, response: ClarifyWithUser) -> dict:
         """
-        Determine if the user's request contains sufficient information to proceed.
-        Returns updated state with clarification status.
+        State update for the clarification decision.
+
+        This is the first node of every turn, so it also clears the previous
+        turn's final message.
         """
-        structured_output_model = self.llm.with_structured_output(ClarifyWithUser)
+        logger.debug("Clarification response: %s", response)
         
+        if response.need_clarification == 'yes':
+            return {
+                "messages": [AIMessage(content=response.question)],
+                "final_message": "",
+                "clarification_complete": False,
+                "needs_clarification": True
+            }
+        return {
+            "messages": [AIMessage(content=response.verification)],
+            "final_message": "",
+            "clarification_complete": True,
+            "needs_clarification": False
+        }
+
+    def _clarification_failed(self, e: Exception) -> dict:
+        logger.error("Error in clarify_with_user: %s", e)
+        return {
+            "final_message": "",
+            "clarification_complete": False,
+            "needs_clarification": True,
+            "error": str(e)
+        }
+        
+    def clarify_with_user(self, state: SparrowAgentState) -> dict:
+        """
+        Determine if the user's request contains sufficient information to proceed.
+        Returns the state update with clarification status.
+        """
         try:
-            response = structured_output_model.invoke([
-                SystemMessage(
-                    content="Route the input to yes or no based on the need of clarification of the query"
-                ),
-                HumanMessage(
-                    content=clarification_with_user_instructions.format(
-                        messages=get_buffer_string(messages=state.get("messages", [])),
-                        date=get_today_str()
-                    )
-                )
-            ])
-            
-            print("CLARIFICATION RESPONSE:", response)
-            
-            # Update state based on response
-            updated_state = {**state}
-            
-            if response.need_clarification == 'yes':
-                updated_state.update({
-                    "messages": state.get("messages", []) + [AIMessage(content=response.question)],
-                    "clarification_complete": False,
-                    "needs_clarification": True
-                })
-            else:
-                updated_state.update({
-                    "messages": state.get("messages", []) + [AIMessage(content=response.verification)],
-                    "clarification_complete": True,
-                    "needs_clarification": False
-                })
+            history, history_update = self._history(state)
+            # Structured runnables are cached per model, so this is a dict lookup
+            with self.policy.call("clarify") as call:
+                response = with_structured_output(call.llm, ClarifyWithUser).invoke(
+                    self._clarification_messages(history))
+            return {**history_update, **self._apply_clarification(response)}
             
-            return updated_state
+        except Exception as e:
+            return self._clarification_failed(e)
+
+    async def aclarify_with_user(self, state: SparrowAgentState) -> dict:
+        """Async version of clarify_with_user."""
+        try:
+            history, history_update = await self._ahistory(state)
+            with self.policy.call("clarify") as call:
+                response = await with_structured_output(call.llm, ClarifyWithUser).ainvoke(
+                    self._clarification_messages(history))
+            return {**history_update, **self._apply_clarification(response)}
             
         except Exception as e:
-            print(f"Error in clarify_with_user: {e}")
+            return self._clarification_failed(e)
+
+    def _query_brief_prompt(self, history: str) -> str:
+        """Render the query brief prompt from the conversation history."""
+        prompt = transform_messages_into_customer_query_brief_prompt.format(
+            messages=history,
+            date=get_today_str()
+        )
+        logger.debug("Query brief prompt: %s", prompt)
+        return prompt
+
+    def _missing_messages(self) -> dict:
+        logger.error("No messages in state")
+        return {
+            "query_brief": "",
+            "error": "No messages available for query brief creation"
+        }
+
+    def _apply_query_brief(self, response: CustomerQuestion) -> dict:
+        """State update storing the structured query brief."""
+        logger.debug("Structured query brief response: %s", response)
+        
+        if response is None:
+            logger.error("Structured query brief response is None")
             return {
-                **state,
-                "clarification_complete": False,
-                "needs_clarification": True,
-                "error": str(e)
+                "query_brief": "",
+                "error": "Failed to generate structured response"
             }
+        
+        return {
+            "query_brief": response.query_brief,
+            "master_messages": [HumanMessage(content=response.query_brief)],
+            "query_brief_complete": True
+        }
 
-    def write_query_brief(self, state: SparrowAgentState) -> SparrowAgentState:
+    def _query_brief_failed(self, e: Exception) -> dict:
+        logger.error("Error in write_query_brief: %s", e)
+        return {
+            "query_brief": "",
+            "error": str(e)
+        }
+
+    def write_query_brief(self, state: SparrowAgentState) -> dict:
         """
         Transform the conversation history into a comprehensive customer query brief.
         """
         try:
-            structured_output_model = self.llm.with_structured_output(CustomerQuestion)
-            
-            messages = state.get("messages", [])
-            print("STATE MESSAGES:", messages)
+            if not state.get("messages"):
+                return self._missing_messages()
             
-            if not messages:
-                print("ERROR: No messages in state")
-                return {
-                    **state,
-                    "query_brief": "",
-                    "error": "No messages available for query brief creation"
-                }
+            history, history_update = self._history(state)
+            prompt = self._query_brief_prompt(history)
             
-            prompt = transform_messages_into_customer_query_brief_prompt.format(
-                messages=get_buffer_string(messages),
-                date=get_today_str()
-            )
-            print("PROMPT:", prompt)
+            with self.policy.call("brief") as call:
+                if self.diagnostics:
+                    raw_response = call.llm.invoke([HumanMessage(content=prompt)])
+                    logger.info("Raw query brief response: %s", raw_response)
+                
+                # Get structured response
+                response = with_structured_output(call.llm, CustomerQuestion).invoke([HumanMessage(content=prompt)])
+                call.outcome = "ok" if response is not None and response.query_brief.strip() else "empty"
+            return {**history_update, **self._apply_query_brief(response)}
             
-            # Test raw response first
-            raw_response = self.llm.invoke([HumanMessage(content=prompt)])
-            print("RAW MODEL RESPONSE:", raw_response)
+        except Exception as e:
+            return self._query_brief_failed(e)
+
+    async def awrite_query_brief(self, state: SparrowAgentState) -> dict:
+        """Async version of write_query_brief."""
+        try:
+            if not state.get("messages"):
+                return self._missing_messages()
             
-            # Get structured response
-            response = structured_output_model.invoke([HumanMessage(content=prompt)])
-            print("STRUCTURED RESPONSE:", response)
+            history, history_update = await self._ahistory(state)
+            prompt = self._query_brief_prompt(history)
             
-            if response is None:
-                print("ERROR: Structured response is None")
-                return {
-                    **state,
-                    "query_brief": "",
-                    "error": "Failed to generate structured response"
-                }
+            with self.policy.call("brief") as call:
+                if self.diagnostics:
+                    raw_response = await call.llm.ainvoke([HumanMessage(content=prompt)])
+                    logger.info("Raw query brief response: %s", raw_response)
+                
+                # Get structured response
+                response = await with_structured_output(call.llm, CustomerQuestion).ainvoke(
+                    [HumanMessage(content=prompt)])
+                call.outcome = "ok" if response is not None and response.query_brief.strip() else "empty"
+            return {**history_update, **self._apply_query_brief(response)}
             
+        except Exception as e:
+            return self._query_brief_failed(e)
+
+    def _intake_messages(self, history: str) -> list:
+        """Build the prompt for the combined intake call."""
+        return [
+            SystemMessage(
+                content="Decide whether the query needs clarification and, if not, write its query brief"
+            ),
+            HumanMessage(
+                content=combined_intake_prompt.format(
+                    messages=history,
+                    date=get_today_str()
+                )
+            )
+        ]
+
+    def _apply_intake(self, response: IntakeDecision) -> dict:
+        """
+        State update for the combined intake decision.
+
+        Like clarify_with_user this starts every turn, so it clears the
+        previous turn's final message and query brief.
+        """
+        logger.debug("Intake response: %s", response)
+        
+        if response.need_clarification == 'yes' or not response.query_brief.strip():
             return {
-                **state,
-                "query_brief": response.query_brief,
-                "master_messages": [HumanMessage(content=response.query_brief)],
-                "query_brief_complete": True
+                "messages": [AIMessage(content=response.question or
+                    "I need a bit more information to help you effectively. Could you provide more details about your request?")],
+                "final_message": "",
+                "query_brief": ""
             }
+        return {
+            "messages": [AIMessage(content=response.verification)] if response.verification else [],
+            "final_message": "",
+            "query_brief": response.query_brief,
+            "master_messages": [HumanMessage(content=response.query_brief)]
+        }
+
+    @staticmethod
+    def _intake_outcome(response: IntakeDecision) -> str:
+        # "no clarification needed" without a brief falls back to asking the user
+        if response.need_clarification != 'yes' and not response.query_brief.strip():
+            return "empty"
+        return "ok"
+
+    def _intake_failed(self, e: Exception) -> dict:
+        logger.error("Error in intake: %s", e)
+        return {
+            "final_message": "",
+            "query_brief": "",
+            "error": str(e)
+        }
+
+    def intake(self, state: SparrowAgentState) -> dict:
+        """
+        Combined clarify_with_user + write_query_brief in one structured call
+        (``intake_mode="combined"``).
+        """
+        try:
+            history, history_update = self._history(state)
+            with self.policy.call("intake") as call:
+                response = with_structured_output(call.llm, IntakeDecision).invoke(self._intake_messages(history))
+                call.outcome = self._intake_outcome(response)
+            return {**history_update, **self._apply_intake(response)}
             
         except Exception as e:
-            print(f"Error in write_query_brief: {e}")
-            return {
-                **state,
-                "query_brief": "",
-                "error": str(e)
-            }
\ No newline at end of file
+            return self._intake_failed(e)
+
+    async def aintake(self, state: SparrowAgentState) -> dict:
+        """Async version of intake."""
+        try:
+            history, history_update = await self._ahistory(state)
+            with self.policy.call("intake") as call:
+                response = await with_structured_output(call.llm, IntakeDecision).ainvoke(
+                    self._intake_messages(history))
+                call.outcome = self._intake_outcome(response)
+            return {**history_update, **self._apply_intake(response)}
+            
+        except Exception as e:
+            return self._intake_failed(e)
+
+    def route_after_intake(self, state: SparrowAgentState) -> Literal["master_subgraph", "__end__"]:
+        """Run the master graph once intake produced a brief; otherwise wait for the user."""
+        return "master_subgraph" if state.get("query_brief") else "__end__"
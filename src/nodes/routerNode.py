@@ -0,0 +1,228 @@
+"""
+Deterministic intent router that runs before the LLM intake.
+
+Messages that unambiguously ask for one thing a tool can answer (tracking
+numbers, an origin/destination ETA, a user ID lookup) are answered by
+calling the tool directly and rendering a template; everything else falls
+through to ``clarify_with_user`` and the full graph. Hits and misses are
+counted in ``src.utils.metrics``.
+"""
+import logging
+import os
+import re
+from typing import Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.nodes.actionNode import tool_cache
+from src.states.queryState import NEW_TURN
+from src.utils.metrics import metrics
+from src.utils.trackingBackend import NOT_FOUND, unique_tracking_numbers
+from src.utils.utils import track_package, track_packages, get_user_information, estimated_time_analysis
+
+logger = logging.getLogger(__name__)
+
+INTENT_ROUTER_ENABLED = os.environ.get("SPARROW_INTENT_ROUTER", "1") not in ("0", "false", "no")
+
+# Tracking numbers: 6-20 letters and digits, containing at least one of each
+TRACKING_ID_RE = re.compile(r"\b(?=[A-Za-z0-9]*\d)(?=[A-Za-z0-9]*[A-Za-z])[A-Za-z0-9]{6,20}\b")
+# A tracking ask has to say what it wants (parcel nouns alone are not enough).
+# "delivery" is left out on purpose: "change the delivery address of ..." is a request, not a lookup
+TRACKING_WORDS_RE = re.compile(
+    r"\b(track\w*|where(?:'s| is| are)|status|been delivered|delivered yet|arriv\w*)\b", re.I)
+# What may be left of a message that is nothing but tracking numbers
+SEPARATORS_RE = re.compile(r"^[\s,;|/\-]*$")
+# A list of tracking numbers ("A, B and C") is collapsed to one placeholder
+TRACKING_LIST_RE = re.compile(r"#(?:\s*(?:,|;|/|&|\band\b)\s*#)+", re.I)
+# Anything that starts a second ask: a clause break, a conjunction, a follow-up question
+EXTRA_ASK_RE = re.compile(r"[,;:]|\b(and|but|also|plus|or|then|what about|how about)\b|[.!?].*\w", re.I)
+# Words a routed message may have besides its tracking numbers / route / user ID
+MAX_ASK_WORDS = 12
+
+ETA_WORDS_RE = re.compile(r"\b(how long|eta|estimat\w*|delivery time|transit time|take to)\b", re.I)
+# "from <origin> to <destination> [by|via|with|using <service> [service|delivery|shipping]]";
+# the place names never run over those words, so the service is its own argument
+_PLACE = r"([A-Za-z](?:(?!\b(?:by|via|with|using)\b)[\w .'-])*?)"
+ROUTE_RE = re.compile(
+    rf"\bfrom\s+{_PLACE}\s+to\s+{_PLACE}"
+    r"(?:\s+(?:by|via|with|using)\s+([\w-]+)(?:\s+(?:service|delivery|shipping))?)?\s*(?:[?.!,]|$)", re.I)
+
+USER_ID_RE = re.compile(r"\buser\s*(?:id)?\s*(?:is|:|#|=)?\s*([A-Za-z0-9_-]*\d[A-Za-z0-9_-]*)\b", re.I)
+USER_WORDS_RE = re.compile(r"\b(info\w*|details?|account|profile|history)\b", re.I)
+
+# Longer messages usually carry more than one ask; leave those to the LLM
+MAX_ROUTED_CHARS = 200
+
+
+class IntentRouter:
+    """
+    Rule/regex intent router in front of ``clarify_with_user``.
+
+    A message is only routed when exactly one intent matches; the answer is
+    written to ``messages``/``final_message`` and ``routed_intent`` tells the
+    graph to finish the turn.
+    """
+
+    def __init__(self, enabled: bool = INTENT_ROUTER_ENABLED, cache=tool_cache):
+        self.enabled = enabled
+        self.tool_cache = cache
+
+    def _match_tracking(self, text: str) -> Optional[dict]:
+        """
+        Tracking numbers on their own, or one short "track / where is X"
+        question; a message with anything else in it goes to the LLM.
+        """
+        if len(text) > MAX_ROUTED_CHARS:
+            return None
+        ids = unique_tracking_numbers(TRACKING_ID_RE.findall(text))
+        if not ids or re.search(r"\buser\b", text, re.I):
+            return None
+        rest = TRACKING_LIST_RE.sub("#", TRACKING_ID_RE.sub("#", text))
+        if SEPARATORS_RE.match(rest.replace("#", "")):
+            return {"tracking_numbers": ids}
+        if not TRACKING_WORDS_RE.search(rest) or not self._single_ask(rest):
+            return None
+        return {"tracking_numbers": ids}
+
+    @staticmethod
+    def _single_ask(rest: str) -> bool:
+        """
+        True when what is left of a message (its tracking numbers, route or
+        user ID taken out) is one short ask with no second clause.
+        """
+        return not EXTRA_ASK_RE.search(rest) and len(rest.split()) <= MAX_ASK_WORDS
+
+    def _match_eta(self, text: str) -> Optional[dict]:
+        if len(text) > MAX_ROUTED_CHARS or not ETA_WORDS_RE.search(text):
+            return None
+        route = ROUTE_RE.search(text)
+        if route is None:
+            return None
+        origin, destination = route.group(1).strip(), route.group(2).strip()
+        # The place names are checked too: a lazy destination runs to the end of the message
+        if not self._single_ask(ROUTE_RE.sub(" # ", text, count=1)) or EXTRA_ASK_RE.search(f"{origin} {destination}"):
+            return None
+        params = {"origin": origin, "destination": destination}
+        if route.group(3):
+            params["service"] = route.group(3).lower()
+        return params
+
+    def _match_user(self, text: str) -> Optional[dict]:
+        if len(text) > MAX_ROUTED_CHARS or not USER_WORDS_RE.search(text):
+            return None
+        user = USER_ID_RE.search(text)
+        if user is None or not self._single_ask(USER_ID_RE.sub(" # ", text, count=1)):
+            return None
+        return {"userId": user.group(1)}
+
+    def match(self, text: str) -> Optional[tuple]:
+        """Return ``(intent, params)`` when exactly one intent matches ``text``."""
+        text = (text or "").strip()
+        if not text:
+            return None
+        matches = [
+            (intent, params) for intent, params in (
+                ("tracking", self._match_tracking(text)),
+                ("eta", self._match_eta(text)),
+                ("user_information", self._match_user(text)),
+            ) if params is not None
+        ]
+        return matches[0] if len(matches) == 1 else None
+
+    def _tool_call(self, intent: str, params: dict) -> tuple:
+        """The (tool, args) that answers a matched intent."""
+        if intent == "tracking":
+            numbers = params["tracking_numbers"]
+            if len(numbers) == 1:
+                return track_package, {"tracking_number": numbers[0]}
+            return track_packages, {"tracking_numbers": numbers}
+        if intent == "eta":
+            return estimated_time_analysis, params
+        return get_user_information, params
+
+    def _render(self, intent: str, params: dict, result) -> str:
+        result = str(result)
+        if intent == "tracking":
+            numbers = params["tracking_numbers"]
+            if len(numbers) > 1:
+                return f"Here is the latest status of your {len(numbers)} parcels:\n\n{result}"
+            if result == NOT_FOUND:
+                return (f"I couldn't find a parcel with tracking number {numbers[0]}. "
+                        "Please double-check the number and try again.")
+            return f"Here is the latest on parcel {numbers[0]}: {result}"
+        if intent == "eta":
+            return f"{result}."
+        return result
+
+    def _latest_user_text(self, state: dict) -> str:
+        messages = state.get("messages", [])
+        if messages and isinstance(messages[-1], HumanMessage):
+            return str(messages[-1].content)
+        return ""
+
+    def _matched(self, state: dict) -> Optional[tuple]:
+        if not self.enabled:
+            return None
+        matched = self.match(self._latest_user_text(state))
+        if matched is None:
+            metrics.increment("intent_router_requests_total", outcome="miss")
+        return matched
+
+    def _routed(self, intent: str, params: dict, result) -> dict:
+        metrics.increment("intent_router_requests_total", outcome="hit")
+        metrics.increment("intent_router_hits_total", intent=intent)
+        answer = self._render(intent, params, result)
+        return {
+            "messages": [AIMessage(content=answer)],
+            "final_message": answer,
+            "routed_intent": intent,
+            "notes": [NEW_TURN, f"Answered by intent router: {intent}"]
+        }
+
+    def _failed(self, intent: str, e: Exception) -> dict:
+        logger.warning("Intent router tool call failed for %s: %s", intent, e)
+        metrics.increment("intent_router_requests_total", outcome="error")
+        return {"routed_intent": "", "notes": [NEW_TURN]}
+
+    def route(self, state: dict) -> dict:
+        """Answer the latest message directly when it matches a known intent."""
+        matched = self._matched(state)
+        if matched is None:
+            return {"routed_intent": "", "notes": [NEW_TURN]}
+        intent, params = matched
+        tool, args = self._tool_call(intent, params)
+        try:
+            result, _ = self.tool_cache.call(tool.name, args, lambda: tool.invoke(args))
+        except Exception as e:
+            return self._failed(intent, e)
+        return self._routed(intent, params, result)
+
+    async def aroute(self, state: dict) -> dict:
+        """Async version of route."""
+        matched = self._matched(state)
+        if matched is None:
+            return {"routed_intent": "", "notes": [NEW_TURN]}
+        intent, params = matched
+        tool, args = self._tool_call(intent, params)
+        try:
+            result, _ = await self.tool_cache.acall(tool.name, args, lambda: tool.ainvoke(args))
+        except Exception as e:
+            return self._failed(intent, e)
+        return self._routed(intent, params, result)
+
+    def route_after_router(self, state: dict) -> str:
+        return "__end__" if state.get("routed_intent") else "clarify_with_user"
+
+    def stats(self) -> dict:
+        hits = metrics.counter("intent_router_requests_total", outcome="hit")
+        total = metrics.total("intent_router_requests_total")
+        return {
+            "enabled": self.enabled,
+            "requests": total,
+            "hits": hits,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "by_intent": metrics.snapshot().get("intent_router_hits_total", {}),
+        }
+
+
+intent_router = IntentRouter()
@@ -27,6 +27,7 @@ class ExecutorOutputState(TypedDict):
 
     """
     output: str  
+    compression: str  # compress_execution path that produced output: passthrough/extractive/llm
     executor_data: List[str]
     executor_messages: Annotated[Sequence[BaseMessage], add_messages]
 
@@ -1,4 +1,3 @@
-import operator 
 from typing_extensions import Optional, Annotated, List, Sequence, Literal
 
 from langchain_core.messages import BaseMessage
@@ -7,6 +6,22 @@ from langgraph.graph.message import add_messages
 from pydantic import BaseModel, Field 
 
 
+# Marks the start of a turn in a ``notes`` update; earlier turns' notes are dropped
+NEW_TURN = "__new_turn__"
+
+
+def turn_notes(existing: list[str], new: list[str]) -> list[str]:
+    """
+    Reducer for ``notes``: appends like ``operator.add``, except that an update
+    containing ``NEW_TURN`` starts over with the notes after it. The intent
+    router (the first node of every turn) sends it, so the checkpointed notes
+    only ever describe the current turn.
+    """
+    if NEW_TURN in new:
+        return list(new[len(new) - new[::-1].index(NEW_TURN):])
+    return list(existing or []) + list(new)
+
+
 class SparrowInputState(MessagesState):
     """Input state for the full agent - only contains from the user input."""
     pass 
@@ -22,8 +37,13 @@ class SparrowAgentState(MessagesState):
     """
     query_brief: Optional[str]
     master_messages: Annotated[Sequence[BaseMessage], add_messages]
-    notes: Annotated[list[str], operator.add] = []
+    notes: Annotated[list[str], turn_notes] = []
     final_message: str
+    # Rolling summary of the messages that no longer fit the intake prompt budget
+    conversation_summary: str
+    summarized_messages: int
+    # Intent answered by the deterministic router this turn ("" when the LLM path runs)
+    routed_intent: str
 
 class ClarifyWithUser(BaseModel):
     """Schema for user clarification decision and questions"""
@@ -43,4 +63,20 @@ class CustomerQuestion(BaseModel):
 
     query_brief: str = Field(
         description="A customer question that will be used to guide the research."
-    )
\ No newline at end of file
+    )
+
+class IntakeDecision(BaseModel):
+    """Schema for the combined intake call: clarification decision and query brief together"""
+
+    need_clarification: Literal["yes", "no"] = Field(
+        description="Whether the user needs to be asked a clarifying question"
+    )
+    question: str = Field(
+        description="A question to ask the user to clarify the need, empty when no clarification is needed"
+    )
+    verification: str = Field(
+        description="Acknowledgement that we will start processing the request, empty when clarification is needed"
+    )
+    query_brief: str = Field(
+        description="The customer query brief used to guide execution, empty when clarification is needed"
+    )
@@ -0,0 +1,258 @@
+"""
+Framework-agnostic conversation handling shared by the Flask app (app.py)
+and the ASGI server (server.py).
+"""
+import hmac
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from langchain_core.messages import HumanMessage
+
+from src.utils.conversationStore import LRUConversationStore, SQLiteConversationStore, LatestCheckpointSaver
+from src.utils.tracing import MetricsCallbackHandler
+from src.utils.userProfiles import user_profiles
+
+logger = logging.getLogger(__name__)
+
+# Conversation store settings; set SPARROW_CONVERSATION_DB to an empty string
+# to keep conversations in memory only
+CONVERSATION_DB = os.environ.get("SPARROW_CONVERSATION_DB", "conversations.db")
+CONVERSATION_CACHE_SIZE = int(os.environ.get("SPARROW_CONVERSATION_CACHE_SIZE", "1000"))
+CONVERSATION_TTL = float(os.environ.get("SPARROW_CONVERSATION_TTL", str(24 * 3600)))
+
+
+def build_conversation_store(on_evict=None):
+    """Build the conversation store configured through the environment"""
+    backend = SQLiteConversationStore(CONVERSATION_DB) if CONVERSATION_DB else None
+    return LRUConversationStore(
+        backend=backend,
+        max_size=CONVERSATION_CACHE_SIZE,
+        ttl=CONVERSATION_TTL,
+        on_evict=on_evict
+    )
+
+
+# Graph state between turns lives in the checkpointer (hot, per process);
+# the conversation store keeps the durable transcript. A thread's checkpoint
+# is dropped together with its in-memory conversation, and re-seeded from
+# the transcript if the thread comes back. Only the latest checkpoint of a
+# thread is kept.
+checkpointer = LatestCheckpointSaver()
+
+# The store (and its SQLite file) is created on first use, not at import
+_conversations = None
+_conversations_lock = threading.Lock()
+
+
+def get_conversations():
+    """The process-wide conversation store, built on first use"""
+    global _conversations
+    if _conversations is None:
+        with _conversations_lock:
+            if _conversations is None:
+                _conversations = build_conversation_store(on_evict=checkpointer.delete_thread)
+    return _conversations
+
+
+def __getattr__(name):
+    # ``conversations`` is built lazily instead of at import time
+    if name == "conversations":
+        return get_conversations()
+    raise AttributeError(name)
+
+# Nodes whose LLM tokens are forwarded to the client while streaming
+STREAMED_TOKEN_NODES = {'synthesizer'}
+
+
+def get_or_create_conversation(thread_id):
+    """Return the conversation for a thread, creating an empty one if needed"""
+    conversation = get_conversations().get(thread_id)
+    if conversation is None:
+        conversation = {
+            'messages': [],
+            'created_at': datetime.now(),
+            'last_updated': datetime.now()
+        }
+    return conversation
+
+
+def graph_config(thread_id, user_profile=''):
+    """
+    Graph run config carrying the conversation's thread id.
+
+    The metrics callback rides along in the config, so every node, LLM and
+    tool call of the run (including subgraphs and worker threads) is timed.
+    ``user_profile`` (see ``load_user_profile``) reaches the executors the
+    same way.
+    """
+    configurable = {'thread_id': thread_id}
+    if user_profile:
+        configurable['user_profile'] = user_profile
+    return {
+        'configurable': configurable,
+        'callbacks': [MetricsCallbackHandler(thread_id)]
+    }
+
+
+# Bearer token of the trusted front end (the portal that signs customers in).
+# Only requests carrying it may say which user they are for; without it set,
+# a ``user_id`` in the request body is ignored
+AUTH_TOKEN = os.environ.get("SPARROW_AUTH_TOKEN", "")
+
+
+def is_authenticated(authorization):
+    """True when an ``Authorization`` header carries the trusted front end's bearer token"""
+    if not AUTH_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip().encode(), AUTH_TOKEN.encode())
+
+
+def session_user_id(session, data, authorization):
+    """
+    The signed-in user of a request, kept in the signed session.
+
+    The body's ``user_id`` is only taken from an authenticated caller (see
+    ``is_authenticated``); anyone else gets the user the session already holds.
+    """
+    if data.get('user_id') and is_authenticated(authorization):
+        session['user_id'] = str(data['user_id'])
+    return session.get('user_id')
+
+
+def load_user_profile(user_id):
+    """Profile summary of the signed-in user; fetched once, then served from the profile cache"""
+    try:
+        return user_profiles.summary(user_id)
+    except Exception as e:
+        # A profile outage must not fail the chat; workers can still call the tool
+        logger.warning("Could not load profile for user %s: %s", user_id, e)
+        return ''
+
+
+def checkpoint_in_sync(checkpoint_values, conversation):
+    """True when the thread's checkpoint already ends with the stored transcript"""
+    stored = conversation['messages']
+    if not stored:
+        return True
+    checkpointed = checkpoint_values.get('messages', [])
+    return bool(checkpointed) and checkpointed[-1].id == stored[-1].id
+
+
+def build_sparrow_input(thread_id, conversation, user_message, in_sync=True):
+    """
+    Add the new user message to the conversation and build the agent input state.
+
+    Only the new message is submitted; the checkpointer supplies the rest of
+    the thread. When the checkpoint is missing or stale (new process, or the
+    thread was last served elsewhere) the stored transcript is sent along so
+    ``add_messages`` can merge it by message id.
+
+    The message gets its id here, before it is stored, so the stored copy and
+    the one the graph checkpoints are the same message to ``add_messages``.
+    """
+    new_message = HumanMessage(content=user_message, id=str(uuid.uuid4()))
+    history = [] if in_sync else list(conversation['messages'])
+    
+    conversation['messages'].append(new_message)
+    conversation['last_updated'] = datetime.now()
+    get_conversations().put(thread_id, conversation)
+    
+    return {'messages': history + [new_message]}
+
+
+def extract_response(result, user_message):
+    """Pull the reply text and status line out of the final agent state"""
+    response_message = ""
+    status_info = ""
+    
+    # Get the final message or the last AI message
+    if result.get('final_message'):
+        response_message = result['final_message']
+        status_info = "Task completed"
+    elif result.get('messages'):
+        # Find the last AI message
+        for msg in reversed(result['messages']):
+            if hasattr(msg, 'content') and msg.content and msg.content != user_message:
+                response_message = msg.content
+                break
+    
+    if not response_message:
+        response_message = "I'm processing your request. Could you provide more details?"
+    
+    # Add execution status information
+    if result.get('execution_jobs'):
+        status_info = f"Executed: {', '.join(result['execution_jobs'])}"
+    elif result.get('notes'):
+        # The notes only hold this turn's (see turn_notes); the last one is the status
+        status_info = result['notes'][-1] if result['notes'] else ""
+    
+    return response_message, status_info
+
+
+def save_result(thread_id, conversation, result):
+    """Update conversation with the agent's response"""
+    conversation['messages'] = result.get('messages', conversation['messages'])
+    conversation['last_updated'] = datetime.now()
+    get_conversations().put(thread_id, conversation)
+
+
+def ndjson(event):
+    """Serialise a single stream event as one NDJSON line"""
+    return json.dumps(event) + '\n'
+
+
+def stream_events(mode, chunk):
+    """
+    Translate one ``sparrowAgent.stream(..., subgraphs=True)`` chunk into client events.
+
+    ``updates`` chunks become ``node`` progress events and ``messages`` chunks
+    from STREAMED_TOKEN_NODES become ``token`` events; everything else is dropped.
+    """
+    if mode == 'updates':
+        for node in chunk:
+            yield {'type': 'node', 'node': node}
+    elif mode == 'messages':
+        message_chunk, metadata = chunk
+        if metadata.get('langgraph_node') in STREAMED_TOKEN_NODES and message_chunk.content:
+            yield token_event(message_chunk.content)
+
+
+def token_event(content):
+    return {'type': 'token', 'content': content}
+
+
+def closing_events(thread_id, response_message, status_info, streamed):
+    """
+    Events that end a stream.
+
+    Turns answered without a streamed synthesizer call (the intent router, a
+    single worker's answer, a cached response, a clarifying question) send
+    their whole answer as one ``token`` event first, so a client rendering
+    tokens always shows the answer.
+    """
+    if not streamed:
+        yield token_event(response_message)
+    yield final_event(thread_id, response_message, status_info)
+
+
+def final_event(thread_id, response_message, status_info):
+    return {
+        'type': 'final',
+        'success': True,
+        'response': response_message,
+        'status': status_info,
+        'thread_id': thread_id
+    }
+
+
+def error_event(e):
+    return {
+        'type': 'error',
+        'success': False,
+        'error': f"An error occurred: {str(e)}"
+    }
@@ -0,0 +1,271 @@
+"""
+Conversation storage keyed by ``thread_id``.
+
+``LRUConversationStore`` is a bounded in-memory tier (size + TTL cap) in
+front of an optional persistent backend. ``SQLiteConversationStore`` is the
+local backend; it runs in WAL mode so several worker processes can serve the
+same session from one database file. ``LatestCheckpointSaver`` is the
+graph checkpointer; it keeps only the newest checkpoint of each thread.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langgraph.checkpoint.memory import MemorySaver
+
+
+class ConversationStore:
+    """Interface every conversation store implements."""
+
+    def get(self, thread_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def put(self, thread_id: str, conversation: dict) -> None:
+        raise NotImplementedError
+
+    def delete(self, thread_id: str) -> None:
+        raise NotImplementedError
+
+    def prune(self, cutoff: float) -> int:
+        """Drop conversations last updated before ``cutoff`` (epoch seconds)."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Persistent conversation store in a local SQLite database."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversations (
+                    thread_id TEXT PRIMARY KEY,
+                    messages TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_updated REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversations_last_updated "
+                "ON conversations (last_updated)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def last_updated(self, thread_id: str) -> Optional[float]:
+        row = self._connection().execute(
+            "SELECT last_updated FROM conversations WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, thread_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT messages, created_at, last_updated FROM conversations WHERE thread_id = ?",
+            (thread_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        messages, created_at, last_updated = row
+        return {
+            "messages": messages_from_dict(json.loads(messages)),
+            "created_at": datetime.fromtimestamp(created_at),
+            "last_updated": datetime.fromtimestamp(last_updated),
+        }
+
+    def put(self, thread_id: str, conversation: dict) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO conversations (thread_id, messages, created_at, last_updated)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(thread_id) DO UPDATE SET
+                    messages = excluded.messages,
+                    last_updated = excluded.last_updated
+                """,
+                (
+                    thread_id,
+                    json.dumps(messages_to_dict(conversation["messages"])),
+                    conversation["created_at"].timestamp(),
+                    conversation["last_updated"].timestamp(),
+                ),
+            )
+
+    def delete(self, thread_id: str) -> None:
+        with self._connection() as conn:
+            conn.execute("DELETE FROM conversations WHERE thread_id = ?", (thread_id,))
+
+    def prune(self, cutoff: float) -> int:
+        with self._connection() as conn:
+            return conn.execute(
+                "DELETE FROM conversations WHERE last_updated < ?", (cutoff,)
+            ).rowcount
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+class LRUConversationStore(ConversationStore):
+    """
+    Bounded in-memory conversation tier with an optional persistent backend.
+
+    Holds at most ``max_size`` conversations, expires them ``ttl`` seconds
+    after their last update and writes through to ``backend``. A cached entry
+    is revalidated against the backend's ``last_updated`` so an update made
+    by another process is picked up on the next read.
+
+    ``on_evict(thread_id)`` is called whenever a conversation leaves the
+    in-memory tier, so per-thread state kept elsewhere in the process (e.g.
+    graph checkpoints) can be released with it.
+    """
+
+    def __init__(self, backend: Optional[ConversationStore] = None, max_size: int = 1000,
+                 ttl: float = 24 * 3600, prune_interval: float = 300, on_evict=None):
+        self.backend = backend
+        self.on_evict = on_evict
+        self.max_size = max_size
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_prune = time.time()
+
+    def _expired(self, conversation: dict, now: float) -> bool:
+        return conversation["last_updated"].timestamp() < now - self.ttl
+
+    def get(self, thread_id: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            conversation = self._entries.get(thread_id)
+            if conversation is not None:
+                self._entries.move_to_end(thread_id)
+
+        if conversation is not None and self.backend is not None:
+            stored_at = getattr(self.backend, "last_updated", lambda _: None)(thread_id)
+            if stored_at is not None and stored_at > conversation["last_updated"].timestamp():
+                conversation = None
+
+        if conversation is None and self.backend is not None:
+            conversation = self.backend.get(thread_id)
+            if conversation is not None:
+                self._remember(thread_id, conversation)
+
+        if conversation is not None and self._expired(conversation, now):
+            self.delete(thread_id)
+            return None
+        return conversation
+
+    def _evicted(self, thread_ids: list) -> None:
+        if self.on_evict is not None:
+            for thread_id in thread_ids:
+                self.on_evict(thread_id)
+
+    def _remember(self, thread_id: str, conversation: dict) -> None:
+        evicted = []
+        with self._lock:
+            self._entries[thread_id] = conversation
+            self._entries.move_to_end(thread_id)
+            while len(self._entries) > self.max_size:
+                evicted.append(self._entries.popitem(last=False)[0])
+        self._evicted(evicted)
+
+    def put(self, thread_id: str, conversation: dict) -> None:
+        self._remember(thread_id, conversation)
+        if self.backend is not None:
+            self.backend.put(thread_id, conversation)
+        self._maybe_prune()
+
+    def delete(self, thread_id: str) -> None:
+        with self._lock:
+            self._entries.pop(thread_id, None)
+        self._evicted([thread_id])
+        if self.backend is not None:
+            self.backend.delete(thread_id)
+
+    def _maybe_prune(self) -> None:
+        # Expiry runs opportunistically on writes, so it works under any server
+        now = time.time()
+        if now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            self.prune(now - self.ttl)
+
+    def prune(self, cutoff: float) -> int:
+        with self._lock:
+            stale = [
+                thread_id for thread_id, conversation in self._entries.items()
+                if conversation["last_updated"].timestamp() < cutoff
+            ]
+            for thread_id in stale:
+                del self._entries[thread_id]
+        self._evicted(stale)
+        if self.backend is not None:
+            return self.backend.prune(cutoff)
+        return len(stale)
+
+    def __len__(self) -> int:
+        if self.backend is not None:
+            return len(self.backend)
+        with self._lock:
+            return len(self._entries)
+
+
+class LatestCheckpointSaver(MemorySaver):
+    """
+    MemorySaver that keeps only the latest checkpoint of each thread.
+
+    Every checkpoint holds the full message list, so keeping all of them
+    grows quadratically with the length of a conversation. Turns only ever
+    resume from the latest one; older checkpoints, their pending writes and
+    channel values no longer referenced are dropped on every ``put``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prune_lock = threading.Lock()
+        # (thread_id, checkpoint_ns) -> keys of the blobs stored for it
+        self._blob_keys = {}
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        live = {(thread_id, checkpoint_ns, channel, version)
+                for channel, version in checkpoint["channel_versions"].items()}
+        with self._prune_lock:
+            keys = self._blob_keys.setdefault((thread_id, checkpoint_ns), set())
+            keys.update((thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items())
+            for key in keys - live:
+                self.blobs.pop(key, None)
+            keys &= live
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            for checkpoint_id in [c for c in checkpoints if c != checkpoint["id"]]:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        return saved
+
+    def delete_thread(self, thread_id: str) -> None:
+        # Only this thread's keys are touched; MemorySaver scans every write and blob
+        with self._prune_lock:
+            for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+                for checkpoint_id in checkpoints:
+                    self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                for key in self._blob_keys.pop((thread_id, checkpoint_ns), ()):
+                    self.blobs.pop(key, None)
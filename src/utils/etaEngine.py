@@ -0,0 +1,321 @@
+"""
+Lane-based delivery time estimates behind ``estimated_time_analysis``.
+
+Historical shipments are aggregated offline into per-lane transit-time
+histograms (lane = origin, destination, service; every lane also has an
+any-service ``*`` row). From those, a compact lookup table of
+``(deliveries, p50_hours, p90_hours)`` rows is written next to the raw
+histograms:
+
+- ``<table>``        header (lane keys) + float32 rows, memory-mapped by every
+                     worker process; a lookup is one dict probe and one
+                     ``struct.unpack_from``
+- ``<table>.hist``   uint32 bucket counts per lane, so new deliveries can be
+                     merged in (``refresh``) without re-reading history
+
+Readers notice a rewritten table (it is replaced atomically) within
+``SPARROW_ETA_RELOAD_INTERVAL`` seconds. Building and refreshing need NumPy;
+serving lookups does not.
+
+    python -m src.utils.etaEngine build lanes.eta shipments-2024.csv shipments-2025.csv
+    python -m src.utils.etaEngine refresh lanes.eta deliveries-today.csv
+
+Shipment files are CSV with ``origin,destination`` and either
+``transit_hours`` or ``picked_up_at,delivered_at`` (epoch or ISO 8601)
+columns; ``service`` is optional (default ``standard``).
+"""
+import argparse
+import csv
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from src.utils.trackingIngest import parse_event_time
+
+logger = logging.getLogger(__name__)
+
+ETA_TABLE = os.environ.get("SPARROW_ETA_TABLE", "")
+RELOAD_INTERVAL = float(os.environ.get("SPARROW_ETA_RELOAD_INTERVAL", "30"))
+
+# One-hour buckets up to 30 days; longer transits count in the last bucket
+BUCKET_HOURS = 1.0
+BUCKETS = 720
+DEFAULT_SERVICE = "standard"
+ANY_SERVICE = "*"
+
+MAGIC = b"SPARETA1"
+ROW = struct.Struct("<3f")  # deliveries, p50_hours, p90_hours
+
+
+class LaneEstimate(NamedTuple):
+    deliveries: int
+    p50_hours: float
+    p90_hours: float
+    service: str
+
+
+def _clean(value) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def lane_key(origin: str, destination: str, service: str = ANY_SERVICE) -> str:
+    return f"{_clean(origin)}|{_clean(destination)}|{_clean(service) or DEFAULT_SERVICE}"
+
+
+def format_hours(hours: float) -> str:
+    """``26.5`` -> ``"1 day 3 hours"``."""
+    hours = max(1, round(hours))
+    days, hours = divmod(hours, 24)
+    parts = []
+    if days:
+        parts.append(f"{days} day{'s' if days != 1 else ''}")
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
+    return " ".join(parts)
+
+
+# Reading
+
+class EtaTable:
+    """Memory-mapped lane table; a missing file is an empty table until it appears."""
+
+    def __init__(self, path: str, reload_interval: float = RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = 0.0
+        # (lane index, mapped file, rows offset), swapped as one on reload
+        self._state = ({}, None, 0)
+        self._load()
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> None:
+        signature = self._stat_signature()
+        self._signature = signature
+        self._checked = time.monotonic()
+        if signature is None:
+            self._state = ({}, None, 0)
+            return
+        with open(self.path, "rb") as f:
+            # The map keeps the old inode alive for in-flight readers after a refresh
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        keys, rows_offset = read_header(mapped)
+        self._state = ({key: i for i, key in enumerate(keys)}, mapped, rows_offset)
+        logger.info("Loaded ETA table %s with %d lanes", self.path, len(keys))
+
+    def _maybe_reload(self) -> None:
+        if time.monotonic() - self._checked < self.reload_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked < self.reload_interval:
+                return
+            self._checked = time.monotonic()
+            if self._stat_signature() != self._signature:
+                self._load()
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    def lookup(self, origin: str, destination: str, service: str = DEFAULT_SERVICE) -> Optional[LaneEstimate]:
+        """The lane's estimate for ``service``, else for any service; None without history."""
+        self._maybe_reload()
+        index, mapped, offset = self._state
+        for candidate in (service, ANY_SERVICE):
+            row = index.get(lane_key(origin, destination, candidate))
+            if row is not None:
+                deliveries, p50, p90 = ROW.unpack_from(mapped, offset + row * ROW.size)
+                return LaneEstimate(int(deliveries), p50, p90, candidate)
+        return None
+
+
+def read_header(buffer) -> Tuple[List[str], int]:
+    """Lane keys and the byte offset of the first row."""
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Not an ETA lane table")
+    (length,) = struct.unpack_from("<I", buffer, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[start:start + length]))
+    return header["lanes"], _aligned(start + length)
+
+
+def _aligned(offset: int) -> int:
+    return (offset + 3) & ~3
+
+
+def estimate_text(table: EtaTable, origin: str, destination: str, service: str = DEFAULT_SERVICE) -> str:
+    """The tool answer for one lane."""
+    estimate = table.lookup(origin, destination, service)
+    if estimate is None:
+        return f"No delivery history yet for parcels from {origin} to {destination}, so there is no data-backed estimate"
+    label = f"{service} service" if estimate.service != ANY_SERVICE else "all services"
+    return (
+        f"Estimated delivery time from {origin} to {destination} ({label}): about "
+        f"{format_hours(estimate.p50_hours)} (median), and within {format_hours(estimate.p90_hours)} "
+        f"for 90% of parcels, based on {estimate.deliveries:,} past "
+        f"{'delivery' if estimate.deliveries == 1 else 'deliveries'}"
+    )
+
+
+def load_eta_table(path: str = None) -> Optional[EtaTable]:
+    path = ETA_TABLE if path is None else path
+    if not path:
+        return None
+    if not NUMPY_AVAILABLE:
+        logger.warning("NumPy is not installed: %s is served, but cannot be built or refreshed here "
+                       "(pip install 'sparrow-agent[eta]')", path)
+    return EtaTable(path)
+
+
+eta_table = load_eta_table()
+
+
+# Building
+
+def _require_numpy() -> None:
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Building ETA tables needs NumPy (pip install numpy)")
+
+
+def read_shipments(path: str) -> Iterable[tuple]:
+    """``(origin, destination, service, transit_hours)`` per delivered shipment; bad rows are skipped."""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row_number, row in enumerate(csv.DictReader(f), start=1):
+            try:
+                if row.get("transit_hours"):
+                    hours = float(row["transit_hours"])
+                else:
+                    hours = (parse_event_time(row["delivered_at"]) - parse_event_time(row["picked_up_at"])) / 3600
+                if hours < 0:
+                    raise ValueError("delivered before pickup")
+                yield row["origin"], row["destination"], row.get("service") or DEFAULT_SERVICE, hours
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning("Skipping shipment %s row %d: %s", path, row_number, e)
+
+
+def aggregate(shipments: Iterable[tuple]) -> Tuple[List[str], "np.ndarray"]:
+    """Lane keys and their ``(lanes, BUCKETS)`` transit-time histograms."""
+    _require_numpy()
+    keys, hours = [], []
+    for origin, destination, service, transit_hours in shipments:
+        keys.append(lane_key(origin, destination, service))
+        keys.append(lane_key(origin, destination, ANY_SERVICE))
+        hours.append(transit_hours)
+        hours.append(transit_hours)
+    if not keys:
+        return [], np.zeros((0, BUCKETS), dtype=np.uint32)
+
+    lanes, lane_index = np.unique(np.array(keys), return_inverse=True)
+    buckets = np.clip((np.asarray(hours) / BUCKET_HOURS).astype(np.int64), 0, BUCKETS - 1)
+    counts = np.bincount(lane_index * BUCKETS + buckets, minlength=len(lanes) * BUCKETS)
+    return lanes.tolist(), counts.reshape(len(lanes), BUCKETS).astype(np.uint32)
+
+
+def merge(keys_a: List[str], counts_a, keys_b: List[str], counts_b) -> Tuple[List[str], "np.ndarray"]:
+    """Union of two lane histogram sets; counts of shared lanes add up."""
+    keys = sorted(set(keys_a) | set(keys_b))
+    position = {key: i for i, key in enumerate(keys)}
+    merged = np.zeros((len(keys), BUCKETS), dtype=np.uint32)
+    for lane_keys, counts in ((keys_a, counts_a), (keys_b, counts_b)):
+        if lane_keys:
+            merged[[position[key] for key in lane_keys]] += counts
+    return keys, merged
+
+
+def percentiles(counts, quantiles=(0.5, 0.9)) -> "np.ndarray":
+    """``(lanes, len(quantiles))`` transit hours at each quantile (bucket midpoints)."""
+    cumulative = counts.cumsum(axis=1, dtype=np.int64)
+    totals = cumulative[:, -1]
+    result = np.empty((len(counts), len(quantiles)), dtype=np.float32)
+    for column, quantile in enumerate(quantiles):
+        targets = np.maximum(1, np.ceil(quantile * totals))
+        bucket = (cumulative < targets[:, None]).sum(axis=1)
+        result[:, column] = (bucket + 0.5) * BUCKET_HOURS
+    return result
+
+
+def _replace(path: str, write) -> None:
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        write(f)
+    os.replace(temporary, path)
+
+
+def write_table(path: str, keys: List[str], counts) -> None:
+    """Write the histograms, then the lookup table readers map (both atomically)."""
+    _require_numpy()
+    _replace(f"{path}.hist", lambda f: counts.astype("<u4").tofile(f))
+
+    rows = np.empty((len(keys), 3), dtype="<f4")
+    rows[:, 0] = counts.sum(axis=1)
+    rows[:, 1:] = percentiles(counts)
+    header = json.dumps({"lanes": keys, "bucket_hours": BUCKET_HOURS, "buckets": BUCKETS}).encode()
+
+    def write(f):
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+        f.write(rows.tobytes())
+
+    _replace(path, write)
+
+
+def read_histograms(path: str) -> Tuple[List[str], "np.ndarray"]:
+    _require_numpy()
+    with open(path, "rb") as f:
+        keys, _ = read_header(f.read())
+    counts = np.fromfile(f"{path}.hist", dtype="<u4").reshape(len(keys), BUCKETS)
+    return keys, counts
+
+
+def build(path: str, shipments: Iterable[tuple]) -> int:
+    """Build a lane table from scratch; returns the number of lanes."""
+    keys, counts = aggregate(shipments)
+    write_table(path, keys, counts)
+    return len(keys)
+
+
+def refresh(path: str, shipments: Iterable[tuple]) -> int:
+    """Merge newly delivered shipments into an existing table; returns the number of lanes."""
+    if not os.path.exists(path):
+        return build(path, shipments)
+    keys, counts = merge(*read_histograms(path), *aggregate(shipments))
+    write_table(path, keys, counts)
+    return len(keys)
+
+
+def main() -> None:
+    from src.utils.logger import configure_logging
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=("build", "refresh"))
+    parser.add_argument("table", help="lane table to write (SPARROW_ETA_TABLE)")
+    parser.add_argument("files", nargs="+", help="shipment CSV files")
+    args = parser.parse_args()
+
+    configure_logging()
+    started = time.perf_counter()
+    shipments = (shipment for path in args.files for shipment in read_shipments(path))
+    lanes = (build if args.command == "build" else refresh)(args.table, shipments)
+    logger.info("%s %s: %d lanes in %.2fs", args.command.capitalize(), args.table, lanes,
+                time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Logging setup for the Sparrow Agent.
+
+- Per-module levels: ``SPARROW_LOG_LEVEL`` sets the default and
+  ``SPARROW_LOG_LEVELS="src.nodes.actionNode=DEBUG,src.graphs=WARNING"``
+  overrides individual loggers.
+- Non-blocking: records go through a ``QueueHandler``; the caller only
+  resolves the message (``msg % args``) and any traceback to text, and a
+  ``QueueListener`` thread lays out the line and writes it to stderr.
+- Correlation: every record carries the ``thread_id`` of the conversation
+  being served (see ``bind_thread_id``). The context variable follows the
+  run into worker and tool threads, which are started with a copied context.
+- ``SPARROW_LOG_FORMAT=json`` emits one JSON object per line; the default
+  is plain text.
+
+Call sites use ``%``-style arguments (``logger.debug("x=%s", x)``) so nothing
+is formatted unless the level is enabled.
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.environ.get("SPARROW_LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.environ.get("SPARROW_LOG_LEVELS", "")
+LOG_FORMAT = os.environ.get("SPARROW_LOG_FORMAT", "text")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(thread_id)s] %(message)s"
+
+thread_id_var = contextvars.ContextVar("sparrow_thread_id", default="-")
+
+_configure_lock = threading.Lock()
+_listener = None
+# Renders tracebacks on the calling thread (same output as both formatters)
+_tracebacks = logging.Formatter()
+
+
+def bind_thread_id(thread_id: str) -> contextvars.Token:
+    """Tag log records emitted in the current context with ``thread_id``."""
+    return thread_id_var.set(thread_id or "-")
+
+
+def parse_levels(spec: str) -> dict:
+    """Parse ``"logger=LEVEL,logger=LEVEL"`` into a mapping."""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class ThreadIdFilter(logging.Filter):
+    """Stamp the conversation thread id on the record at emit time."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "thread_id"):
+            record.thread_id = thread_id_var.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, including any ``extra=`` fields."""
+
+    _standard = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "thread_id"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread_id": getattr(record, "thread_id", "-"),
+            "msg": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in self._standard})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves the layout (text or JSON) to the listener thread.
+
+    As in the stdlib handler, the message and any traceback are rendered in
+    the calling thread: by the time the listener gets to the record the
+    arguments may have been mutated, and a live traceback would keep its
+    frames alive. The record also gets its context (thread id) attached.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if not hasattr(record, "thread_id"):
+            record.thread_id = thread_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _tracebacks.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = None, levels: str = None, fmt: str = None) -> None:
+    """Install the queue-backed root handler once per process; later calls only adjust levels."""
+    global _listener
+    with _configure_lock:
+        root = logging.getLogger()
+        root.setLevel(level or LOG_LEVEL)
+        for name, module_level in parse_levels(LOG_LEVELS if levels is None else levels).items():
+            logging.getLogger(name).setLevel(module_level)
+
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler()
+        output.addFilter(ThreadIdFilter())
+        output.setFormatter(JSONFormatter() if (fmt or LOG_FORMAT) == "json" else logging.Formatter(TEXT_FORMAT))
+
+        records = queue.SimpleQueue()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_QueueHandler(records))
+
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
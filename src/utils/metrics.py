@@ -0,0 +1,167 @@
+"""
+In-process metrics shared by the graph nodes and the HTTP servers.
+
+Series are keyed by name plus a sorted tuple of label pairs, so
+``metrics.increment("intent_router_requests_total", outcome="hit")`` and
+``outcome="miss"`` are tracked separately. Gauges (``add_gauge``) hold
+values that go up and down, such as queue depth. ``render_prometheus`` exports
+everything in the Prometheus text format for the ``/metrics`` routes.
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+# Latency buckets in seconds, from cache hits up to slow LLM/worker runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram for one label combination."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list:
+        total, out = 0, []
+        for count in self.counts:
+            total += count
+            out.append(total)
+        return out
+
+
+class MetricsRegistry:
+    """Thread-safe counter and histogram registry."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = defaultdict(float)
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        """Attach a ``# HELP`` line to a metric."""
+        self._help[name] = help_text
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def add_gauge(self, name: str, delta: float, **labels) -> None:
+        """Move a gauge up or down (e.g. +1 when a call starts waiting, -1 when it stops)."""
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] += delta
+
+    def gauge(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._gauges.get((name, _label_key(labels)), 0)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record one observation (e.g. a duration in seconds) in a histogram."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        """Current value of one counter series (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def total(self, name: str) -> float:
+        """Sum of a counter across every label combination."""
+        with self._lock:
+            return sum(v for (n, _), v in self._counters.items() if n == name)
+
+    def snapshot(self) -> dict:
+        """``{name: {"label=value,...": value}}`` for JSON endpoints; histograms report count/sum."""
+        with self._lock:
+            counters = list(self._counters.items()) + list(self._gauges.items())
+            histograms = [(key, h.count, h.sum) for key, h in self._histograms.items()]
+        snapshot = {}
+        for (name, labels), value in sorted(counters):
+            series = ",".join(f"{k}={v}" for k, v in labels)
+            snapshot.setdefault(name, {})[series] = value
+        for (name, labels), count, total in sorted(histograms):
+            series = ",".join(f"{k}={v}" for k, v in labels)
+            snapshot.setdefault(name, {})[series] = {"count": count, "sum": round(total, 6)}
+        return snapshot
+
+    def render_prometheus(self) -> str:
+        """Every series in the Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(
+                (key, h.buckets, h.cumulative(), h.count, h.sum)
+                for key, h in self._histograms.items()
+            )
+
+        lines, typed = [], set()
+
+        def header(name: str, kind: str) -> None:
+            if name in typed:
+                return
+            typed.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), value in gauges:
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), buckets, cumulative, count, total in histograms:
+            header(name, "histogram")
+            for bound, bucket_count in zip(buckets, cumulative):
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', _format_value(bound)),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+metrics = MetricsRegistry()
@@ -78,6 +78,35 @@ Guidelines:
 """
 
 
+combined_intake_prompt = """
+These are the messages that have been exchanged so far regarding the user's parcel request or tracking inquiry:
+<Messages>
+{messages}
+</Messages>
+
+Today's date is {date}.
+
+Do two things in one response.
+
+1. Decide whether you need to ask a clarifying question before the request can be processed.
+IMPORTANT: If you can see in the messages history that you have already asked a clarifying question, you almost always do not need to ask another one. Only ask another question if ABSOLUTELY NECESSARY.
+- Ask about unclear abbreviations, shipment codes or logistics terms, and about information that is required but missing (e.g. tracking number, user ID, origin/destination).
+- Be concise, use markdown bullet points if appropriate, and never ask for information the user has already provided.
+
+2. If no clarification is needed, write the query brief: a single, clear and actionable brief, in the first person from the user's perspective, that will guide parcel processing, tracking or consolidation.
+- Include every shipment detail the user provided (tracking numbers, dimensions, weight, destination, delivery preferences).
+- Note missing but relevant details as open considerations; never invent details, preferences or constraints.
+- Distinguish required actions from the user's stated preferences.
+
+Respond in valid JSON format with these exact keys:
+"need_clarification": "yes" or "no",
+"question": "<your clarifying question, or empty>",
+"verification": "<short acknowledgement summarising the request and confirming you will start processing it, or empty>",
+"query_brief": "<the query brief, or empty>"
+
+If you need to ask a clarifying question, return "need_clarification": "yes" with the question, and leave "verification" and "query_brief" empty.
+If you do not, return "need_clarification": "no" with the verification and query_brief, and leave "question" empty.
+"""
 
 ## Defining the prompts 
 compress_execution_system_prompt = """You are a Sparrow parcel operations assistant that has gathered logistics information by calling tools and web searches. Your job is to clean up the findings, preserving all relevant shipment, tracking, and user-related details. For context, today's date is {date}.
@@ -91,7 +120,7 @@ Only these fully comprehensive cleaned findings will be returned to the user, so
 
 <Tool Call Filtering>
 **IMPORTANT**: When processing the research messages, focus only on substantive shipment, tracking, and user-related content:
-- **Include**: Results from `track_package`, `get_user_information`, `estimated_time_analysis`, `generate_report`, and findings from carrier websites, courier portals, customs/government sites, and Sparrow docs.
+- **Include**: Results from `track_package`, `track_packages`, `get_user_information`, `estimated_time_analysis`, `generate_report`, and findings from carrier websites, courier portals, customs/government sites, and Sparrow docs.
 - **Exclude**: `think_tool` calls and responses — these are internal agent reflections for decision-making and should not be included in the final report.
 - **Focus on**: Actual information gathered from tools (e.g., parcel status, ETA, user history, generated reports) and official sources (e.g., transit times, delivery restrictions, service updates), not the agent's internal reasoning.
 </Tool Call Filtering>
@@ -103,7 +132,7 @@ Only these fully comprehensive cleaned findings will be returned to the user, so
 4. Add a "Sources" section at the end listing all sources (including tool outputs) with corresponding citations.
 5. Ensure every source and tool result used in gathering parcel/tracking/user information is preserved.
 6. Critical: Do not lose any source or tool output, even if it appears repetitive — future steps will handle merging/aggregation.
-7. For tool outputs, treat results from `track_package`, `get_user_information`, `estimated_time_analysis`, and `generate_report` as authoritative sources and cite them as "Sparrow Tool: [Tool Name]".
+7. For tool outputs, treat results from `track_package`, `track_packages`, `get_user_information`, `estimated_time_analysis`, and `generate_report` as authoritative sources and cite them as "Sparrow Tool: [Tool Name]".
 </Guidelines>
 
 <Output Format>
@@ -162,8 +191,9 @@ Your job is to gather and verify information needed to process, track, or consol
 <Available Tools>
 1. **think_tool(reflection: str)**: Summarize findings, note gaps, and plan next steps. Must always be called after any other tool call.
 2. **track_package(tracking_number: str)**: Tracks parcels using a tracking number.
-3. **get_user_information(user_id: str)**: Retrieves user details by ID.
-4. **estimated_time_analysis(origin: str, destination: str)**: Estimates delivery time based on origin and destination.
+3. **track_packages(tracking_numbers: list[str])**: Tracks many parcels in one call. Always use this instead of repeated `track_package` calls when the user gives more than one tracking number.
+4. **get_user_information(user_id: str)**: Retrieves user details by ID.
+5. **estimated_time_analysis(origin: str, destination: str, service: str = "standard")**: Estimates delivery time (median and 90th percentile) from historical deliveries on that lane.
 
 **CRITICAL RULES:**
 - Only call a tool if it is absolutely required to resolve the user’s request.
@@ -208,8 +238,9 @@ Analyze the logistics query and split it into the minimum number of necessary su
 <Available Tools>
 1. **think_tool(reflection: str)**: Summarize findings, note gaps, and plan next steps. Must always be called after any other tool call.
 2. **track_package(tracking_number: str)**: Tracks parcels using a tracking number.
-3. **get_user_information(user_id: str)**: Retrieves user details by ID.
-4. **estimated_time_analysis(origin: str, destination: str)**: Estimates delivery time based on origin and destination.
+3. **track_packages(tracking_numbers: list[str])**: Tracks many parcels in one call. Always use this instead of repeated `track_package` calls when the user gives more than one tracking number.
+4. **get_user_information(user_id: str)**: Retrieves user details by ID.
+5. **estimated_time_analysis(origin: str, destination: str, service: str = "standard")**: Estimates delivery time (median and 90th percentile) from historical deliveries on that lane.
 
 **CRITICAL**: Use think_tool before ExecuteLogisticsTask to plan subtasks and after each task to evaluate results. Assign up to {max_concurrent_logistics_units} parallel subtasks per iteration for efficiency.
 </Available Tools>
@@ -246,3 +277,16 @@ After ExecuteLogisticsTask:
 
 """
 
+
+summarize_conversation_prompt = """You are maintaining a running summary of a conversation between a customer and Sparrow's parcel assistant.
+
+<Current Summary>
+{summary}
+</Current Summary>
+
+<New Messages>
+{messages}
+</New Messages>
+
+Update the summary so it also covers the new messages. Keep every tracking number, user ID, origin, destination, date and open request the customer mentioned. Drop greetings and repetition. Return only the updated summary, in at most 150 words.
+"""
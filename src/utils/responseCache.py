@@ -0,0 +1,264 @@
+"""
+Response cache for the master pipeline, keyed on the normalised query brief.
+
+Exact hits are looked up in a local SQLite table; near-duplicate briefs can
+also hit through an in-process vector index. Entries expire after a TTL
+because tool results such as ``track_package`` go stale.
+
+Similarity lookups only compare briefs that mention exactly the same
+entities in the same order: every token that is not a stopword or a generic
+parcel word (tracking numbers, user IDs, place names, ...). So "where is
+ABC123" can never be answered with the entry for "where is ABC124", nor
+"Colombo to Kandy" with "Colombo to Galle" or "Kandy to Colombo"; the vector
+index only absorbs rephrasing around them.
+
+Answers personalised for one customer are stored under a ``scope`` (a hash
+of the profile they were written for); a lookup only sees entries of its
+own scope, exact or similar.
+"""
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+EMBEDDING_DIMENSIONS = 256
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry the phrasing of a brief rather than what it is about
+STOPWORDS = frozenset("""
+    a about all also am an and any are as ask asked asking at be been before being between by can
+    could customer customers did do does doing for from get give go going has have he her his how i
+    if in into is it its know let like long me much my need needs of on or our please s she should
+    show so some take takes tell than that the their them then there they this those to up us user
+    users want wanted wants was we were what when where which who why will with would you your
+    current currently deliver delivered delivery details detail estimate estimated estimation eta
+    find information info latest location look lookup package packages parcel parcels shipment
+    shipments status time track tracking transit
+""".split())
+
+
+def normalize_brief(brief: str) -> str:
+    """Lowercase the brief and reduce it to space-separated alphanumeric tokens."""
+    return " ".join(_TOKEN_RE.findall((brief or "").lower()))
+
+
+def entity_signature(normalized: str) -> str:
+    """Non-stopword tokens, in order (direction matters), a cached answer must match exactly."""
+    return " ".join(dict.fromkeys(token for token in normalized.split() if token not in STOPWORDS))
+
+
+def scope_for(profile: Optional[str]) -> str:
+    """Cache scope of answers written for ``profile``; empty (shared) without one."""
+    return hashlib.sha256(profile.encode()).hexdigest()[:16] if profile else ""
+
+
+def hashed_embedding(normalized: str, dimensions: int = EMBEDDING_DIMENSIONS) -> list:
+    """
+    Cheap local embedding: hashed word unigrams and bigrams, L2-normalised.
+
+    Good enough to match rephrasings of the same short brief without a
+    network call; pass a real embedding function to ResponseCache for more.
+    """
+    tokens = normalized.split()
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = [0.0] * dimensions
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class ResponseCache:
+    """
+    TTL response cache backed by SQLite with an optional similarity lookup.
+
+    ``similarity_threshold`` of 0 disables the vector index and only exact
+    (normalised) briefs hit.
+    """
+
+    def __init__(self, path: str, ttl: float = 300, similarity_threshold: float = 0.85,
+                 embed: Callable[[str], list] = hashed_embedding, max_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # signature -> {key: (vector, expires_at)}
+        self._index = {}
+        self._indexed = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+        with self._connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    brief TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    scope TEXT NOT NULL DEFAULT ''
+                )
+                """
+            )
+            # Caches created before personalised answers lack the scope column
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            if "scope" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN scope TEXT NOT NULL DEFAULT ''")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses (expires_at)")
+        self._load_index()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(normalized: str, scope: str = "") -> str:
+        return hashlib.sha256(f"{scope}\0{normalized}".encode() if scope else normalized.encode()).hexdigest()
+
+    @staticmethod
+    def _signature(normalized: str, scope: str) -> tuple:
+        return scope, entity_signature(normalized)
+
+    def _load_index(self) -> None:
+        if not self.similarity_threshold:
+            return
+        rows = self._connection().execute(
+            "SELECT key, brief, expires_at, scope FROM responses WHERE expires_at > ? "
+            "ORDER BY expires_at DESC LIMIT ?",
+            (time.time(), self.max_entries),
+        ).fetchall()
+        for key, brief, expires_at, scope in rows:
+            self._add_to_index(key, brief, expires_at, scope)
+
+    def _add_to_index(self, key: str, normalized: str, expires_at: float, scope: str = "") -> None:
+        vector = self.embed(normalized)
+        with self._lock:
+            bucket = self._index.setdefault(self._signature(normalized, scope), {})
+            if key not in bucket:
+                self._indexed += 1
+            bucket[key] = (vector, expires_at)
+            if self._indexed > self.max_entries:
+                self._evict_expired_locked(time.time(), force=True)
+
+    def _evict_expired_locked(self, now: float, force: bool = False) -> None:
+        for signature in list(self._index):
+            bucket = self._index[signature]
+            for key in [k for k, (_, expires_at) in bucket.items() if expires_at <= now]:
+                del bucket[key]
+                self._indexed -= 1
+            if not bucket:
+                del self._index[signature]
+        if force and self._indexed > self.max_entries:
+            # Still over the cap: drop the entries closest to expiry
+            entries = sorted(
+                (expires_at, signature, key)
+                for signature, bucket in self._index.items()
+                for key, (_, expires_at) in bucket.items()
+            )
+            for _, signature, key in entries[:self._indexed - self.max_entries]:
+                del self._index[signature][key]
+                self._indexed -= 1
+
+    def _fetch(self, key: str, now: float) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT response FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _similar_key(self, normalized: str, now: float, scope: str = "") -> Optional[str]:
+        with self._lock:
+            candidates = list(self._index.get(self._signature(normalized, scope), {}).items())
+        if not candidates:
+            return None
+        query = self.embed(normalized)
+        best_key, best_score = None, self.similarity_threshold
+        for key, (vector, expires_at) in candidates:
+            if expires_at <= now:
+                continue
+            score = sum(a * b for a, b in zip(query, vector))
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, brief: str, scope: str = "") -> Optional[str]:
+        """Return the cached response for ``brief`` within ``scope``, or None."""
+        normalized = normalize_brief(brief)
+        if not normalized:
+            return None
+        now = time.time()
+
+        response = self._fetch(self._key(normalized, scope), now)
+        if response is not None:
+            self.hits += 1
+            return response
+
+        if self.similarity_threshold:
+            key = self._similar_key(normalized, now, scope)
+            if key is not None:
+                response = self._fetch(key, now)
+                if response is not None:
+                    self.similar_hits += 1
+                    return response
+
+        self.misses += 1
+        return None
+
+    def put(self, brief: str, response: str, scope: str = "") -> None:
+        """Cache ``response`` for ``brief`` within ``scope`` for ``ttl`` seconds."""
+        normalized = normalize_brief(brief)
+        if not normalized or not response:
+            return
+        key = self._key(normalized, scope)
+        expires_at = time.time() + self.ttl
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO responses (key, brief, response, expires_at, scope) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    response = excluded.response,
+                    expires_at = excluded.expires_at
+                """,
+                (key, normalized, response, expires_at, scope),
+            )
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        if self.similarity_threshold:
+            self._add_to_index(key, normalized, expires_at, scope)
+
+    def invalidate(self, brief: Optional[str] = None, scope: str = "") -> None:
+        """Drop one brief's entry (within ``scope``), or the whole cache when ``brief`` is None."""
+        with self._connection() as conn:
+            if brief is None:
+                conn.execute("DELETE FROM responses")
+            else:
+                conn.execute("DELETE FROM responses WHERE key = ?", (self._key(normalize_brief(brief), scope),))
+        with self._lock:
+            if brief is None:
+                self._index.clear()
+                self._indexed = 0
+            else:
+                normalized = normalize_brief(brief)
+                bucket = self._index.get(self._signature(normalized, scope), {})
+                if bucket.pop(self._key(normalized, scope), None) is not None:
+                    self._indexed -= 1
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "indexed": self._indexed,
+        }
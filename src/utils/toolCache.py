@@ -0,0 +1,171 @@
+"""
+Process-wide, TTL-bounded memoisation of tool results.
+
+Keys are the tool name plus its canonicalised arguments. Concurrent calls
+with the same key (e.g. parallel workers tracking the same parcel) share a
+single in-flight backend request, whether they run on threads or on the
+event loop. Failures are never cached.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from src.utils.metrics import metrics
+
+# Default TTLs in seconds; tools not listed (e.g. think_tool) are not cached
+DEFAULT_TOOL_TTLS = {
+    "track_package": 60,
+    "track_packages": 60,
+    "get_user_information": 600,
+    "estimated_time_analysis": 3600,
+}
+
+
+def parse_ttls(spec: str) -> dict:
+    """Parse ``"tool=seconds,tool=seconds"`` into a TTL mapping."""
+    ttls = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, seconds = item.split("=", 1)
+            ttls[name.strip()] = float(seconds)
+    return ttls
+
+
+def canonical_args(args) -> str:
+    """Stable string form of tool arguments (sorted keys, trimmed strings)."""
+    def clean(value):
+        if isinstance(value, str):
+            return value.strip()
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [clean(v) for v in value]
+        return value
+    return json.dumps(clean(args), sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    """TTL + LRU cache of tool results with in-flight request deduplication."""
+
+    def __init__(self, ttls: dict = None, max_entries: int = 10000):
+        self.ttls = dict(DEFAULT_TOOL_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (result, stored_at)
+        self._inflight = {}  # key -> concurrent.futures.Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+
+    def _ttl(self, tool_name: str) -> float:
+        return self.ttls.get(tool_name, 0)
+
+    def _lookup(self, key: tuple, ttl: float):
+        """Return ("hit", result) | ("wait", future) | ("lead", future). Call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            result, stored_at = entry
+            if time.time() - stored_at < ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return "hit", result
+            del self._entries[key]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            return "wait", future
+
+        self.misses += 1
+        future = self._inflight[key] = Future()
+        return "lead", future
+
+    def _finish(self, key: tuple, future: Future, result=None, error: BaseException = None) -> None:
+        if error is not None and not isinstance(error, Exception):
+            # The leader was cancelled (e.g. its own timeout); waiters get an
+            # ordinary error instead of a cancellation that would abort them
+            error = RuntimeError(f"{key[0]} request was cancelled by the caller that started it")
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is None:
+                self._entries[key] = (result, time.time())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def call(self, tool_name: str, args, fn) -> tuple:
+        """
+        Return ``(result, cached)`` for ``fn()``, memoised under (tool_name, args).
+
+        ``cached`` is True when the result came from the cache or from
+        another caller's in-flight request.
+        """
+        ttl = self._ttl(tool_name)
+        if ttl <= 0:
+            metrics.increment("tool_calls_total", tool=tool_name, cached="false")
+            return fn(), False
+
+        key = (tool_name, canonical_args(args))
+        with self._lock:
+            state, value = self._lookup(key, ttl)
+        metrics.increment("tool_calls_total", tool=tool_name, cached=str(state != "lead").lower())
+        if state == "hit":
+            return value, True
+        if state == "wait":
+            return value.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, value, error=e)
+            raise
+        self._finish(key, value, result=result)
+        return result, False
+
+    async def acall(self, tool_name: str, args, coro_fn) -> tuple:
+        """Async version of call; ``coro_fn()`` returns an awaitable."""
+        ttl = self._ttl(tool_name)
+        if ttl <= 0:
+            metrics.increment("tool_calls_total", tool=tool_name, cached="false")
+            return await coro_fn(), False
+
+        key = (tool_name, canonical_args(args))
+        with self._lock:
+            state, value = self._lookup(key, ttl)
+        metrics.increment("tool_calls_total", tool=tool_name, cached=str(state != "lead").lower())
+        if state == "hit":
+            return value, True
+        if state == "wait":
+            # Shielded: a waiter timing out must not cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(value)), True
+
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            self._finish(key, value, error=e)
+            raise
+        self._finish(key, value, result=result)
+        return result, False
+
+    def invalidate(self, tool_name: str = None) -> None:
+        """Drop cached results for one tool, or for every tool."""
+        with self._lock:
+            for key in [k for k in self._entries if tool_name is None or k[0] == tool_name]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
@@ -0,0 +1,177 @@
+"""
+Per-node latency and token accounting for the Sparrow graphs.
+
+``MetricsCallbackHandler`` is a LangChain callback handler passed in the run
+config (see ``src.utils.conversation.graph_config``). Callbacks follow the
+run into the master subgraph, the worker graphs and the tool pool, so every
+graph node, LLM call and tool call is timed without touching the nodes.
+Results go to the shared metrics registry (``/metrics``) and, when
+``SPARROW_SPAN_LOG`` names a file, one JSON line per span for offline
+analysis.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.utils.metrics import metrics
+
+SPAN_LOG = os.environ.get("SPARROW_SPAN_LOG", "")
+
+metrics.describe("node_duration_seconds", "Wall time of one graph node run")
+metrics.describe("node_errors_total", "Graph node runs that raised")
+metrics.describe("llm_duration_seconds", "Wall time of one LLM call")
+metrics.describe("llm_tokens_total", "LLM tokens by graph node and kind (prompt/completion)")
+metrics.describe("tool_duration_seconds", "Wall time of one tool invocation (cache misses only)")
+metrics.describe("tool_calls_total", "Tool calls by tool and whether the result came from the cache")
+metrics.describe("queue_wait_seconds", "Time a worker or tool call waited for a free slot")
+metrics.describe("llm_http_responses_total", "HTTP responses from the LLM API by status (429/5xx are retried)")
+
+
+class SpanLog:
+    """Append-only JSONL span log; a no-op when ``path`` is empty."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1, encoding="utf-8") if path else None
+
+    def write(self, span: dict) -> None:
+        if self._file is None:
+            return
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+span_log = SpanLog(SPAN_LOG)
+
+
+def _is_node_run(tags: Optional[list], metadata: Optional[dict], name: Optional[str]) -> bool:
+    # LangGraph tags the run of each node task with "graph:step:<n>"
+    return bool(metadata) and metadata.get("langgraph_node") == name and any(
+        tag.startswith("graph:step:") for tag in tags or ()
+    )
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Records node, LLM and tool spans into the metrics registry and span log."""
+
+    # Cheap and thread-safe, so async runs don't need a thread hop to call it
+    run_inline = True
+
+    def __init__(self, thread_id: str = "", registry=metrics, log: SpanLog = span_log):
+        self.thread_id = thread_id
+        self.metrics = registry
+        self.span_log = log
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, kind: str, name: str, metadata: Optional[dict],
+               parent_run_id: Optional[UUID]) -> None:
+        with self._lock:
+            self._spans[run_id] = {
+                "kind": kind,
+                "name": name,
+                "node": (metadata or {}).get("langgraph_node", ""),
+                "started": time.time(),
+                "start": time.perf_counter(),
+                "parent_run_id": parent_run_id,
+            }
+
+    def _finish(self, run_id: UUID, error: BaseException = None, **fields) -> Optional[dict]:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is None:
+            return None
+        span["duration"] = time.perf_counter() - span.pop("start")
+        span.update(fields)
+        if error is not None:
+            span["error"] = repr(error)
+        self.span_log.write({**span, "run_id": run_id, "thread_id": self.thread_id})
+        return span
+
+    # Graph nodes
+
+    def on_chain_start(self, serialized: dict, inputs: Any, *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, tags: Optional[list] = None,
+                       metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name")
+        if _is_node_run(tags, metadata, name):
+            self._start(run_id, "node", name, metadata, parent_run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._finish(run_id)
+        if span is not None:
+            self.metrics.observe("node_duration_seconds", span["duration"], node=span["name"])
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._finish(run_id, error)
+        if span is not None:
+            self.metrics.observe("node_duration_seconds", span["duration"], node=span["name"])
+            self.metrics.increment("node_errors_total", node=span["name"])
+
+    # LLM calls
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, metadata: Optional[dict] = None,
+                            **kwargs: Any) -> None:
+        model = (metadata or {}).get("ls_model_name") or kwargs.get("name") or "llm"
+        self._start(run_id, "llm", model, metadata, parent_run_id)
+
+    def on_llm_start(self, serialized: dict, prompts: list, *, run_id: UUID,
+                     parent_run_id: Optional[UUID] = None, metadata: Optional[dict] = None,
+                     **kwargs: Any) -> None:
+        model = (metadata or {}).get("ls_model_name") or kwargs.get("name") or "llm"
+        self._start(run_id, "llm", model, metadata, parent_run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        span = self._finish(run_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        if span is None:
+            return
+        self.metrics.observe("llm_duration_seconds", span["duration"], node=span["node"], model=span["name"])
+        self.metrics.increment("llm_tokens_total", prompt_tokens, node=span["node"], kind="prompt")
+        self.metrics.increment("llm_tokens_total", completion_tokens, node=span["node"], kind="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._finish(run_id, error)
+        if span is not None:
+            self.metrics.observe("llm_duration_seconds", span["duration"], node=span["node"], model=span["name"])
+            self.metrics.increment("llm_errors_total", node=span["node"], model=span["name"])
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.metrics.increment("llm_retries_total")
+
+    # Tool calls
+
+    def on_tool_start(self, serialized: dict, input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, metadata: Optional[dict] = None,
+                      **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, "tool", name, metadata, parent_run_id)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._finish(run_id)
+        if span is not None:
+            self.metrics.observe("tool_duration_seconds", span["duration"], tool=span["name"])
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._finish(run_id, error)
+        if span is not None:
+            self.metrics.observe("tool_duration_seconds", span["duration"], tool=span["name"])
+            self.metrics.increment("tool_errors_total", tool=span["name"])
+
+
+def record_queue_wait(pool: str, waited: float) -> None:
+    """Record how long a job waited for a worker/tool slot."""
+    metrics.observe("queue_wait_seconds", waited, pool=pool)
@@ -0,0 +1,210 @@
+"""
+Tracking-status lookups behind ``track_package`` and ``track_packages``.
+
+Backends resolve a whole batch of tracking numbers in one indexed lookup.
+``SPARROW_TRACKING_BACKEND`` selects one:
+
+- unset / ``memory``      built-in demo data
+- ``csv:<path>``          CSV with ``tracking_number,status`` columns, indexed in memory
+- ``sqlite:<path>``       table ``parcels(tracking_number PRIMARY KEY, status)``,
+                          kept current from carrier scan events (see
+                          ``src.utils.trackingIngest``)
+"""
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List
+
+NOT_FOUND = "Tracking ID not found."
+
+# Batch size cap so one tool call can't turn into an unbounded query
+MAX_BATCH = int(os.environ.get("SPARROW_TRACKING_MAX_BATCH", "200"))
+
+DEMO_PARCELS = {
+    "ABC123": "Parcel is in transit, expected delivery tomorrow.",
+    "XYZ999": "Parcel delivered at 2 PM today.",
+}
+
+
+def normalize_tracking_number(tracking_number: str) -> str:
+    return str(tracking_number).strip().upper()
+
+
+def unique_tracking_numbers(tracking_numbers: Iterable[str]) -> List[str]:
+    """Normalised, de-duplicated tracking numbers in first-seen order."""
+    seen = {}
+    for tracking_number in tracking_numbers:
+        normalized = normalize_tracking_number(tracking_number)
+        if normalized:
+            seen.setdefault(normalized, None)
+    return list(seen)
+
+
+class TrackingBackend:
+    """Interface every tracking backend implements."""
+
+    def lookup_many(self, tracking_numbers: List[str]) -> Dict[str, str]:
+        """Return ``{tracking_number: status}`` for the numbers that exist."""
+        raise NotImplementedError
+
+    def lookup(self, tracking_number: str) -> str:
+        normalized = normalize_tracking_number(tracking_number)
+        return self.lookup_many([normalized]).get(normalized, NOT_FOUND)
+
+
+class MemoryTrackingBackend(TrackingBackend):
+    """Dict-backed lookups; also the index behind the CSV backend."""
+
+    def __init__(self, parcels: Dict[str, str]):
+        self.parcels = {normalize_tracking_number(k): v for k, v in parcels.items()}
+
+    def lookup_many(self, tracking_numbers: List[str]) -> Dict[str, str]:
+        return {n: self.parcels[n] for n in tracking_numbers if n in self.parcels}
+
+
+class CSVTrackingBackend(MemoryTrackingBackend):
+    """Loads a ``tracking_number,status`` CSV once and serves it from memory."""
+
+    def __init__(self, path: str):
+        with open(path, newline="", encoding="utf-8") as f:
+            super().__init__({row["tracking_number"]: row["status"] for row in csv.DictReader(f)})
+
+
+class SQLiteTrackingBackend(TrackingBackend):
+    """
+    Resolves a batch with one ``IN (...)`` query on the primary key.
+
+    ``parcels`` holds the current status line per parcel, so a lookup is a
+    single index probe. Scan events land in ``tracking_events``; the unique
+    index makes re-ingesting a file a no-op and serves per-parcel history in
+    time order.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parcels ("
+                "tracking_number TEXT PRIMARY KEY, status TEXT NOT NULL, updated_at REAL"
+                ") WITHOUT ROWID"
+            )
+            # Stores created before event ingestion lack updated_at
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(parcels)")}
+            if "updated_at" not in columns:
+                conn.execute("ALTER TABLE parcels ADD COLUMN updated_at REAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tracking_events ("
+                "tracking_number TEXT NOT NULL, event_time REAL NOT NULL, status TEXT NOT NULL, "
+                "location TEXT NOT NULL DEFAULT '', carrier TEXT NOT NULL DEFAULT '')"
+            )
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS tracking_events_parcel_time "
+                "ON tracking_events (tracking_number, event_time, status)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: commits don't fsync; a crash can only lose the last batches
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup_many(self, tracking_numbers: List[str]) -> Dict[str, str]:
+        if not tracking_numbers:
+            return {}
+        placeholders = ",".join("?" * len(tracking_numbers))
+        rows = self._connection().execute(
+            f"SELECT tracking_number, status FROM parcels WHERE tracking_number IN ({placeholders})",
+            tracking_numbers,
+        ).fetchall()
+        return dict(rows)
+
+    def ingest_events(self, events: List[tuple]) -> int:
+        """
+        Store one batch of ``(tracking_number, event_time, status, location,
+        carrier)`` scan events in a single transaction and move each parcel's
+        status to its newest event. Events older than what a parcel already
+        shows leave it alone. Returns the number of new events.
+        """
+        latest = {}
+        for event in events:
+            current = latest.get(event[0])
+            if current is None or event[1] >= current[1]:
+                latest[event[0]] = event
+
+        conn = self._connection()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tracking_events "
+                "(tracking_number, event_time, status, location, carrier) VALUES (?, ?, ?, ?, ?)",
+                events,
+            )
+            inserted = conn.total_changes - before
+            conn.executemany(
+                "INSERT INTO parcels (tracking_number, status, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (tracking_number) DO UPDATE SET "
+                "status = excluded.status, updated_at = excluded.updated_at "
+                "WHERE parcels.updated_at IS NULL OR excluded.updated_at >= parcels.updated_at",
+                [(number, status_line(event), event[1]) for number, event in latest.items()],
+            )
+        return inserted
+
+    def history(self, tracking_number: str, limit: int = 20) -> List[tuple]:
+        """Newest-first ``(event_time, status, location, carrier)`` rows for one parcel."""
+        return self._connection().execute(
+            "SELECT event_time, status, location, carrier FROM tracking_events "
+            "WHERE tracking_number = ? ORDER BY event_time DESC LIMIT ?",
+            (normalize_tracking_number(tracking_number), limit),
+        ).fetchall()
+
+
+def status_line(event: tuple) -> str:
+    """The status text a lookup returns for a parcel whose newest event is ``event``."""
+    _, event_time, status, location, carrier = event
+    when = datetime.fromtimestamp(event_time, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    where = f" at {location}" if location else ""
+    by = f" ({carrier})" if carrier else ""
+    return f"{status}{where}, {when}{by}"
+
+
+def build_tracking_backend(spec: str = None) -> TrackingBackend:
+    spec = os.environ.get("SPARROW_TRACKING_BACKEND", "") if spec is None else spec
+    kind, _, path = spec.partition(":")
+    if kind == "csv":
+        return CSVTrackingBackend(path)
+    if kind == "sqlite":
+        return SQLiteTrackingBackend(path)
+    return MemoryTrackingBackend(DEMO_PARCELS)
+
+
+tracking_backend = build_tracking_backend()
+
+
+def tracking_table(tracking_numbers: Iterable[str], backend: TrackingBackend = None) -> str:
+    """
+    Resolve many tracking numbers in one lookup and render a compact table.
+
+    One ``tracking_number | status`` row per unique number, in request order,
+    followed by a found/not-found count the model can quote directly.
+    """
+    backend = backend or tracking_backend
+    numbers = unique_tracking_numbers(tracking_numbers)
+    if not numbers:
+        return "No tracking numbers provided."
+    skipped = numbers[MAX_BATCH:]
+    numbers = numbers[:MAX_BATCH]
+
+    statuses = backend.lookup_many(numbers)
+    rows = ["tracking_number | status"]
+    rows += [f"{n} | {statuses.get(n, NOT_FOUND)}" for n in numbers]
+    rows.append(f"{len(statuses)} found, {len(numbers) - len(statuses)} not found")
+    if skipped:
+        rows.append(f"{len(skipped)} more not looked up (limit {MAX_BATCH} per call)")
+    return "\n".join(rows)
@@ -0,0 +1,127 @@
+"""
+Bulk ingestion of carrier scan events into the SQLite tracking store.
+
+Carrier files are streamed row by row and written in batches of
+``SPARROW_TRACKING_INGEST_BATCH`` events, one transaction per batch, so
+memory stays flat however large the file is. Supported formats:
+
+- ``.csv``    header with ``tracking_number,event_time,status`` and optional
+              ``location,carrier`` columns
+- ``.jsonl``  one object per line with the same keys
+
+``event_time`` is epoch seconds or an ISO 8601 timestamp (UTC when no
+offset is given). Re-ingesting a file is safe: duplicate events are ignored.
+
+    python -m src.utils.trackingIngest tracking.db events-2025-08-26.csv more-events.jsonl
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List
+
+from src.utils.trackingBackend import SQLiteTrackingBackend, normalize_tracking_number
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH = int(os.environ.get("SPARROW_TRACKING_INGEST_BATCH", "5000"))
+
+
+def parse_event_time(value) -> float:
+    """Epoch seconds from an epoch number or ISO 8601 string."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def to_event(row: dict) -> tuple:
+    """``(tracking_number, event_time, status, location, carrier)`` from one file row."""
+    return (
+        normalize_tracking_number(row["tracking_number"]),
+        parse_event_time(row["event_time"]),
+        str(row["status"]).strip(),
+        str(row.get("location") or "").strip(),
+        str(row.get("carrier") or "").strip(),
+    )
+
+
+def read_events(path: str) -> Iterator[tuple]:
+    """Stream the events of one carrier file; malformed rows are logged and skipped."""
+    with open(path, newline="", encoding="utf-8") as f:
+        jsonl = path.endswith(".jsonl")
+        rows = (line for line in f if line.strip()) if jsonl else csv.DictReader(f)
+        for row_number, row in enumerate(rows, start=1):
+            try:
+                yield to_event(json.loads(row) if jsonl else row)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning("Skipping malformed event %s row %d: %s", path, row_number, e)
+
+
+def batches(events: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    batch = []
+    for event in events:
+        batch.append(event)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest(backend: SQLiteTrackingBackend, events: Iterable[tuple], batch_size: int = INGEST_BATCH) -> dict:
+    """Write ``events`` in batches; returns read/inserted counts and throughput."""
+    started = time.perf_counter()
+    read = inserted = 0
+    for batch in batches(events, batch_size):
+        read += len(batch)
+        inserted += backend.ingest_events(batch)
+    elapsed = time.perf_counter() - started
+    return {
+        "events": read,
+        "inserted": inserted,
+        "duplicates": read - inserted,
+        "seconds": elapsed,
+        "events_per_s": read / elapsed if elapsed else 0.0,
+    }
+
+
+def ingest_files(backend: SQLiteTrackingBackend, paths: List[str], batch_size: int = INGEST_BATCH) -> dict:
+    totals = {}
+    for path in paths:
+        result = ingest(backend, read_events(path), batch_size)
+        logger.info("Ingested %s: %d events (%d new) at %.0f events/s",
+                    path, result["events"], result["inserted"], result["events_per_s"])
+        for key in ("events", "inserted", "duplicates", "seconds"):
+            totals[key] = totals.get(key, 0) + result[key]
+    totals["events_per_s"] = totals["events"] / totals["seconds"] if totals.get("seconds") else 0.0
+    return totals
+
+
+def main() -> None:
+    from src.utils.logger import configure_logging
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("database", help="SQLite tracking store (SPARROW_TRACKING_BACKEND=sqlite:<path>)")
+    parser.add_argument("files", nargs="+", help="carrier event files (.csv or .jsonl)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH)
+    args = parser.parse_args()
+
+    configure_logging()
+    totals = ingest_files(SQLiteTrackingBackend(args.database), args.files, args.batch_size)
+    logger.info("Done: %d events, %d new, %d duplicates, %.0f events/s",
+                totals["events"], totals["inserted"], totals["duplicates"], totals["events_per_s"])
+
+
+if __name__ == "__main__":
+    main()
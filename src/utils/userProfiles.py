@@ -0,0 +1,207 @@
+"""
+User profiles behind ``get_user_information`` and the executor prompt.
+
+``ProfileService`` puts a per-process LRU with TTL in front of a backend and
+resolves a batch of user IDs with one backend request for the misses.
+``SPARROW_USER_PROFILE_BACKEND`` selects the backend:
+
+- unset / ``demo``        built-in demo profile for any ID
+- ``sqlite:<path>``       table ``users(user_id PRIMARY KEY, name, parcels_sent, details)``;
+                          one connection per thread
+- ``http(s)://...``       profile API answering ``GET <url>/users?ids=a,b`` with a JSON
+                          list of profiles; one keep-alive connection pool per process
+
+The servers pre-load the profile of the signed-in user once per session and
+pass its summary to the executors through the run config (see
+``src.utils.conversation.graph_config``), so workers know who they are
+serving without a tool round-trip.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from src.utils.metrics import metrics
+
+PROFILE_TTL = float(os.environ.get("SPARROW_USER_PROFILE_TTL", "300"))
+PROFILE_CACHE_SIZE = int(os.environ.get("SPARROW_USER_PROFILE_CACHE_SIZE", "10000"))
+# Unknown IDs are remembered briefly so a retrying model can't hammer the backend
+MISSING_TTL = 60
+HTTP_POOL_SIZE = int(os.environ.get("SPARROW_USER_PROFILE_POOL_SIZE", "10"))
+HTTP_TIMEOUT = 5.0
+
+metrics.describe("user_profile_lookups_total", "User profile lookups by outcome (hit/miss/missing)")
+
+
+def normalize_user_id(user_id: str) -> str:
+    return str(user_id).strip()
+
+
+def profile_text(profile: dict) -> str:
+    """One-line summary used as the tool answer and in the executor prompt."""
+    text = f"This user id {profile['user_id']} belongs to {profile['name']}."
+    if profile.get("parcels_sent") is not None:
+        text += f" They have sent {profile['parcels_sent']} parcels so far."
+    details = profile.get("details") or {}
+    if details:
+        text += " " + ", ".join(f"{key}: {value}" for key, value in details.items()) + "."
+    return text
+
+
+class UserProfileBackend:
+    """Interface every profile backend implements."""
+
+    def fetch_many(self, user_ids: List[str]) -> Dict[str, dict]:
+        """Return ``{user_id: profile}`` for the IDs that exist."""
+        raise NotImplementedError
+
+
+class DemoProfileBackend(UserProfileBackend):
+    """Answers every ID with the demo profile the tool always returned."""
+
+    def fetch_many(self, user_ids: List[str]) -> Dict[str, dict]:
+        return {user_id: {"user_id": user_id, "name": "Nivakaran", "parcels_sent": 200} for user_id in user_ids}
+
+
+class SQLiteProfileBackend(UserProfileBackend):
+    """Resolves a batch with one ``IN (...)`` query on the primary key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "user_id TEXT PRIMARY KEY, name TEXT NOT NULL, parcels_sent INTEGER, details TEXT"
+                ") WITHOUT ROWID"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def fetch_many(self, user_ids: List[str]) -> Dict[str, dict]:
+        if not user_ids:
+            return {}
+        placeholders = ",".join("?" * len(user_ids))
+        rows = self._connection().execute(
+            f"SELECT user_id, name, parcels_sent, details FROM users WHERE user_id IN ({placeholders})",
+            user_ids,
+        ).fetchall()
+        return {
+            user_id: {"user_id": user_id, "name": name, "parcels_sent": parcels_sent,
+                      "details": json.loads(details) if details else {}}
+            for user_id, name, parcels_sent, details in rows
+        }
+
+
+class HTTPProfileBackend(UserProfileBackend):
+    """Profile API client sharing one keep-alive connection pool across threads."""
+
+    def __init__(self, base_url: str, pool_size: int = HTTP_POOL_SIZE, timeout: float = HTTP_TIMEOUT):
+        self.client = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    def fetch_many(self, user_ids: List[str]) -> Dict[str, dict]:
+        if not user_ids:
+            return {}
+        response = self.client.get("/users", params={"ids": ",".join(user_ids)})
+        response.raise_for_status()
+        return {profile["user_id"]: profile for profile in response.json()}
+
+
+class ProfileService:
+    """LRU + TTL cache of profiles in front of a backend; batch misses go out in one call."""
+
+    def __init__(self, backend: UserProfileBackend, ttl: float = PROFILE_TTL,
+                 max_entries: int = PROFILE_CACHE_SIZE, missing_ttl: float = MISSING_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (profile or None, expires_at)
+        self._lock = threading.Lock()
+
+    def _cached(self, user_id: str, now: float):
+        """(True, profile-or-None) on a fresh entry, (False, None) otherwise. Call with the lock held."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return False, None
+        profile, expires_at = entry
+        if expires_at <= now:
+            del self._entries[user_id]
+            return False, None
+        self._entries.move_to_end(user_id)
+        return True, profile
+
+    def _store(self, user_id: str, profile: Optional[dict], now: float) -> None:
+        self._entries[user_id] = (profile, now + (self.ttl if profile is not None else self.missing_ttl))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_many(self, user_ids: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """``{user_id: profile or None}`` for every requested ID, in request order."""
+        ids = list(dict.fromkeys(normalize_user_id(u) for u in user_ids if str(u).strip()))
+        now = time.time()
+        found, missing = {}, []
+        with self._lock:
+            for user_id in ids:
+                hit, profile = self._cached(user_id, now)
+                if hit:
+                    found[user_id] = profile
+                else:
+                    missing.append(user_id)
+        metrics.increment("user_profile_lookups_total", len(found), outcome="hit")
+
+        if missing:
+            fetched = self.backend.fetch_many(missing)
+            metrics.increment("user_profile_lookups_total", len(fetched), outcome="miss")
+            metrics.increment("user_profile_lookups_total", len(missing) - len(fetched), outcome="missing")
+            with self._lock:
+                for user_id in missing:
+                    self._store(user_id, fetched.get(user_id), now)
+                    found[user_id] = fetched.get(user_id)
+        return {user_id: found[user_id] for user_id in ids}
+
+    def get(self, user_id: str) -> Optional[dict]:
+        return self.get_many([user_id]).get(normalize_user_id(user_id))
+
+    def summary(self, user_id: Optional[str]) -> str:
+        """Profile summary for prompts; empty when there is no user or no profile."""
+        if not user_id:
+            return ""
+        profile = self.get(user_id)
+        return profile_text(profile) if profile else ""
+
+    def invalidate(self, user_id: str = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(normalize_user_id(user_id), None)
+
+
+def build_profile_backend(spec: str = None) -> UserProfileBackend:
+    spec = os.environ.get("SPARROW_USER_PROFILE_BACKEND", "") if spec is None else spec
+    if spec.startswith(("http://", "https://")):
+        return HTTPProfileBackend(spec)
+    kind, _, path = spec.partition(":")
+    if kind == "sqlite":
+        return SQLiteProfileBackend(path)
+    return DemoProfileBackend()
+
+
+user_profiles = ProfileService(build_profile_backend())
@@ -1,3 +1,4 @@
+import logging
 from pathlib import Path 
 from datetime import datetime
 from typing_extensions import Annotated, List, Literal
@@ -5,14 +6,16 @@ from typing_extensions import Annotated, List, Literal
 from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool, InjectedToolArg
 
-from src.llms.groqllm import GroqLLM
+from src.utils.etaEngine import eta_table, estimate_text
+from src.utils.trackingBackend import tracking_backend, tracking_table
+from src.utils.userProfiles import user_profiles, profile_text
+
+logger = logging.getLogger(__name__)
 
 def get_today_str() -> str:
     """Get current data in a human-readable format."""
     return datetime.now().strftime("%a %b %d, %Y")
 
-groq = GroqLLM()
-
 @tool 
 def think_tool(reflection:str) -> str:
     """
@@ -57,11 +60,23 @@ def track_package(tracking_number: str):
       A string describing information on the parcel status
     """
 
-    dummy_db = {
-        "ABC123": "Parcel is in transit, expected delivery tomorrow.",
-        "XYZ999": "Parcel delivered at 2 PM today.",
-    }
-    return dummy_db.get(tracking_number, "Tracking ID not found.")
+    return tracking_backend.lookup(tracking_number)
+
+@tool(description="Track many parcels at once from a list of tracking numbers")
+def track_packages(tracking_numbers: List[str]) -> str:
+    """
+    Tool for tracking several customer packages/parcels in one call.
+
+    Use this tool instead of repeated track_package calls whenever the user
+    provides more than one tracking number.
+
+    Args:
+      tracking_numbers(List[str]): all tracking numbers provided by the user
+
+    Returns:
+      A compact "tracking_number | status" table with one row per parcel
+    """
+    return tracking_table(tracking_numbers)
 
 @tool(description="Retrieve user information based on their user ID.")
 def get_user_information(userId: str) -> str:
@@ -75,24 +90,31 @@ def get_user_information(userId: str) -> str:
         A string containing user details, including their name and parcel delivery history.
     """
 
-    print("get user information tool called")
-    return f"This user id {userId} belongs to Nivakaran. He has sent 200 parcels so far."
+    logger.debug("get_user_information tool called")
+    profile = user_profiles.get(userId)
+    if profile is None:
+        return f"No user found with user id {userId}."
+    return profile_text(profile)
 
 
 @tool(description="Estimate delivery time for a parcel based on origin and destination.")
-def estimated_time_analysis(destination: str, origin: str) -> str:
+def estimated_time_analysis(destination: str, origin: str, service: str = "standard") -> str:
     """
     Estimate delivery time for a parcel based on origin and destination.
 
     Args:
         destination: The destination of the parcel.
         origin: The place from where the parcel delivery begins.
+        service: The delivery service level, e.g. "standard" or "express".
 
     Returns:
-        A string describing the estimated time of delivery.
+        A string describing the median and 90th percentile delivery time on that lane.
     """
-    print("estimate time analysis tool called")
-    return f"Estimated time analysis for the parcel delivery from {origin} to {destination} is 2 days 50 minutes"
+    logger.debug("estimated_time_analysis tool called")
+    if eta_table is None:
+        # No lane table configured (SPARROW_ETA_TABLE): demo answer
+        return f"Estimated time analysis for the parcel delivery from {origin} to {destination} is 2 days 50 minutes"
+    return estimate_text(eta_table, origin, destination, service)
 
 @tool
 def conduct_execution(execution_jobs: str) -> str:
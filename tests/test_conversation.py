@@ -0,0 +1,27 @@
+import pytest
+
+from src.utils import conversation
+from src.utils.conversation import session_user_id
+
+
+@pytest.fixture(autouse=True)
+def auth_token(monkeypatch):
+    monkeypatch.setattr(conversation, "AUTH_TOKEN", "s3cret")
+
+
+def test_user_id_from_an_authenticated_caller_is_kept_in_the_session():
+    session = {}
+    assert session_user_id(session, {"user_id": "U1"}, "Bearer s3cret") == "U1"
+    assert session_user_id(session, {}, None) == "U1"
+
+
+@pytest.mark.parametrize("authorization", [None, "", "Bearer wrong", "Basic s3cret"])
+def test_user_id_from_anyone_else_is_ignored(authorization):
+    session = {"user_id": "U1"}
+    assert session_user_id(session, {"user_id": "U2"}, authorization) == "U1"
+    assert session_user_id({}, {"user_id": "U2"}, authorization) is None
+
+
+def test_no_token_configured_trusts_nobody(monkeypatch):
+    monkeypatch.setattr(conversation, "AUTH_TOKEN", "")
+    assert session_user_id({}, {"user_id": "U1"}, "Bearer ") is None
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import START, MessagesState, StateGraph
+
+from src.utils.conversationStore import LatestCheckpointSaver, SQLiteConversationStore
+
+
+def echo(state: MessagesState) -> dict:
+    return {"messages": [AIMessage(content=f"echo: {state['messages'][-1].content}")]}
+
+
+def build(saver):
+    builder = StateGraph(MessagesState)
+    builder.add_node("echo", echo)
+    builder.add_edge(START, "echo")
+    return builder.compile(checkpointer=saver)
+
+
+def turn(graph, thread_id, text):
+    config = {"configurable": {"thread_id": thread_id}}
+    return graph.invoke({"messages": [HumanMessage(content=text)]}, config)
+
+
+def test_only_the_latest_checkpoint_is_kept_and_turns_still_resume():
+    saver = LatestCheckpointSaver()
+    graph = build(saver)
+    for i in range(5):
+        result = turn(graph, "t1", f"turn {i}")
+        assert sum(len(checkpoints) for checkpoints in saver.storage["t1"].values()) == 1
+    assert len(result["messages"]) == 10
+    assert result["messages"][-1].content == "echo: turn 4"
+    # One live blob per channel, not one per turn
+    blobs = len(saver.blobs)
+    turn(graph, "t1", "turn 5")
+    assert len(saver.blobs) == blobs
+    assert len(saver.writes) <= 1
+
+
+def test_delete_thread_only_drops_that_thread():
+    saver = LatestCheckpointSaver()
+    graph = build(saver)
+    turn(graph, "t1", "hello")
+    turn(graph, "t2", "hi")
+    saver.delete_thread("t1")
+    assert "t1" not in saver.storage
+    assert all(key[0] != "t1" for key in saver.blobs)
+    assert all(key[0] != "t1" for key in saver.writes)
+    assert graph.get_state({"configurable": {"thread_id": "t2"}}).values["messages"][-1].content == "echo: hi"
+    assert turn(graph, "t1", "again")["messages"][0].content == "again"
+
+
+def test_sqlite_store_keeps_message_ids(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+    now = datetime.now()
+    store.put("t1", {"messages": [HumanMessage(content="hello", id="m1")], "created_at": now, "last_updated": now})
+    (message,) = store.get("t1")["messages"]
+    assert (message.content, message.id) == ("hello", "m1")
+    store.delete("t1")
+    assert store.get("t1") is None
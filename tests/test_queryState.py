@@ -0,0 +1,11 @@
+from src.states.queryState import NEW_TURN, turn_notes
+
+
+def test_notes_append_within_a_turn():
+    assert turn_notes(["Execution jobs: a"], ["Completed: a"]) == ["Execution jobs: a", "Completed: a"]
+
+
+def test_new_turn_drops_earlier_notes():
+    assert turn_notes(["Completed: a"], [NEW_TURN]) == []
+    assert turn_notes(["Completed: a"], [NEW_TURN, "Answered by intent router: eta"]) == [
+        "Answered by intent router: eta"]
@@ -0,0 +1,49 @@
+import httpx
+
+from src.llms.rateLimiter import RateLimiter, TokenBucket, parse_duration, parse_rate_limits
+
+
+def bucket(per_minute):
+    """A full bucket whose clock starts at 0."""
+    bucket = TokenBucket(per_minute)
+    bucket.updated = 0.0
+    return bucket
+
+
+def test_bucket_serves_callers_in_order_once_in_debt():
+    tokens = bucket(60)  # one token per second
+    assert tokens.reserve(60, now=0.0) == 0.0
+    assert tokens.reserve(1, now=0.0) == 1.0
+    assert tokens.reserve(1, now=0.0) == 2.0
+    assert tokens.reserve(1, now=10.0) == 10.0
+
+
+def test_oversized_reservations_are_capped_at_capacity():
+    tokens = bucket(60)
+    tokens.reserve(60, now=0.0)
+    assert tokens.reserve(600, now=0.0) == 60.0
+
+
+def test_resize_and_cap_follow_the_server():
+    tokens = bucket(60)
+    tokens.resize(120, now=0.0)
+    assert tokens.reserve(120, now=0.0) == 0.0
+    tokens = bucket(60)
+    tokens.cap(0, now=0.0)
+    assert tokens.reserve(1, now=0.0) == 1.0
+
+
+def test_429_pauses_the_model():
+    limiter = RateLimiter({"*": (600, 60000)})
+    assert limiter.reserve("m", 10) == 0.0
+    limiter.observe("m", httpx.Response(429, headers={"retry-after": "2"}))
+    assert 1.9 < limiter.reserve("m", 10) <= 2.0
+    assert limiter.reserve("other", 10) == 0.0
+
+
+def test_parsers():
+    assert parse_rate_limits("a=30:6000, *=10:100") == {"a": (30.0, 6000.0), "*": (10.0, 100.0)}
+    assert parse_duration("2m59.5s") == 179.5
+    assert parse_duration("150ms") == 0.15
+    assert parse_duration("7") == 7.0
+    assert parse_duration("soon") is None
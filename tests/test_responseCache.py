@@ -0,0 +1,56 @@
+import pytest
+
+from src.utils.responseCache import ResponseCache, entity_signature, normalize_brief
+
+KANDY = "The user wants the estimated delivery time from Colombo to Kandy."
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"), ttl=60, similarity_threshold=0.5)
+    cache.put(KANDY, "About 2 days.")
+    return cache
+
+
+def test_exact_and_rephrased_briefs_hit(cache):
+    assert cache.get(KANDY) == "About 2 days."
+    assert cache.get("User wants to know the delivery time from Colombo to Kandy") == "About 2 days."
+    assert cache.stats()["similar_hits"] == 1
+
+
+@pytest.mark.parametrize("brief", [
+    "The user wants the estimated delivery time from Colombo to Galle.",
+    "The user wants the estimated delivery time from Kandy to Colombo.",
+])
+def test_other_routes_never_hit(cache, brief):
+    assert cache.get(brief) is None
+
+
+def test_other_identifiers_never_hit(cache):
+    cache.put("Where is parcel ABC123?", "In transit.")
+    assert cache.get("Where is parcel ABC124?") is None
+    assert cache.get("where is the parcel ABC123") == "In transit."
+
+
+def test_scopes_are_separate(cache):
+    assert cache.get(KANDY, scope="someone") is None
+    cache.put(KANDY, "About 2 days, as usual for you.", scope="someone")
+    assert cache.get(KANDY, scope="someone") == "About 2 days, as usual for you."
+    assert cache.get(KANDY) == "About 2 days."
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.db"), ttl=-1)
+    cache.put(KANDY, "About 2 days.")
+    assert cache.get(KANDY) is None
+
+
+def test_invalidate(cache):
+    cache.invalidate(KANDY)
+    assert cache.get(KANDY) is None
+    assert cache.stats()["indexed"] == 0
+
+
+def test_entity_signature_keeps_direction():
+    assert entity_signature(normalize_brief(KANDY)) == "colombo kandy"
+    assert entity_signature(normalize_brief("from Kandy to Colombo")) == "kandy colombo"
@@ -0,0 +1,32 @@
+import pytest
+
+from src.nodes.routerNode import intent_router
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("where is ABC123456?", ("tracking", {"tracking_numbers": ["ABC123456"]})),
+    ("has ABC123456 been delivered?", ("tracking", {"tracking_numbers": ["ABC123456"]})),
+    ("ABC123456, XYZ987654", ("tracking", {"tracking_numbers": ["ABC123456", "XYZ987654"]})),
+    ("How long does it take from Colombo to Kandy?", ("eta", {"origin": "Colombo", "destination": "Kandy"})),
+    ("How long from Colombo to Kandy by express?",
+     ("eta", {"origin": "Colombo", "destination": "Kandy", "service": "express"})),
+    ("eta from Colombo to Nuwara Eliya using economy shipping",
+     ("eta", {"origin": "Colombo", "destination": "Nuwara Eliya", "service": "economy"})),
+    ("show the history of user 123", ("user_information", {"userId": "123"})),
+])
+def test_single_asks_are_routed(message, expected):
+    assert intent_router.match(message) == expected
+
+
+@pytest.mark.parametrize("message", [
+    "how long from Colombo to Kandy and what is user 123's history",
+    "what is the eta from Colombo to Kandy, also is it raining there",
+    "user 123 details and where is ABC123456?",
+    "show the history of user 123. Then cancel their last order",
+    "where is ABC123456 and can you refund it",
+    "change the delivery address of ABC123456",
+    "delivery for ABC123456 please",
+    "hello there",
+])
+def test_multi_asks_and_chat_go_to_the_llm(message):
+    assert intent_router.match(message) is None
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.toolCache import ToolResultCache, canonical_args
+
+
+def test_results_are_cached_per_arguments():
+    cache = ToolResultCache({"track_package": 60})
+    calls = []
+    lookup = lambda n: lambda: calls.append(n) or f"status of {n}"
+    assert cache.call("track_package", {"tracking_number": "A1"}, lookup("A1")) == ("status of A1", False)
+    assert cache.call("track_package", {"tracking_number": " A1 "}, lookup("A1")) == ("status of A1", True)
+    assert cache.call("track_package", {"tracking_number": "B2"}, lookup("B2")) == ("status of B2", False)
+    assert calls == ["A1", "B2"]
+
+
+def test_uncached_tools_and_failures_always_call_through():
+    cache = ToolResultCache({"track_package": 60})
+    assert cache.call("think_tool", {}, lambda: "x") == ("x", False)
+    with pytest.raises(ValueError):
+        cache.call("track_package", {}, lambda: (_ for _ in ()).throw(ValueError("down")))
+    assert cache.call("track_package", {}, lambda: "back") == ("back", False)
+
+
+def test_concurrent_threads_share_one_request():
+    cache = ToolResultCache({"track_package": 60})
+    calls, release = [], threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "in transit"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.call("track_package", {"n": 1}, slow)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert sorted(results) == [("in transit", False)] + [("in transit", True)] * 3
+
+
+def test_async_waiters_share_one_request_and_survive_their_own_timeout():
+    cache = ToolResultCache({"track_package": 60})
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "in transit"
+
+    async def main():
+        leader = asyncio.create_task(cache.acall("track_package", {"n": 1}, slow))
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.acall("track_package", {"n": 1}, slow), 0.01)
+        waiter = asyncio.create_task(cache.acall("track_package", {"n": 1}, slow))
+        return await leader, await waiter
+
+    assert asyncio.run(main()) == (("in transit", False), ("in transit", True))
+    assert len(calls) == 1
+
+
+def test_cancelled_leader_fails_waiters_without_cancelling_them():
+    cache = ToolResultCache({"track_package": 60})
+
+    async def slow():
+        await asyncio.sleep(1)
+        return "in transit"
+
+    async def main():
+        leader = asyncio.create_task(cache.acall("track_package", {"n": 1}, slow))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.acall("track_package", {"n": 1}, slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(RuntimeError, match="cancelled by the caller"):
+            await waiter
+        # Nothing was cached, the next call goes to the backend again
+        return await cache.acall("track_package", {"n": 1}, lambda: asyncio.sleep(0, "delivered"))
+
+    assert asyncio.run(main()) == ("delivered", False)
+
+
+def test_canonical_args_ignores_key_order_and_padding():
+    assert canonical_args({"b": " x ", "a": [" y"]}) == canonical_args({"a": ["y"], "b": "x"})
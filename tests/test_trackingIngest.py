@@ -0,0 +1,39 @@
+from src.utils.trackingBackend import SQLiteTrackingBackend
+from src.utils.trackingIngest import ingest, ingest_files, parse_event_time
+
+
+def test_newest_event_wins_and_reingesting_is_a_no_op(tmp_path):
+    backend = SQLiteTrackingBackend(str(tmp_path / "tracking.db"))
+    events = [
+        ("ABC123", 100.0, "Picked up", "Colombo", "SL Post"),
+        ("ABC123", 300.0, "Delivered", "Kandy", "SL Post"),
+        ("ABC123", 200.0, "In transit", "", ""),
+        ("XYZ987", 150.0, "Picked up", "", ""),
+    ]
+    assert ingest(backend, events, batch_size=2)["inserted"] == 4
+    again = ingest(backend, events, batch_size=2)
+    assert (again["inserted"], again["duplicates"]) == (0, 4)
+    statuses = backend.lookup_many(["ABC123", "XYZ987"])
+    assert statuses["ABC123"].startswith("Delivered at Kandy")
+    assert statuses["XYZ987"].startswith("Picked up")
+    # A late batch with an older event leaves the current status alone
+    ingest(backend, [("ABC123", 250.0, "Out for delivery", "", "")])
+    assert backend.lookup_many(["ABC123"])["ABC123"].startswith("Delivered")
+    assert [row[1] for row in backend.history("abc123")] == [
+        "Delivered", "Out for delivery", "In transit", "Picked up"]
+
+
+def test_files_are_parsed_and_bad_rows_skipped(tmp_path):
+    backend = SQLiteTrackingBackend(str(tmp_path / "tracking.db"))
+    csv_file = tmp_path / "events.csv"
+    csv_file.write_text("tracking_number,event_time,status\nabc123,2025-08-26T10:00:00,Picked up\nxyz,not a time,Lost\n")
+    jsonl_file = tmp_path / "events.jsonl"
+    jsonl_file.write_text('{"tracking_number": "ABC123", "event_time": 1756209600, "status": "Delivered"}\n')
+    totals = ingest_files(backend, [str(csv_file), str(jsonl_file)])
+    assert (totals["events"], totals["inserted"]) == (2, 2)
+    assert backend.lookup_many(["ABC123"])["ABC123"].startswith("Delivered")
+
+
+def test_parse_event_time():
+    assert parse_event_time("1756202400") == parse_event_time("2025-08-26T10:00:00") == 1756202400.0
+    assert parse_event_time("2025-08-26T12:00:00+02:00") == 1756202400.0
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.nodes.masterNode import WorkerSlots
+
+
+def test_sync_and_async_workers_share_one_budget():
+    slots = WorkerSlots(1)
+    started, finish = threading.Event(), threading.Event()
+
+    def hold(_):
+        started.set()
+        finish.wait(5)
+        return "sync"
+
+    holder = threading.Thread(target=slots.run, args=(hold, None, 5))
+    holder.start()
+    started.wait(5)
+
+    async def job(_):
+        return "async"
+
+    async def main():
+        with pytest.raises(TimeoutError, match="no worker slot"):
+            await slots.arun(job, None, 0.1)
+        waiting = asyncio.create_task(slots.arun(job, None, 5))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        finish.set()
+        return await waiting
+
+    assert asyncio.run(main()) == "async"
+    holder.join(5)
+    assert slots._free == 1
+
+
+def test_slot_wait_counts_against_the_job_timeout():
+    slots = WorkerSlots(1)
+    holder = threading.Thread(target=slots.run, args=(time.sleep, 0.3, 5))
+    holder.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError, match="worker timed out"):
+        slots.run(time.sleep, 0.3, 0.5)
+    assert time.perf_counter() - started < 0.6
+    holder.join(5)
+
+
+def test_async_timeout_and_cancellation_return_their_slot():
+    slots = WorkerSlots(1)
+
+    async def main():
+        with pytest.raises(TimeoutError, match="worker timed out"):
+            await slots.arun(asyncio.sleep, 1, 0.05)
+        holder = asyncio.create_task(slots.arun(asyncio.sleep, 0.2, 5))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(slots.arun(asyncio.sleep, 0, 5))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await holder
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(main())
+    assert slots._free == 1 and not slots._waiters